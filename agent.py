@@ -0,0 +1,246 @@
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import threading
+import time
+
+from basic_checks import get_os_version_info, get_installed_applications_inventory, check_virtual_machine
+from net_env import get_network_environment
+from security_processes import get_indicator_matcher
+from instrumentation import measure
+from local_cache import get_cache_dir
+from process_tracker import ProcessTracker
+
+# Refresh interval per section, in seconds. Processes and interfaces move fast;
+# OS facts and the package list almost never change (and the package inventory
+# is cached on disk anyway).
+DEFAULT_INTERVALS = {
+    "network_environment": 15,
+    "security_processes": 10,
+    "vm_detection": 60,
+    "os_info": 3600,
+    "installed_applications": 300,
+}
+
+# Longest request line a client may send.
+MAX_REQUEST_BYTES = 4096
+
+
+def default_socket_path():
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, "trainwreck.sock")
+    return os.path.join(get_cache_dir(), "agent.sock")
+
+
+class DiagnosticsAgent:
+    """
+    Long-running collector host.
+
+    Every section is refreshed by its own thread on its own interval and the
+    latest result is kept in memory. Queries are answered from that cache over
+    a Unix socket and never trigger a collection themselves.
+
+    Protocol: the client sends one line, either "GET" (all sections) or
+    "GET name1,name2", or "STATUS". The agent answers with one JSON document
+    and closes the connection.
+    """
+
+    def __init__(self, socket_path=None, intervals=None, indicator_catalogs=None, network_options=None, only=None):
+        self.socket_path = socket_path or default_socket_path()
+        self.intervals = dict(DEFAULT_INTERVALS, **(intervals or {}))
+        self.indicator_catalogs = indicator_catalogs
+        self.network_options = network_options or {}
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._sections = {}
+        self._stop = threading.Event()
+        self._server = None
+        self._process_tracker = None
+
+        self.collectors = {
+            "network_environment": lambda: get_network_environment(**self.network_options),
+            "os_info": get_os_version_info,
+            "installed_applications": self._collect_installed_applications,
+            "vm_detection": self._collect_vm_detection,
+            "security_processes": self._collect_security_processes,
+        }
+        if only:
+            self.collectors = {name: func for name, func in self.collectors.items() if name in only}
+
+    @staticmethod
+    def _collect_installed_applications():
+        return get_installed_applications_inventory()["applications"]
+
+    def _collect_security_processes(self):
+        # Only processes started since the last refresh are read and matched.
+        matcher = get_indicator_matcher(self.indicator_catalogs)
+        if self._process_tracker is None:
+            self._process_tracker = ProcessTracker(matcher)
+        else:
+            self._process_tracker.set_matcher(matcher) # No-op unless a catalog was reloaded
+        self._process_tracker.tick()
+        return self._process_tracker.matched()
+
+    @staticmethod
+    def _collect_vm_detection():
+        is_vm, hypervisor = check_virtual_machine()
+        return {"is_vm": is_vm, "hypervisor": hypervisor}
+
+    def refresh(self, name):
+        """Runs one collector now and stores its result."""
+        started = time.perf_counter()
+        entry = {"status": "ok"}
+        with measure(name) as metrics:
+            try:
+                entry["result"] = self.collectors[name]()
+            except Exception as e:
+                entry.update(status="error", error=str(e))
+        entry["metrics"] = metrics.as_dict()
+        entry["elapsed_seconds"] = round(time.perf_counter() - started, 6)
+        entry["updated_at"] = time.time()
+        with self._lock:
+            previous = self._sections.get(name)
+            if entry["status"] != "ok" and previous and "result" in previous:
+                # Keep serving the last good result, flagged with the new error
+                entry["result"] = previous["result"]
+                entry["result_updated_at"] = previous.get("result_updated_at", previous["updated_at"])
+            self._sections[name] = entry
+
+    def _refresh_loop(self, name):
+        while not self._stop.is_set():
+            self.refresh(name)
+            self._stop.wait(self.intervals[name])
+
+    def snapshot(self, sections=None):
+        """
+        Returns the cached results shaped like run_system_diagnostics(). The
+        '_collectors' entries also carry when and how long ago each was refreshed,
+        and '_metrics' holds the measurements of each section's latest refresh.
+        """
+        now = time.time()
+        with self._lock:
+            names = [n for n in (sections or self._sections.keys()) if n in self._sections]
+            document = {name: self._sections[name].get("result") for name in names}
+            document["_collectors"] = {
+                name: dict({k: v for k, v in self._sections[name].items() if k not in ("result", "metrics")},
+                           age_seconds=round(now - self._sections[name]["updated_at"], 3))
+                for name in names
+            }
+            document["_metrics"] = {"collectors": {name: self._sections[name]["metrics"] for name in names}}
+        return document
+
+    def status(self):
+        with self._lock:
+            ready = sorted(self._sections)
+        return {"pid": os.getpid(), "uptime_seconds": round(time.time() - self.started_at, 3),
+                "intervals": self.intervals, "ready_sections": ready}
+
+    def handle_request(self, line):
+        parts = line.strip().split(None, 1)
+        command = parts[0].upper() if parts else "GET"
+        if command == "GET":
+            sections = parts[1].split(",") if len(parts) > 1 else None
+            return self.snapshot(sections)
+        if command == "STATUS":
+            return self.status()
+        return {"error": f"unknown command {command!r}"}
+
+    def start(self):
+        """Starts the refresh threads and the socket server (non-blocking)."""
+        if not hasattr(socket, "AF_UNIX"):
+            raise RuntimeError("agent mode needs Unix domain sockets")
+        agent = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                line = self.rfile.readline(MAX_REQUEST_BYTES).decode("utf-8", errors="replace")
+                response = agent.handle_request(line)
+                self.wfile.write(json.dumps(response, separators=(",", ":"), default=str).encode("utf-8"))
+
+        self._remove_stale_socket()
+        # The socket is only for the owner. It is restricted between bind and
+        # listen, before anyone can connect, rather than through the umask,
+        # which is process-wide and would also apply to files and directories
+        # other threads create meanwhile.
+        self._server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler, bind_and_activate=False)
+        try:
+            self._server.server_bind()
+            os.chmod(self.socket_path, 0o600)
+            self._server.server_activate()
+        except BaseException:
+            self._server.server_close()
+            raise
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="agent-server", daemon=True).start()
+        for name in self.collectors:
+            threading.Thread(target=self._refresh_loop, args=(name,), name=f"agent-{name}", daemon=True).start()
+
+    def _remove_stale_socket(self):
+        # A socket left behind by an agent that died refuses connections; one
+        # that accepts them belongs to an agent that is still running.
+        try:
+            mode = os.lstat(self.socket_path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise RuntimeError(f"{self.socket_path} exists and is not a socket")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            probe.settimeout(1)
+            try:
+                probe.connect(self.socket_path)
+            except ConnectionRefusedError:
+                os.unlink(self.socket_path)
+                return
+            except OSError as e:
+                raise RuntimeError(f"cannot tell whether {self.socket_path} is in use: {e}") from e
+        raise RuntimeError(f"another agent is already listening on {self.socket_path}")
+
+    def stop(self):
+        self._stop.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+    def serve_forever(self):
+        """Runs until SIGTERM/SIGINT. Must be called from the main thread."""
+        signal.signal(signal.SIGTERM, lambda signum, frame: self._stop.set())
+        self.start()
+        try:
+            while not self._stop.wait(3600):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+
+def query_agent(socket_path=None, sections=None, command="GET", timeout=5):
+    """
+    Asks a running DiagnosticsAgent for its cached results.
+
+    Returns:
+        dict: The decoded JSON response.
+    """
+    request = command
+    if sections:
+        request += " " + ",".join(sections)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path or default_socket_path())
+        sock.sendall(request.encode("utf-8") + b"\n")
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return json.loads(b"".join(chunks))
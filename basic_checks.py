@@ -1,68 +1,101 @@
 # Modified basic_checks.py
 import os
 import platform
-import subprocess
 import re
+import subprocess
+
+from command_runner import run_command, submit_command
+from host_facts import get_host_fact
+from instrumentation import step
+from process_snapshot import PSUTIL_AVAILABLE, take_process_snapshot
+
+OS_RELEASE_PATH = "/etc/os-release"
 
-try:
-    import psutil
-    PSUTIL_AVAILABLE = True
-except ImportError:
-    PSUTIL_AVAILABLE = False
+# Process attributes check_virtual_machine() needs from a process snapshot.
+VM_PROCESS_ATTRS = frozenset(("pid", "name"))
 
-def get_os_version_info():
-    os_info = {
+def _platform_facts():
+    # platform.processor() runs `uname -p` on Linux; everything here is fixed
+    # until the next boot.
+    return {
         "system": platform.system(),
         "release": platform.release(),
         "version": platform.version(),
         "architecture": platform.machine(),
         "processor": platform.processor(),
-        "hostname": platform.node()
     }
 
-    if platform.system() == "Windows":
+def _read_sw_vers():
+    mac_info = {}
+    for line in run_command(["sw_vers"], timeout=10).strip().split('\n'):
+        k, v = line.split(":", 1)
+        mac_info[k.strip()] = v.strip()
+    return mac_info
+
+def _read_os_release(os_release_path):
+    with open(os_release_path, "r") as f:
+        os_release_info = {}
+        for line in f:
+            if '=' in line:
+                key, value = line.strip().split('=', 1)
+                os_release_info[key] = value.strip('"')
+    return {
+        "pretty_name": os_release_info.get("PRETTY_NAME", "N/A"),
+        "id": os_release_info.get("ID", "N/A"),
+        "version_id": os_release_info.get("VERSION_ID", "N/A")
+    }
+
+def get_os_version_info(os_release_path=OS_RELEASE_PATH):
+    """
+    Returns platform, hostname and distribution details. Everything except the
+    hostname comes from the per-boot host facts cache (see host_facts.py); the
+    distribution is re-read whenever os_release_path changes.
+    """
+    os_info = dict(get_host_fact("platform", _platform_facts))
+    os_info["hostname"] = platform.node() # Can be changed at runtime
+    system = os_info["system"]
+
+    if system == "Windows":
         try:
-            ver_output = subprocess.check_output("ver", shell=True, text=True, stderr=subprocess.DEVNULL)
-            os_info["windows_full_version"] = ver_output.strip()
+            # ver is a cmd.exe builtin
+            os_info["windows_full_version"] = get_host_fact(
+                "windows_full_version", lambda: run_command(["cmd", "/c", "ver"], timeout=10).strip())
         except Exception as e:
             os_info["windows_full_version_error"] = str(e)
 
-    elif platform.system() == "Darwin":
+    elif system == "Darwin":
         try:
-            sw_vers_output = subprocess.check_output(["sw_vers"], text=True, stderr=subprocess.DEVNULL)
-            mac_info = {}
-            for line in sw_vers_output.strip().split('\n'):
-                k, v = line.split(":", 1)
-                mac_info[k.strip()] = v.strip()
-            os_info["mac_info"] = mac_info
+            os_info["mac_info"] = get_host_fact("mac_info", _read_sw_vers)
         except Exception as e:
             os_info["mac_info_error"] = str(e)
 
-    elif platform.system() == "Linux":
+    elif system == "Linux":
         try:
-            with open("/etc/os-release", "r") as f:
-                os_release_info = {}
-                for line in f:
-                    if '=' in line:
-                        key, value = line.strip().split('=', 1)
-                        os_release_info[key] = value.strip('"')
-                os_info["distribution"] = {
-                    "pretty_name": os_release_info.get("PRETTY_NAME", "N/A"),
-                    "id": os_release_info.get("ID", "N/A"),
-                    "version_id": os_release_info.get("VERSION_ID", "N/A")
-                }
+            os_info["distribution"] = get_host_fact("distribution", lambda: _read_os_release(os_release_path),
+                                                    watch_paths=(os_release_path,))
         except Exception as e:
             os_info["linux_info_error"] = str(e)
 
     return os_info
 
-def list_installed_applications():
+def list_installed_applications(root="/"):
+    """
+    Lists installed applications as sorted, de-duplicated display strings.
+
+    Args:
+        root: Linux only: where to look for the package databases (see
+              package_db.iter_linux_packages()).
+    """
     apps = []
     system = platform.system()
 
     if system == "Windows":
+        # Both inventories are slow; run them at the same time
+        wmic = submit_command(["wmic", "product", "get", "name,version"], timeout=30)
+        winget = submit_command(["winget", "list"], timeout=30)
         try:
-            output = subprocess.check_output("wmic product get name, version", shell=True, text=True, stderr=subprocess.PIPE, timeout=30)
+            with step("packages.wmic"):
+                output = wmic.result()
             lines = output.strip().split('\n')[1:]
             for line in lines:
                 parts = re.split(r'\s{2,}', line.strip())
@@ -74,7 +107,8 @@ def list_installed_applications():
             pass
 
         try:
-            output = subprocess.check_output("winget list", shell=True, text=True, stderr=subprocess.PIPE, timeout=30)
+            with step("packages.winget"):
+                output = winget.result()
             lines = output.strip().split('\n')[2:]
             for line in lines:
                 if line.strip():
@@ -94,33 +128,99 @@ def list_installed_applications():
                 pass
 
     elif system == "Linux":
-        try:
-            output = subprocess.check_output("dpkg-query -W -f='${Package} (${Version})\n'", shell=True, text=True)
-            apps.extend(output.strip().split('\n'))
-        except Exception:
-            pass
+        # dpkg, rpm and pacman databases are read in-process where possible
+        from package_db import format_package, iter_linux_packages
+        apps.extend(format_package(record) for record in iter_linux_packages(root))
 
-        try:
-            output = subprocess.check_output("rpm -qa --qf '%{NAME}-%{VERSION}.%{ARCH}\n'", shell=True, text=True)
-            apps.extend(output.strip().split('\n'))
-        except Exception:
-            pass
+    return sorted(list(set(apps)))
 
-        try:
-            output = subprocess.check_output("pacman -Q", shell=True, text=True)
-            apps.extend(output.strip().split('\n'))
-        except Exception:
-            pass
+def _iter_installed_records(system):
+    from package_db import PackageRecord, iter_linux_packages
+    if system == "Linux":
+        return iter_linux_packages()
+    # Other platforms only give us display strings; keep them as names.
+    return (PackageRecord(app, "", "", system.lower()) for app in list_installed_applications())
+
+# (records, formatted list) from the last inventory call; the cache hands back the
+# same records object while nothing changes, so the formatting is reused too.
+_formatted_inventory = (None, None)
+
+def get_installed_applications_inventory(cache_path=None):
+    """
+    Incremental version of list_installed_applications() for repeated runs.
+
+    The package list is cached on disk together with the mtime, size and inode of
+    the package databases. While those are unchanged the cached list is returned
+    without touching any package manager.
+
+    Returns:
+        dict: 'applications': Full list, formatted like list_installed_applications()
+              'changed': False if the cached list was reused, None if partial
+              'diff': None when unchanged or partial, otherwise a dict of
+                      'added' and 'removed' application strings and 'upgraded'
+                      entries ({'name', 'source', 'from', 'to'})
+              'partial': True if the resource budget cut the collection short;
+                         the list is then incomplete and not compared with
+                         (or stored in) the cache
+    """
+    from budget import checkpoint
+    from inventory_cache import LINUX_PACKAGE_DB_PATHS, InventoryCache, stat_signature
+    from package_db import format_package
 
-    return sorted(list(set(apps)))
+    system = platform.system()
+    if system == "Linux":
+        paths = LINUX_PACKAGE_DB_PATHS
+    elif system == "Darwin":
+        paths = ("/Applications", os.path.expanduser("~/Applications"))
+    else:
+        paths = None # Nothing cheap to watch (e.g. the Windows installer database)
+
+    if paths is None:
+        records, diff = list(_iter_installed_records(system)), None
+        partial = not checkpoint("packages")
+        changed = None if partial else True
+    else:
+        cache = InventoryCache("installed_applications", cache_path)
+        with step("inventory_cache"):
+            records, diff, partial = cache.get(stat_signature(paths), lambda: _iter_installed_records(system))
+        changed = None if partial else diff is not None
+
+    label = format_package if system == "Linux" else (lambda r: r.name)
+    global _formatted_inventory
+    if _formatted_inventory[0] is not records:
+        _formatted_inventory = (records, sorted(set(label(r) for r in records)))
+
+    return {
+        "applications": _formatted_inventory[1],
+        "changed": changed,
+        "partial": partial,
+        "diff": None if diff is None else {
+            "added": sorted(label(r) for r in diff["added"]),
+            "removed": sorted(label(r) for r in diff["removed"]),
+            "upgraded": [{"name": new.name, "source": new.source, "from": old.version, "to": new.version}
+                         for old, new in diff["upgraded"]],
+        },
+    }
 
-def check_virtual_machine():
+def _systemd_detect_virt():
+    # Exits with 1 after printing "none" on bare metal; a missing command is an
+    # answer too. Timeouts propagate so that they aren't cached.
+    try:
+        return run_command(["systemd-detect-virt"], timeout=5).strip()
+    except subprocess.CalledProcessError as e:
+        return (e.output or "").strip() or None
+    except FileNotFoundError:
+        return None
+
+def check_virtual_machine(process_snapshot=None):
     is_vm = False
     indicators = []
     hypervisor = "Unknown or Physical"
 
     if PSUTIL_AVAILABLE:
-        running_processes = {p.info['name'].lower() for p in psutil.process_iter(['name'])}
+        if process_snapshot is None:
+            process_snapshot = take_process_snapshot(VM_PROCESS_ATTRS)
+        running_processes = {p.name.lower() for p in process_snapshot if p.name}
         for hint in ["vbox", "vmware", "qemu", "hyper-v", "kvm", "xen"]:
             for name in running_processes:
                 if hint in name:
@@ -129,7 +229,8 @@ def check_virtual_machine():
 
     if platform.system() == "Linux":
         try:
-            output = subprocess.check_output("systemd-detect-virt", shell=True, text=True).strip()
+            with step("systemd-detect-virt"):
+                output = get_host_fact("systemd_detect_virt", _systemd_detect_virt)
             if output and output != "none":
                 is_vm = True
                 hypervisor = output
@@ -0,0 +1,283 @@
+"""
+Runs every collector against generated host fixtures and reports latency
+percentiles and throughput, optionally compared with a stored baseline.
+
+Nothing here touches the network or the host's own package databases; the
+fixtures live in a temporary directory, and so does the cache directory
+(TRAINWRECK_CACHE_DIR) for the collectors that keep one.
+
+Usage:
+    python benchmarks/bench_collectors.py [--repeat 7] [--max-size 10000] [--case security]
+    python benchmarks/bench_collectors.py --save-baseline baseline.json
+    python benchmarks/bench_collectors.py --baseline baseline.json [--threshold 0.1]
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import binary_snapshot
+import fixtures
+from basic_checks import get_os_version_info, list_installed_applications
+from host_facts import clear_host_facts
+from interface_table import InterfaceFilter, parse_address_dump, parse_link_dump
+from net_env import get_network_environment
+from security_processes import get_indicator_matcher, get_security_related_processes
+from windows_net import parse_ipconfig_all
+
+BASELINE_VERSION = 1
+
+
+def _security_matcher(snapshot, parallel):
+    # The fixtures always contain security processes: no matches means the
+    # case timed an empty loop, not that matching got fast
+    matcher = get_indicator_matcher([])
+    if not get_security_related_processes(snapshot, matcher, parallel=parallel):
+        raise AssertionError(f"no security processes matched in {len(snapshot)} fixture processes")
+    return lambda: get_security_related_processes(snapshot, matcher, parallel=parallel)
+
+
+def _security_case(size, workdir):
+    return _security_matcher(fixtures.make_process_snapshot(size), parallel=False), size
+
+
+def _security_parallel_case(size, workdir):
+    # Always on the process pool, whatever the size and CPU count, so it can be
+    # compared with the serial case above
+    return _security_matcher(fixtures.make_process_snapshot(size), parallel=True), size
+
+
+def _dpkg_case(size, workdir):
+    root = os.path.join(workdir, f"dpkg-{size}")
+    os.makedirs(os.path.join(root, "var", "lib", "dpkg"))
+    fixtures.write_dpkg_status(os.path.join(root, "var", "lib", "dpkg", "status"), size)
+    return lambda: list_installed_applications(root), size
+
+
+def _pacman_case(size, workdir):
+    root = os.path.join(workdir, f"pacman-{size}")
+    fixtures.write_pacman_local(os.path.join(root, "var", "lib", "pacman", "local"), size)
+    return lambda: list_installed_applications(root), size
+
+
+def _network_case(size, workdir):
+    proc_root = os.path.join(workdir, f"proc-{size}")
+    resolv_conf = os.path.join(workdir, "resolv.conf")
+    fixtures.write_proc_net(proc_root, size)
+    fixtures.write_resolv_conf(resolv_conf)
+    # No probe targets and no FQDN lookup: the run stays offline.
+    return lambda: get_network_environment(probe_targets=(), fqdn_timeout=0, proc_root=proc_root,
+                                           resolv_conf_path=resolv_conf), size
+
+
+def _ipconfig_case(size, workdir):
+    # Saved `ipconfig /all` text: the Windows parser runs on any platform
+    path = os.path.join(workdir, f"ipconfig-{size}.txt")
+    fixtures.write_ipconfig_all(path, size)
+
+    def parse():
+        with open(path, "r", encoding="latin-1") as f:
+            return parse_ipconfig_all(f)
+    return parse, size
+
+
+def _interface_table_case(size, workdir, link_filter=None):
+    # Saved rtnetlink dumps: the parsers run on any platform
+    links, addresses = fixtures.make_rtnetlink_dumps(size)
+
+    def parse():
+        return parse_address_dump(addresses, parse_link_dump(links, link_filter))
+    return parse, size
+
+
+def _interface_table_filtered_case(size, workdir):
+    # Only the NICs out of thousands of veths
+    return _interface_table_case(size, workdir, InterfaceFilter(names=["eth*"]))
+
+
+def _snapshot_paths(size, workdir):
+    json_path = os.path.join(workdir, f"snapshot-{size}.json")
+    binary_path = os.path.join(workdir, f"snapshot-{size}{binary_snapshot.BINARY_SNAPSHOT_SUFFIX}")
+    if not os.path.exists(json_path):
+        document = fixtures.make_diagnostics_document(size)
+        with open(json_path, "w") as f:
+            json.dump(document, f, indent=2)
+        binary_snapshot.dump(document, binary_path)
+    return json_path, binary_path
+
+
+def _json_snapshot_case(size, workdir):
+    # Reference for the binary cases: one package list out of an indented JSON result
+    json_path, _ = _snapshot_paths(size, workdir)
+
+    def read():
+        with open(json_path, "r") as f:
+            return json.load(f)["installed_applications"]
+    return read, size
+
+
+def _binary_snapshot_case(size, workdir):
+    _, binary_path = _snapshot_paths(size, workdir)
+
+    def read():
+        with binary_snapshot.BinarySnapshot(binary_path) as snapshot:
+            return snapshot.section("installed_applications")
+    return read, size
+
+
+def _binary_snapshot_small_case(size, workdir):
+    # A small section of a large snapshot: cost should not depend on size
+    _, binary_path = _snapshot_paths(size, workdir)
+
+    def read():
+        with binary_snapshot.BinarySnapshot(binary_path) as snapshot:
+            return snapshot.section("vm_detection")
+    return read, 1
+
+
+def _os_info_case(size, workdir):
+    # Warm: every fact comes from the per-boot host facts cache
+    os_release = os.path.join(workdir, "os-release")
+    fixtures.write_os_release(os_release)
+    return lambda: get_os_version_info(os_release), 1
+
+
+def _os_info_cold_case(size, workdir):
+    # Cold: the cache is emptied first, so every fact is collected again
+    os_release = os.path.join(workdir, "os-release")
+    fixtures.write_os_release(os_release)
+
+    def collect():
+        clear_host_facts()
+        return get_os_version_info(os_release)
+    return collect, 1
+
+
+# name -> (fixture sizes, setup(size, workdir) -> (func, items per call)).
+# Package listing goes through list_installed_applications(), which only reads
+# the package databases itself on Linux.
+CASES = {
+    "security_processes": ((100, 1000, 10000, 50000), _security_case),
+    "security_processes.parallel": ((10000, 50000, 200000), _security_parallel_case),
+    "installed_applications.dpkg": ((1000, 10000, 50000), _dpkg_case),
+    "installed_applications.pacman": ((100, 1000, 5000), _pacman_case),
+    "network_environment": ((10, 1000), _network_case),
+    "ipconfig_all": ((4, 64, 1024), _ipconfig_case),
+    "interface_table": ((10, 1000, 10000), _interface_table_case),
+    "interface_table.name_filter": ((1000, 10000), _interface_table_filtered_case),
+    "os_info": ((1,), _os_info_case),
+    "os_info.cold": ((1,), _os_info_cold_case),
+    "snapshot.json.packages": ((1000, 10000, 50000), _json_snapshot_case),
+    "snapshot.binary.packages": ((1000, 10000, 50000), _binary_snapshot_case),
+    "snapshot.binary.vm_detection": ((1000, 10000, 50000), _binary_snapshot_small_case),
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def run_case(func, items, repeat, warmup):
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    mean = sum(timings) / len(timings)
+    return {
+        "items": items,
+        "runs": repeat,
+        "min_ms": round(timings[0] * 1000, 3),
+        "p50_ms": round(percentile(timings, 50) * 1000, 3),
+        "p90_ms": round(percentile(timings, 90) * 1000, 3),
+        "p99_ms": round(percentile(timings, 99) * 1000, 3),
+        "mean_ms": round(mean * 1000, 3),
+        "items_per_second": round(items / mean, 1) if mean else None,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Returns (lines, regressions) comparing p50 latency against the baseline."""
+    lines, regressions = [], []
+    for case_id, result in results.items():
+        previous = baseline.get("cases", {}).get(case_id)
+        if not previous or not previous.get("p50_ms"):
+            lines.append(f"  {case_id:<42} (not in baseline)")
+            continue
+        ratio = result["p50_ms"] / previous["p50_ms"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(case_id)
+        elif ratio < 1 - threshold:
+            flag = "  faster"
+        lines.append(f"  {case_id:<42} {previous['p50_ms']:>10.3f} -> {result['p50_ms']:>10.3f} ms  x{ratio:.2f}{flag}")
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=7, help="timed runs per case (default: 7)")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs before timing (default: 1)")
+    parser.add_argument("--max-size", type=int, help="skip fixtures larger than this")
+    parser.add_argument("--case", action="append", dest="cases", metavar="NAME",
+                        help="only run cases whose name contains NAME (repeatable)")
+    parser.add_argument("--baseline", metavar="PATH", help="compare p50 latency with a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative p50 slowdown reported as a regression (default: 0.1)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write this run's results to PATH")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-collectors-")
+    os.environ["TRAINWRECK_CACHE_DIR"] = os.path.join(workdir, "cache") # Never the user's own cache
+    results = {}
+    try:
+        print(f"{'case':<42} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'items/s':>12}")
+        for name, (sizes, setup) in CASES.items():
+            if args.cases and not any(c in name for c in args.cases):
+                continue
+            for size in sizes:
+                if args.max_size is not None and size > args.max_size:
+                    continue
+                case_id = f"{name}[{size}]"
+                func, items = setup(size, workdir)
+                result = results[case_id] = run_case(func, items, args.repeat, args.warmup)
+                print(f"{case_id:<42} {result['p50_ms']:>10.3f} {result['p90_ms']:>10.3f} "
+                      f"{result['p99_ms']:>10.3f} {result['items_per_second'] or 0:>12.0f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({"version": BASELINE_VERSION, "python": platform.python_version(),
+                       "machine": platform.machine(), "created_at": time.time(), "cases": results}, f, indent=2)
+        print(f"\nBaseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        if baseline.get("version") != BASELINE_VERSION:
+            raise SystemExit(f"error: {args.baseline} has baseline format {baseline.get('version')!r}, "
+                             f"expected {BASELINE_VERSION}")
+        lines, regressions = compare(results, baseline, args.threshold)
+        print(f"\nCompared with {args.baseline} (p50):")
+        print("\n".join(lines))
+        if regressions:
+            raise SystemExit(f"\n{len(regressions)} case(s) slower than the baseline by more than "
+                             f"{args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
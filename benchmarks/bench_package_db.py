@@ -0,0 +1,56 @@
+"""
+Compares the in-process dpkg status reader with dpkg-query on a synthetic
+status file.
+
+Usage: python benchmarks/bench_package_db.py [--packages 20000] [--repeat 5]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import write_dpkg_status
+from package_db import iter_dpkg_status
+
+
+def time_call(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), sum(timings) / len(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--packages", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    admindir = tempfile.mkdtemp(prefix="bench-dpkg-")
+    try:
+        status_path = os.path.join(admindir, "status")
+        write_dpkg_status(status_path, args.packages)
+        print(f"Synthetic status file: {args.packages} packages, {os.path.getsize(status_path) / 1e6:.1f} MB")
+
+        best, mean, count = time_call(lambda: sum(1 for _ in iter_dpkg_status(status_path)), args.repeat)
+        print(f"  native reader : best {best * 1000:8.1f} ms, mean {mean * 1000:8.1f} ms ({count} records)")
+
+        if shutil.which("dpkg-query"):
+            command = ["dpkg-query", f"--admindir={admindir}", "-W", "-f=${Package}\t${Version}\t${Architecture}\n"]
+            best, mean, output = time_call(lambda: subprocess.check_output(command, text=True), args.repeat)
+            print(f"  dpkg-query    : best {best * 1000:8.1f} ms, mean {mean * 1000:8.1f} ms ({len(output.splitlines())} records)")
+        else:
+            print("  dpkg-query    : not installed, skipped")
+    finally:
+        shutil.rmtree(admindir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""
+Synthetic host fixtures for the benchmarks: process tables, package databases
+and the procfs/etc files the collectors read. Everything is generated from a
+fixed seed, so the same size always produces the same fixture.
+"""
+import os
+import random
+import socket
+import struct
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import interface_table as rtnl
+from process_snapshot import ProcessRecord, ProcessSnapshot, SNAPSHOT_ATTRS
+
+# Process names the synthetic tables are drawn from. A few percent of them match
+# the built-in security indicators, roughly like a real server.
+_COMMON_PROCESS_NAMES = (
+    "systemd", "kworker/0:1", "bash", "python3", "nginx", "postgres", "java", "node",
+    "containerd-shim", "dbus-daemon", "cron", "chronyd", "irqbalance", "udevd",
+    "gunicorn", "redis-server", "php-fpm", "agetty", "rsync", "tmux",
+)
+_SECURITY_PROCESS_NAMES = ("sshd", "auditd", "clamd", "falcon-sensor", "osqueryd", "wireguard")
+_ARGUMENTS = ("--config", "/etc/app/config.yaml", "-v", "--port=8080", "--workers", "4",
+              "--log-level=info", "/var/lib/data", "--foreground", "-c")
+
+
+def make_process_snapshot(count, seed=0, security_ratio=0.03):
+    """Builds a ProcessSnapshot with count synthetic processes."""
+    rng = random.Random(seed)
+    records = []
+    for pid in range(1, count + 1):
+        if rng.random() < security_ratio:
+            name = rng.choice(_SECURITY_PROCESS_NAMES)
+        else:
+            name = rng.choice(_COMMON_PROCESS_NAMES)
+        if name.startswith("kworker"):
+            cmdline = () # Kernel threads have no command line
+        else:
+            exe = f"/usr/bin/{name}"
+            cmdline = (exe,) + tuple(rng.choice(_ARGUMENTS) for _ in range(rng.randint(0, 8)))
+        records.append(ProcessRecord(pid, name, cmdline[0] if cmdline else None, cmdline))
+    return ProcessSnapshot(records, SNAPSHOT_ATTRS)
+
+
+def write_dpkg_status(path, count):
+    """Writes a dpkg status file with count installed packages."""
+    with open(path, "w") as f:
+        for i in range(count):
+            f.write(
+                f"Package: synthetic-package-{i}\n"
+                "Status: install ok installed\n"
+                "Priority: optional\n"
+                "Section: misc\n"
+                f"Installed-Size: {100 + i % 900}\n"
+                "Maintainer: Benchmark <bench@example.invalid>\n"
+                "Architecture: amd64\n"
+                f"Version: {i % 7}.{i % 13}.{i % 101}-1\n"
+                "Depends: libc6 (>= 2.34)\n"
+                "Description: synthetic package for benchmarking\n"
+                " A longer description spread over a continuation line.\n"
+                " .\n"
+                " And another paragraph.\n"
+                "\n"
+            )
+
+
+def write_pacman_local(path, count):
+    """Writes a pacman local database directory with count packages."""
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "ALPM_DB_VERSION"), "w") as f:
+        f.write("9\n")
+    for i in range(count):
+        name, version = f"synthetic-package-{i}", f"{i % 7}.{i % 13}.{i % 101}-1"
+        package_dir = os.path.join(path, f"{name}-{version}")
+        os.makedirs(package_dir, exist_ok=True)
+        with open(os.path.join(package_dir, "desc"), "w") as f:
+            f.write(
+                f"%NAME%\n{name}\n\n"
+                f"%VERSION%\n{version}\n\n"
+                "%DESC%\nsynthetic package for benchmarking\n\n"
+                "%ARCH%\nx86_64\n\n"
+                f"%SIZE%\n{1024 * (1 + i % 900)}\n\n"
+                "%DEPENDS%\nglibc\n\n"
+            )
+
+
+def _route_hex(a, b, c, d):
+    # /proc/net/route prints addresses in host (little-endian) byte order
+    return f"{d:02X}{c:02X}{b:02X}{a:02X}"
+
+
+def write_proc_net(proc_root, count):
+    """
+    Writes net/route and net/ipv6_route under proc_root with a default route
+    plus count - 1 further IPv4 routes and a handful of IPv6 ones.
+    """
+    os.makedirs(os.path.join(proc_root, "net"), exist_ok=True)
+    with open(os.path.join(proc_root, "net", "route"), "w") as f:
+        f.write("Iface\tDestination\tGateway \tFlags\tRefCnt\tUse\tMetric\tMask\t\tMTU\tWindow\tIRTT\n")
+        f.write(f"eth0\t00000000\t{_route_hex(10, 0, 0, 1)}\t0003\t0\t0\t100\t00000000\t0\t0\t0\n")
+        for i in range(1, count):
+            destination = _route_hex(10, (i >> 8) & 0xFF, i & 0xFF, 0)
+            f.write(f"eth{i % 4}\t{destination}\t00000000\t0001\t0\t0\t{i % 1000}\t00FFFFFF\t0\t0\t0\n")
+    with open(os.path.join(proc_root, "net", "ipv6_route"), "w") as f:
+        f.write("00000000000000000000000000000000 00 00000000000000000000000000000000 00 "
+                "fe800000000000000000000000000001 00000400 00000001 00000000 00000003 eth0\n")
+        for i in range(min(count, 16)):
+            f.write(f"fd00000000000000{i:016x} 40 00000000000000000000000000000000 00 "
+                    "00000000000000000000000000000000 00000100 00000001 00000000 00000001 eth0\n")
+
+
+def write_resolv_conf(path, nameservers=3):
+    with open(path, "w") as f:
+        f.write("# Generated for benchmarking\nsearch example.invalid corp.example.invalid\n")
+        for i in range(nameservers):
+            f.write(f"nameserver 10.0.0.{i + 53}\n")
+        f.write("options edns0 trust-ad\n")
+
+
+def write_os_release(path):
+    with open(path, "w") as f:
+        f.write(
+            'PRETTY_NAME="Synthetic Linux 1.0 (benchmark)"\n'
+            'NAME="Synthetic Linux"\n'
+            'VERSION_ID="1.0"\n'
+            'VERSION="1.0 (benchmark)"\n'
+            "ID=synthetic\n"
+            "ID_LIKE=debian\n"
+            'HOME_URL="https://example.invalid/"\n'
+        )
+
+
+def _ipconfig_field(label, value):
+    # ipconfig pads labels with dot leaders on alternate columns up to the colon
+    leader = label + "".join("." if column % 2 else " " for column in range(len(label), 32))
+    return f"   {leader} : {value}\n"
+
+
+def _ipconfig_continuation(value):
+    return " " * 38 + value + "\n"
+
+
+def write_ipconfig_all(path, adapters, seed=0):
+    """
+    Writes `ipconfig /all` output (English, CRLF line endings like the real
+    command) with adapters network adapters. Every third adapter is
+    disconnected; connected ones have several DNS servers and gateways on
+    continuation lines, and many adapters share the same DNS servers.
+    """
+    rng = random.Random(seed)
+    with open(path, "w", encoding="latin-1", newline="\r\n") as f:
+        f.write("\nWindows IP Configuration\n\n")
+        f.write(_ipconfig_field("Host Name", "BENCH-HOST"))
+        f.write(_ipconfig_field("Primary Dns Suffix", "corp.example.invalid"))
+        f.write(_ipconfig_field("Node Type", "Hybrid"))
+        f.write(_ipconfig_field("IP Routing Enabled", "No"))
+        f.write(_ipconfig_field("DNS Suffix Search List", "corp.example.invalid"))
+        f.write(_ipconfig_continuation("example.invalid"))
+        for i in range(adapters):
+            kind = rng.choice(("Ethernet", "Wireless LAN", "Tunnel"))
+            f.write(f"\n{kind} adapter Adapter {i}:\n\n")
+            mac = "-".join(f"{rng.randrange(256):02X}" for _ in range(6))
+            if i % 3 == 2:
+                f.write(_ipconfig_field("Media State", "Media disconnected"))
+                f.write(_ipconfig_field("Connection-specific DNS Suffix", ""))
+                f.write(_ipconfig_field("Description", f"Synthetic {kind} Adapter #{i}"))
+                f.write(_ipconfig_field("Physical Address", mac))
+                continue
+            subnet = i % 250
+            f.write(_ipconfig_field("Connection-specific DNS Suffix", "corp.example.invalid"))
+            f.write(_ipconfig_field("Description", f"Synthetic {kind} Adapter #{i}"))
+            f.write(_ipconfig_field("Physical Address", mac))
+            f.write(_ipconfig_field("DHCP Enabled", "Yes"))
+            f.write(_ipconfig_field("Autoconfiguration Enabled", "Yes"))
+            f.write(_ipconfig_field("Link-local IPv6 Address", f"fe80::{i:x}:1%{i + 2}(Preferred)"))
+            f.write(_ipconfig_field("IPv4 Address", f"10.{subnet}.0.{2 + i % 200}(Preferred)"))
+            f.write(_ipconfig_field("Subnet Mask", "255.255.255.0"))
+            f.write(_ipconfig_field("Lease Obtained", "Monday, January 5, 2026 8:00:00 AM"))
+            f.write(_ipconfig_field("Default Gateway", f"fe80::{i:x}:ffff%{i + 2}"))
+            f.write(_ipconfig_continuation(f"10.{subnet}.0.1"))
+            f.write(_ipconfig_field("DHCP Server", f"10.{subnet}.0.1"))
+            f.write(_ipconfig_field("DHCPv6 IAID", str(100000 + i)))
+            f.write(_ipconfig_field("DNS Servers", f"10.{subnet % 4}.0.53"))
+            for n in range(rng.randint(1, 3)):
+                f.write(_ipconfig_continuation(f"10.{subnet % 4}.{n + 1}.53"))
+            f.write(_ipconfig_continuation("fec0:0:0:ffff::1%1"))
+            f.write(_ipconfig_field("NetBIOS over Tcpip", "Enabled"))
+
+
+def make_diagnostics_document(packages, seed=0):
+    """
+    Builds a run_system_diagnostics()-shaped document with packages installed
+    applications, a matching share of security processes and a few dozen
+    interfaces.
+    """
+    rng = random.Random(seed)
+    interfaces = {}
+    for i in range(32):
+        interfaces[f"veth{i:04x}"] = {
+            "ipv4_addresses": [{"address": f"10.{i}.0.2", "netmask": "255.255.255.0", "broadcast": f"10.{i}.0.255"}],
+            "ipv6_addresses": [{"address": f"fe80::{i:x}:1%veth{i:04x}", "netmask": "ffff:ffff:ffff:ffff::"}],
+            "mac_address": ":".join(f"{rng.randrange(256):02x}" for _ in range(6)),
+            "status": "up", "speed_mbps": 10000, "mtu": 1500,
+        }
+    security = []
+    for pid in range(1, packages // 10 + 1):
+        name = rng.choice(_SECURITY_PROCESS_NAMES)
+        security.append({"pid": pid, "name": name, "exe": f"/usr/bin/{name}", "cmdline": f"/usr/bin/{name} -f",
+                         "category": "security", "matched_keyword": name})
+    return {
+        "network_environment": {"hostname": "bench-host", "interfaces": interfaces, "default_gateway": "10.0.0.1",
+                                "dns_servers": ["10.0.0.53", "10.1.0.53"]},
+        "os_info": {"system": "Linux", "release": "6.1.0", "architecture": "x86_64",
+                    "distribution": {"id": "debian", "version_id": "12"}},
+        "installed_applications": [f"synthetic-package-{i} ({i % 7}.{i % 13}.{i % 101}-1)" for i in range(packages)],
+        "vm_detection": {"is_vm": True, "hypervisor": "kvm"},
+        "security_processes": security,
+    }
+
+
+def _rtattr(attr_type, payload):
+    data = struct.pack("=HH", 4 + len(payload), attr_type) + payload
+    return data + b"\0" * (-len(data) % 4)
+
+
+def _nlmsg(msg_type, payload):
+    return struct.pack("=IHHII", 16 + len(payload), msg_type, 2, 1, 0) + payload # NLM_F_MULTI
+
+
+def _pack_dump(messages, buffer_size=32768):
+    # Batches messages into buffers like the kernel fills a dump's recv()s
+    buffers, current = [], b""
+    for message in messages + [_nlmsg(rtnl.NLMSG_DONE, struct.pack("=i", 0))]:
+        if current and len(current) + len(message) > buffer_size:
+            buffers.append(current)
+            current = b""
+        current += message
+    buffers.append(current)
+    return buffers
+
+
+def make_rtnetlink_dumps(count, seed=0):
+    """
+    Builds (link dump, address dump) buffers for count interfaces, shaped like
+    a Kubernetes node: loopback, two NICs and veths, half of them with an
+    address. Link messages carry filler attributes so they are about as long
+    as real ones.
+    """
+    rng = random.Random(seed)
+    filler_before = b"".join(_rtattr(t, struct.pack("=I", 0)) for t in range(30, 45))
+    filler_after = b"".join(_rtattr(t, struct.pack("=I", 0)) for t in range(45, 60)) + _rtattr(26, bytes(600)) # AF_SPEC
+    links, addresses = [], []
+    for index in range(1, count + 1):
+        if index == 1:
+            name, kind, flags, if_type = "lo", None, rtnl.IFF_UP | rtnl.IFF_RUNNING | rtnl.IFF_LOOPBACK, 772
+        elif index <= 3:
+            name, kind, flags, if_type = f"eth{index - 2}", None, rtnl.IFF_UP | rtnl.IFF_RUNNING, 1
+        else:
+            name, kind, flags, if_type = f"veth{index:05x}", b"veth", rtnl.IFF_UP | rtnl.IFF_RUNNING, 1
+        attrs = _rtattr(rtnl.IFLA_IFNAME, name.encode() + b"\0")
+        attrs += _rtattr(rtnl.IFLA_OPERSTATE, bytes((6 if rng.random() < 0.9 else 2,)))
+        attrs += _rtattr(rtnl.IFLA_MTU, struct.pack("=I", 1500))
+        attrs += filler_before
+        attrs += _rtattr(rtnl.IFLA_ADDRESS, bytes(rng.randrange(256) for _ in range(6)))
+        attrs += _rtattr(rtnl.IFLA_STATS64, struct.pack("=24Q", *(rng.randrange(1 << 32) for _ in range(24))))
+        if kind is not None:
+            attrs += _rtattr(rtnl.IFLA_LINKINFO | 0x8000, _rtattr(rtnl.IFLA_INFO_KIND, kind + b"\0"))
+        attrs += filler_after
+        links.append(_nlmsg(rtnl.RTM_NEWLINK, struct.pack("=BxHiII", socket.AF_UNSPEC, if_type, index, flags, 0)
+                            + attrs))
+        if index <= 3 or index % 2 == 0:
+            address = socket.inet_pton(socket.AF_INET, f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}")
+            addresses.append(_nlmsg(rtnl.RTM_NEWADDR, struct.pack("=BBBBI", socket.AF_INET, 24, 0, 0, index)
+                                    + _rtattr(rtnl.IFA_ADDRESS, address) + _rtattr(rtnl.IFA_LOCAL, address)))
+            address6 = socket.inet_pton(socket.AF_INET6, f"fe80::{index:x}:1")
+            addresses.append(_nlmsg(rtnl.RTM_NEWADDR, struct.pack("=BBBBI", socket.AF_INET6, 64, 0, 253, index)
+                                    + _rtattr(rtnl.IFA_ADDRESS, address6)))
+    return _pack_dump(links), _pack_dump(addresses)
@@ -0,0 +1,459 @@
+# binary_snapshot.py
+# Compact binary form of a run_system_diagnostics() document, for fleets that
+# keep millions of results around. Every string (keys, package names, paths) is
+# stored once in a string table and referenced by number, every container is
+# length-prefixed, and an index at the end points at each top-level section. A
+# reader maps the file and decodes only the sections it is asked for.
+#
+# Layout (all integers little-endian):
+#
+#   header   MAGIC, u16 version, u16 flags, u32 section count,
+#            u64 string table offset, u64 index offset
+#   sections one encoded value per section, back to back
+#   strings  u32 count, u32 end offset of each string, the UTF-8 strings
+#            separated by NUL bytes
+#   index    per section: u32 name (string id), u64 offset, u64 length
+#
+# Values are a tag byte followed by:
+#
+#   null/false/true  nothing
+#   int32/int64      the integer; larger integers as a string id (bigint)
+#   float            f64
+#   string           u32 string id
+#   list             u32 item count, u32 byte length, items
+#   string list      u32 item count, u32 string id per item (lists of strings
+#                    only, e.g. package labels: decoded in one step)
+#   dict             u32 item count, u32 byte length, (u32 key id, value) pairs
+import array
+import json
+import mmap
+import struct
+import sys
+
+BINARY_SNAPSHOT_VERSION = 1
+
+MAGIC = b"TWSNAP\0\0"
+
+# File name suffix of binary snapshots (recognized by --aggregate).
+BINARY_SNAPSHOT_SUFFIX = ".twsnap"
+
+_HEADER = struct.Struct("<8sHHIQQ")
+_INDEX_ENTRY = struct.Struct("<IQQ")
+_U32 = struct.Struct("<I")
+_I32 = struct.Struct("<i")
+_I64 = struct.Struct("<q")
+_F64 = struct.Struct("<d")
+_CONTAINER = struct.Struct("<II")
+
+(T_NULL, T_FALSE, T_TRUE, T_INT32, T_INT64, T_BIGINT,
+ T_FLOAT, T_STRING, T_LIST, T_DICT, T_STRING_LIST) = range(11)
+
+# Header flag: no string contains a NUL, so the whole table can be decoded
+# with one split.
+FLAG_NUL_FREE_STRINGS = 1
+
+# A string list at least this long has the reader decode the whole string
+# table at once instead of string by string.
+BULK_DECODE_MIN_STRINGS = 256
+
+_INT32_MIN, _INT32_MAX = -2 ** 31, 2 ** 31 - 1
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def _u32_array(values=()):
+    # array('I') is 4 bytes on every platform Python supports; stored little-endian
+    result = array.array("I", values)
+    if sys.byteorder == "big":
+        result.byteswap()
+    return result
+
+
+def _read_u32_array(data, offset, count):
+    result = array.array("I")
+    result.frombytes(data[offset:offset + 4 * count])
+    if sys.byteorder == "big":
+        result.byteswap()
+    return result
+
+
+class SnapshotFormatError(ValueError):
+    """Raised for data that is not a (supported) binary snapshot."""
+
+
+def _json_key(key):
+    # Dict keys become strings the way json.dumps() converts them, so a binary
+    # snapshot decodes to exactly what the JSON output would parse back to
+    if isinstance(key, str):
+        return key
+    if key is True or key is False or key is None or isinstance(key, (int, float)):
+        return json.dumps(key)
+    raise TypeError(f"keys must be str, int, float, bool or None, not {type(key).__name__}")
+
+
+class _Encoder:
+    def __init__(self):
+        self.strings = {} # str -> id
+        self.buffer = bytearray()
+
+    def intern(self, text):
+        string_id = self.strings.get(text)
+        if string_id is None:
+            string_id = self.strings[text] = len(self.strings)
+        return string_id
+
+    def encode(self, value):
+        out = self.buffer
+        if value is None:
+            out.append(T_NULL)
+        elif value is True:
+            out.append(T_TRUE)
+        elif value is False:
+            out.append(T_FALSE)
+        elif isinstance(value, str):
+            out.append(T_STRING)
+            out += _U32.pack(self.intern(value))
+        elif isinstance(value, int):
+            if _INT32_MIN <= value <= _INT32_MAX:
+                out.append(T_INT32)
+                out += _I32.pack(value)
+            elif _INT64_MIN <= value <= _INT64_MAX:
+                out.append(T_INT64)
+                out += _I64.pack(value)
+            else:
+                out.append(T_BIGINT)
+                out += _U32.pack(self.intern(str(value)))
+        elif isinstance(value, float):
+            out.append(T_FLOAT)
+            out += _F64.pack(value)
+        elif isinstance(value, dict):
+            out.append(T_DICT)
+            start = len(out)
+            out += _CONTAINER.pack(len(value), 0) # Byte length filled in below
+            for key, child in value.items():
+                out += _U32.pack(self.intern(_json_key(key)))
+                self.encode(child)
+            _CONTAINER.pack_into(out, start, len(value), len(out) - start - _CONTAINER.size)
+        elif isinstance(value, (list, tuple)) and value and all(isinstance(item, str) for item in value):
+            out.append(T_STRING_LIST)
+            out += _U32.pack(len(value))
+            out += _u32_array([self.intern(item) for item in value]).tobytes()
+        elif isinstance(value, (list, tuple)):
+            out.append(T_LIST)
+            start = len(out)
+            out += _CONTAINER.pack(len(value), 0)
+            for child in value:
+                self.encode(child)
+            _CONTAINER.pack_into(out, start, len(value), len(out) - start - _CONTAINER.size)
+        else:
+            raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(document):
+    """
+    Encodes a diagnostics document (a dict of sections holding JSON-compatible
+    values) as a binary snapshot and returns the bytes.
+    """
+    if not isinstance(document, dict):
+        raise TypeError("a snapshot document must be a dict of sections")
+    encoder = _Encoder()
+    encoder.buffer += bytes(_HEADER.size)
+    index = []
+    for name, value in document.items():
+        offset = len(encoder.buffer)
+        encoder.encode(value)
+        index.append((encoder.intern(_json_key(name)), offset, len(encoder.buffer) - offset))
+
+    out = encoder.buffer
+    strings_offset = len(out)
+    encoded = [text.encode("utf-8", "surrogatepass") for text in encoder.strings]
+    out += _U32.pack(len(encoded))
+    ends, end = [], -1
+    for data in encoded:
+        end += len(data) + 1 # The separator before it
+        ends.append(end)
+    out += _u32_array(ends).tobytes()
+    out += b"\0".join(encoded)
+    flags = 0 if any(b"\0" in data for data in encoded) else FLAG_NUL_FREE_STRINGS
+
+    index_offset = len(out)
+    for entry in index:
+        out += _INDEX_ENTRY.pack(*entry)
+    _HEADER.pack_into(out, 0, MAGIC, BINARY_SNAPSHOT_VERSION, flags, len(index), strings_offset, index_offset)
+    return bytes(out)
+
+
+def dump(document, path):
+    """Writes document to path as a binary snapshot."""
+    data = dumps(document)
+    with open(path, "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+def is_binary_snapshot(path):
+    """True if path starts with the binary snapshot magic."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class BinarySnapshot:
+    """
+    Read access to a binary snapshot without decoding it as a whole.
+
+    The file is memory-mapped; opening it only reads the header and the
+    section index. Strings are decoded the first time a section refers to
+    them and then shared between sections.
+
+    Args:
+        source: Path of a snapshot file, or the snapshot as bytes.
+    """
+
+    def __init__(self, source):
+        self._mmap = None
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            self._data = bytes(source)
+        else:
+            with open(source, "rb") as f:
+                try:
+                    self._data = self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except ValueError:
+                    self._data = b"" # Empty file: rejected below
+        data = self._data
+        if len(data) < _HEADER.size:
+            self.close()
+            raise SnapshotFormatError("not a binary snapshot (file too short)")
+        magic, version, flags, section_count, strings_offset, index_offset = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            self.close()
+            raise SnapshotFormatError("not a binary snapshot (bad magic)")
+        if version != BINARY_SNAPSHOT_VERSION:
+            self.close()
+            raise SnapshotFormatError(f"binary snapshot version {version} is not supported")
+        if index_offset + section_count * _INDEX_ENTRY.size > len(data) or strings_offset + 4 > index_offset:
+            self.close()
+            raise SnapshotFormatError("truncated binary snapshot")
+
+        string_count = _U32.unpack_from(data, strings_offset)[0]
+        self._string_ends = strings_offset + 4 # Offset of the end offsets
+        self._string_base = strings_offset + 4 + 4 * string_count
+        # Every string lies between the string base and the index; the end
+        # offsets are checked against this as strings are decoded
+        self._string_limit = index_offset - self._string_base
+        if self._string_limit < 0:
+            self.close()
+            raise SnapshotFormatError("truncated binary snapshot (string table)")
+        self._strings = [None] * string_count
+        self._bulk_decode = bool(flags & FLAG_NUL_FREE_STRINGS) and string_count > 0
+        self._index = {} # section name -> (offset, length)
+        try:
+            for i in range(section_count):
+                name_id, offset, length = _INDEX_ENTRY.unpack_from(data, index_offset + i * _INDEX_ENTRY.size)
+                if offset < _HEADER.size or length < 1 or offset + length > strings_offset:
+                    raise SnapshotFormatError(f"section {i} lies outside the section area")
+                self._index[self._string(name_id)] = (offset, length)
+        except SnapshotFormatError:
+            self.close()
+            raise
+
+    def _string(self, string_id):
+        try:
+            text = self._strings[string_id]
+        except IndexError:
+            raise SnapshotFormatError(f"string id {string_id} out of range "
+                                      f"(the snapshot has {len(self._strings)} strings)") from None
+        if text is None:
+            if string_id:
+                start, end = _CONTAINER.unpack_from(self._data, self._string_ends + 4 * (string_id - 1))
+                start += 1
+            else:
+                start, end = 0, _U32.unpack_from(self._data, self._string_ends)[0]
+            if not start <= end <= self._string_limit:
+                raise SnapshotFormatError(f"string {string_id} lies outside the string table")
+            base = self._string_base
+            try:
+                text = self._data[base + start:base + end].decode("utf-8", "surrogatepass")
+            except UnicodeDecodeError as e:
+                raise SnapshotFormatError(f"string {string_id} is not valid UTF-8: {e}") from None
+            self._strings[string_id] = text
+        return text
+
+    def _decode_all_strings(self):
+        # One decode and one split instead of a slice and a decode per string
+        if self._bulk_decode:
+            self._bulk_decode = False
+            end = _U32.unpack_from(self._data, self._string_ends + 4 * (len(self._strings) - 1))[0]
+            if end > self._string_limit:
+                raise SnapshotFormatError("string table runs past its end")
+            try:
+                strings = self._data[self._string_base:self._string_base + end].decode("utf-8", "surrogatepass")
+            except UnicodeDecodeError as e:
+                raise SnapshotFormatError(f"string table is not valid UTF-8: {e}") from None
+            strings = strings.split("\0")
+            if len(strings) != len(self._strings):
+                raise SnapshotFormatError(f"string table holds {len(strings)} strings, "
+                                          f"expected {len(self._strings)}")
+            self._strings = strings
+
+    def _decode(self, pos):
+        # Returns (value, position after it)
+        data = self._data
+        tag = data[pos]
+        pos += 1
+        if tag == T_STRING:
+            return self._string(_U32.unpack_from(data, pos)[0]), pos + 4
+        if tag == T_INT32:
+            return _I32.unpack_from(data, pos)[0], pos + 4
+        if tag == T_DICT:
+            count, _ = _CONTAINER.unpack_from(data, pos)
+            pos += _CONTAINER.size
+            result = {}
+            string, decode, unpack_u32 = self._string, self._decode, _U32.unpack_from
+            for _ in range(count):
+                key = string(unpack_u32(data, pos)[0])
+                if data[pos + 4] == T_STRING: # Most values are strings: skip the call
+                    result[key] = string(unpack_u32(data, pos + 5)[0])
+                    pos += 9
+                else:
+                    result[key], pos = decode(pos + 4)
+            return result, pos
+        if tag == T_LIST:
+            count, _ = _CONTAINER.unpack_from(data, pos)
+            pos += _CONTAINER.size
+            result = []
+            for _ in range(count):
+                item, pos = self._decode(pos)
+                result.append(item)
+            return result, pos
+        if tag == T_STRING_LIST:
+            count = _U32.unpack_from(data, pos)[0]
+            if pos + 4 + 4 * count > len(data):
+                raise SnapshotFormatError(f"string list at offset {pos - 1} runs past the end of the snapshot")
+            if count >= BULK_DECODE_MIN_STRINGS:
+                self._decode_all_strings()
+            string = self._string
+            return [string(i) for i in _read_u32_array(data, pos + 4, count)], pos + 4 + 4 * count
+        if tag == T_NULL:
+            return None, pos
+        if tag == T_TRUE:
+            return True, pos
+        if tag == T_FALSE:
+            return False, pos
+        if tag == T_FLOAT:
+            return _F64.unpack_from(data, pos)[0], pos + 8
+        if tag == T_INT64:
+            return _I64.unpack_from(data, pos)[0], pos + 8
+        if tag == T_BIGINT:
+            text = self._string(_U32.unpack_from(data, pos)[0])
+            try:
+                return int(text), pos + 4
+            except ValueError:
+                raise SnapshotFormatError(f"bad integer {text!r} at offset {pos - 1}") from None
+        raise SnapshotFormatError(f"unknown value tag {tag} at offset {pos - 1}")
+
+    def sections(self):
+        """Returns the section names in the order they were written."""
+        return list(self._index)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def section_size(self, name):
+        """Encoded size of a section in bytes (without the shared strings)."""
+        return self._index[name][1]
+
+    def section(self, name, default=None):
+        """Decodes one section; default if the snapshot has no such section."""
+        entry = self._index.get(name)
+        if entry is None:
+            return default
+        try:
+            return self._decode(entry[0])[0]
+        except (struct.error, IndexError, RecursionError) as e:
+            raise SnapshotFormatError(f"corrupt section {name!r}: {e}") from None
+
+    def iter_items(self, name):
+        """
+        Yields the items of a list section (or the (key, value) pairs of a dict
+        section) one at a time, decoding each only when it is reached.
+        Nothing is yielded for a missing section or a scalar one.
+        """
+        entry = self._index.get(name)
+        if entry is None:
+            return
+        try:
+            yield from self._iter_items(entry[0])
+        except (struct.error, IndexError, RecursionError) as e:
+            raise SnapshotFormatError(f"corrupt section {name!r}: {e}") from None
+
+    def _iter_items(self, pos):
+        data = self._data
+        tag = data[pos]
+        if tag == T_STRING_LIST:
+            count = _U32.unpack_from(data, pos + 1)[0]
+            if pos + 5 + 4 * count > len(data):
+                raise SnapshotFormatError(f"string list at offset {pos} runs past the end of the snapshot")
+            for string_id in _read_u32_array(data, pos + 5, count):
+                yield self._string(string_id)
+            return
+        if tag not in (T_LIST, T_DICT):
+            return
+        count, _ = _CONTAINER.unpack_from(data, pos + 1)
+        pos += 1 + _CONTAINER.size
+        for _ in range(count):
+            if tag == T_DICT:
+                key = self._string(_U32.unpack_from(data, pos)[0])
+                value, pos = self._decode(pos + 4)
+                yield key, value
+            else:
+                item, pos = self._decode(pos)
+                yield item
+
+    def to_dict(self, names=None):
+        """Decodes every section (or only those in names) into a document."""
+        return {name: self.section(name) for name in self._index if names is None or name in names}
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._data = b""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load(path, names=None):
+    """Reads a binary snapshot file into a document (only the sections in names, if given)."""
+    with BinarySnapshot(path) as snapshot:
+        return snapshot.to_dict(names)
+
+
+def loads(data, names=None):
+    """Decodes binary snapshot bytes into a document."""
+    with BinarySnapshot(data) as snapshot:
+        return snapshot.to_dict(names)
+
+
+def convert(source, destination):
+    """
+    Converts a snapshot between the two formats: a binary snapshot becomes
+    indented JSON like the CLI prints, anything else is read as a JSON
+    document and written in binary. Returns the format written ('json' or
+    'binary').
+    """
+    if is_binary_snapshot(source):
+        document = load(source)
+        with open(destination, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+            f.write("\n")
+        return "json"
+    with open(source, "r", encoding="utf-8") as f:
+        document = json.load(f)
+    dump(document, destination)
+    return "binary"
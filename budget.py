@@ -0,0 +1,237 @@
+# budget.py
+# Resource caps for running the collectors on latency-sensitive hosts: a CPU
+# and wall-time budget per run, a lower CPU and I/O priority for the run and
+# every command it starts, and a cap on how fast the process table is walked.
+# Collectors check the budget at natural stopping points (between processes,
+# packages, collectors) and return what they have when it runs out; the run is
+# then reported as partial instead of failing.
+import contextlib
+import os
+import threading
+import time
+
+from instrumentation import count, current_collector
+
+# Credit a RateLimiter builds up while idle, in seconds of its rate.
+RATE_BURST_SECONDS = 0.05
+
+# Items (processes, packages) between two budget checks in tight loops.
+CHECK_EVERY = 64
+
+
+class BudgetExceeded(Exception):
+    """Raised for a collector that could not start because the budget was used up."""
+
+
+class RateLimiter:
+    """
+    Paces calls to acquire() to rate per second. Short bursts are allowed, and
+    the caller only sleeps once it is more than ~10 ms ahead, so pacing a fast
+    loop doesn't turn into one sleep per item.
+    """
+
+    def __init__(self, rate):
+        if not rate > 0:
+            raise ValueError(f"rate must be positive, not {rate!r}")
+        self.rate = rate
+        self.slept_seconds = 0.0
+        self._interval = 1.0 / rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, max_wait=None):
+        """Waits for the next slot (at most max_wait seconds). Returns True if it slept."""
+        with self._lock:
+            now = time.monotonic()
+            self._next = max(self._next, now - RATE_BURST_SECONDS) + self._interval
+            delay = self._next - now
+        if max_wait is not None:
+            delay = min(delay, max_wait)
+        if delay <= 0.01:
+            return False
+        time.sleep(delay)
+        with self._lock:
+            self.slept_seconds += delay
+        return True
+
+
+class RunBudget:
+    """
+    Limits for one diagnostics run.
+
+    Args:
+        cpu_seconds: CPU time (this process plus finished child commands) after
+                     which collectors stop early.
+        wall_seconds: Wall time after which collectors stop early; also caps
+                      every collector's deadline.
+        nice: CPU niceness (Unix, 0-19) for this process and the commands it
+              starts; on Windows any value selects below-normal priority.
+        idle_io: Put this process and its commands in the idle I/O class
+                 (Linux; low I/O priority on Windows; needs psutil).
+        process_rate: Processes read per second at most while walking the
+                      process table.
+    """
+
+    def __init__(self, cpu_seconds=None, wall_seconds=None, nice=None, idle_io=False, process_rate=None):
+        self.cpu_seconds = cpu_seconds
+        self.wall_seconds = wall_seconds
+        self.nice = nice
+        self.idle_io = idle_io
+        self.limiter = RateLimiter(process_rate) if process_rate is not None else None
+        self.exhausted_by = None
+        self.partial = {} # collector -> what was cut short
+        self.skipped = []
+        self.priority = {}
+        self._lock = threading.Lock()
+        self._wall_started = time.monotonic()
+        self._cpu_started = self._cpu_time()
+
+    @staticmethod
+    def _cpu_time():
+        t = os.times()
+        return t.user + t.system + t.children_user + t.children_system
+
+    def cpu_used(self):
+        return self._cpu_time() - self._cpu_started
+
+    def wall_used(self):
+        return time.monotonic() - self._wall_started
+
+    def remaining_wall(self):
+        """Seconds left of the wall budget, or None without one."""
+        if self.wall_seconds is None:
+            return None
+        return max(0.0, self.wall_seconds - self.wall_used())
+
+    def exhausted(self):
+        """Returns 'cpu' or 'wall' once either budget is used up, else None."""
+        if self.exhausted_by is None:
+            if self.cpu_seconds is not None and self.cpu_used() >= self.cpu_seconds:
+                self.exhausted_by = "cpu"
+            elif self.wall_seconds is not None and self.wall_used() >= self.wall_seconds:
+                self.exhausted_by = "wall"
+        return self.exhausted_by
+
+    def note_partial(self, what):
+        """Marks the current collector's result as incomplete because what was cut short."""
+        name = current_collector() or what
+        with self._lock:
+            reasons = self.partial.setdefault(name, [])
+            if what not in reasons:
+                reasons.append(what)
+        count("budget_truncations")
+
+    def lower_priority(self):
+        """
+        Applies nice and idle_io to this process. Commands started afterwards
+        inherit both. Returns what was applied (or why not) per setting.
+        """
+        if self.nice is not None:
+            try:
+                if hasattr(os, "setpriority"):
+                    os.setpriority(os.PRIO_PROCESS, 0, max(self.nice, os.getpriority(os.PRIO_PROCESS, 0)))
+                    self.priority["nice"] = os.getpriority(os.PRIO_PROCESS, 0)
+                else:
+                    import psutil
+                    psutil.Process().nice(psutil.BELOW_NORMAL_PRIORITY_CLASS)
+                    self.priority["nice"] = "below_normal"
+            except (ImportError, OSError, AttributeError) as e:
+                self.priority["nice_error"] = str(e)
+        if self.idle_io:
+            try:
+                import psutil
+                proc = psutil.Process()
+                if hasattr(psutil, "IOPRIO_CLASS_IDLE"):
+                    proc.ionice(psutil.IOPRIO_CLASS_IDLE)
+                    self.priority["io"] = "idle"
+                else:
+                    proc.ionice(psutil.IOPRIO_LOW)
+                    self.priority["io"] = "low"
+            except (ImportError, OSError, AttributeError) as e:
+                # psutil missing, macOS (no ionice) or not permitted
+                self.priority["io_error"] = str(e)
+        return dict(self.priority)
+
+    def bind(self, name, func, timeout):
+        """
+        Wraps a collector function: it is skipped (BudgetExceeded) if the
+        budget is already used up when its turn comes, and its deadline
+        (timeout, for command_runner.CommandRunner.bind()) shrinks to the wall
+        time left. func takes the deadline and returns the collector's result.
+        """
+        def bound():
+            if self.exhausted():
+                with self._lock:
+                    self.skipped.append(name)
+                raise BudgetExceeded(f"{self.exhausted_by} budget used up before {name} started")
+            remaining = self.remaining_wall()
+            return func(timeout if remaining is None else min(timeout, remaining))
+        return bound
+
+    def report(self):
+        """Limits, usage and what was cut short, for a run's '_budget' section."""
+        with self._lock:
+            return {
+                "cpu_seconds_limit": self.cpu_seconds,
+                "wall_seconds_limit": self.wall_seconds,
+                "cpu_seconds_used": round(self.cpu_used(), 6),
+                "wall_seconds_used": round(self.wall_used(), 6),
+                "exhausted": self.exhausted_by,
+                "partial": bool(self.exhausted_by or self.partial or self.skipped),
+                "partial_collectors": {name: list(reasons) for name, reasons in self.partial.items()},
+                "skipped_collectors": list(self.skipped),
+                "throttled_seconds": round(self.limiter.slept_seconds, 6) if self.limiter else 0.0,
+                "priority": dict(self.priority),
+            }
+
+
+# Budget of the run in progress, if any. Runs are one per process (CLI) or
+# unbudgeted (agent), so a module-level slot is enough.
+_active = None
+
+
+def get_active_budget():
+    return _active
+
+
+@contextlib.contextmanager
+def activate(budget):
+    """Makes budget the one checkpoint() and throttle() consult, for the duration."""
+    global _active
+    previous, _active = _active, budget
+    try:
+        yield budget
+    finally:
+        _active = previous
+
+
+def checkpoint(what):
+    """
+    Returns True if work may continue. Once the active budget is used up it
+    returns False and marks the current collector as partial because of what.
+    Always True without an active budget.
+    """
+    budget = _active
+    if budget is None or not budget.exhausted():
+        return True
+    budget.note_partial(what)
+    return False
+
+
+def note_partial(what):
+    """Marks the current collector as partial under the active budget, if any."""
+    budget = _active
+    if budget is not None:
+        budget.note_partial(what)
+
+
+def throttle():
+    """
+    Waits as needed to keep process-table reads within the active budget's
+    rate, but never past its wall time. Returns True if it waited, so callers
+    can check the budget right after.
+    """
+    budget = _active
+    if budget is None or budget.limiter is None:
+        return False
+    return budget.limiter.acquire(budget.remaining_wall())
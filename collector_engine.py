@@ -0,0 +1,205 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+from instrumentation import measure
+
+# Default deadline (in seconds) for a single collector. Collectors that shell out
+# to package managers can legitimately take a while, so this is deliberately generous.
+DEFAULT_COLLECTOR_TIMEOUT = 30
+
+
+class Collector:
+    """
+    Describes one independent unit of work for run_collectors().
+
+    Attributes:
+        name: Key used for the collector in the result dict.
+        func: Zero-argument callable that performs the collection.
+        timeout: Deadline in seconds, measured from the start of the run.
+    """
+    __slots__ = ("name", "func", "timeout")
+
+    def __init__(self, name, func, timeout=DEFAULT_COLLECTOR_TIMEOUT):
+        self.name = name
+        self.func = func
+        self.timeout = timeout
+
+
+def _run_one(collector):
+    started = time.perf_counter()
+    entry = {"status": "ok", "result": None}
+    with measure(collector.name) as metrics:
+        try:
+            entry["result"] = collector.func()
+        except Exception as e:
+            entry["status"] = "error"
+            entry["error"] = str(e)
+    entry["elapsed_seconds"] = round(time.perf_counter() - started, 6)
+    entry["metrics"] = metrics.as_dict()
+    return entry
+
+
+def _work(work):
+    while True:
+        try:
+            collector, future = work.get_nowait()
+        except queue.Empty:
+            return
+        if future.set_running_or_notify_cancel():
+            try:
+                future.set_result(_run_one(collector))
+            except Exception as e: # measure() itself failing; _run_one catches the collector's own errors
+                future.set_exception(e)
+
+
+def run_collectors(collectors, max_workers=None):
+    """
+    Runs independent collectors at the same time on daemon worker threads.
+
+    Every collector gets its own deadline, measured from the start of the run.
+    A collector that misses its deadline is reported as timed out and the run
+    moves on without it; Python threads cannot be killed, so the worker keeps
+    running in the background until its blocking call returns. The workers are
+    daemon threads, so a stuck collector never delays interpreter exit.
+
+    Args:
+        collectors: Iterable of Collector objects.
+        max_workers: Number of worker threads. Defaults to one thread per collector so
+                     that no collector waits in the queue behind another.
+
+    Returns:
+        dict: Maps each collector name to a dict containing:
+              'status': 'ok', 'error' or 'timeout'
+              'result': The collector's return value (None unless 'ok')
+              'elapsed_seconds': Wall time spent in the collector
+              'timeout_seconds': The deadline that applied
+              'metrics': instrumentation.Metrics.as_dict() of the run (not
+                         for 'timeout', the collector is still running)
+              'error': Error message (only for 'error' and 'timeout')
+    """
+    collectors = list(collectors)
+    results = {}
+    if not collectors:
+        return results
+
+    # Daemon workers rather than a ThreadPoolExecutor: the interpreter joins
+    # executor threads at exit, so a collector stuck past its deadline would
+    # still hold the process open until its blocking call returned.
+    work = queue.SimpleQueue()
+    futures = []
+    for collector in collectors:
+        future = Future()
+        futures.append((collector, future))
+        work.put((collector, future))
+    for i in range(min(max_workers or len(collectors), len(collectors))):
+        threading.Thread(target=_work, args=(work,), name=f"collector-{i}", daemon=True).start()
+
+    run_started = time.perf_counter()
+    try:
+        for collector, future in futures:
+            remaining = None
+            if collector.timeout is not None:
+                remaining = max(0.0, collector.timeout - (time.perf_counter() - run_started))
+            try:
+                entry = future.result(timeout=remaining)
+            except TimeoutError:
+                future.cancel()
+                entry = {
+                    "status": "timeout",
+                    "result": None,
+                    "error": f"Collector did not finish within {collector.timeout}s",
+                    "elapsed_seconds": round(time.perf_counter() - run_started, 6),
+                }
+            entry["timeout_seconds"] = collector.timeout
+            results[collector.name] = entry
+    finally:
+        # Collectors still queued behind one that blew its deadline never start.
+        for _, future in futures:
+            future.cancel()
+
+    return results
+
+
+def _stream_one(collector, records, cancelled):
+    started = time.perf_counter()
+    error = None
+    with measure(collector.name) as metrics:
+        try:
+            for record in collector.func():
+                if collector.name in cancelled:
+                    return
+                records.put(("record", collector.name, record))
+        except Exception as e:
+            error = str(e)
+    records.put(("done", collector.name, (error, time.perf_counter() - started, metrics.as_dict())))
+
+
+def stream_collectors(collectors, emit, max_pending=1024):
+    """
+    Streaming counterpart of run_collectors().
+
+    Each collector's func returns an iterable of records. All collectors run at
+    the same time on daemon threads and emit(name, record) is called from the
+    calling thread as soon as a record arrives, so records are never accumulated
+    in memory. The hand-off queue holds at most max_pending records; a collector
+    that gets ahead of the consumer simply blocks.
+
+    Records arriving after a collector's deadline are dropped and the collector
+    is reported as timed out.
+
+    Returns:
+        dict: Maps each collector name to its 'status', 'records',
+              'elapsed_seconds', 'timeout_seconds', 'metrics' (unless timed
+              out) and, if any, 'error'.
+    """
+    collectors = list(collectors)
+    records = queue.Queue(maxsize=max_pending)
+    cancelled = set()
+    results = {c.name: {"status": "running", "records": 0, "timeout_seconds": c.timeout} for c in collectors}
+    run_started = time.perf_counter()
+
+    for collector in collectors:
+        threading.Thread(target=_stream_one, args=(collector, records, cancelled),
+                         name=f"collector-{collector.name}", daemon=True).start()
+
+    pending = {c.name: c for c in collectors}
+    while pending:
+        now = time.perf_counter() - run_started
+        for name, collector in list(pending.items()):
+            if collector.timeout is not None and now >= collector.timeout:
+                cancelled.add(name)
+                del pending[name]
+                results[name].update(status="timeout", elapsed_seconds=round(now, 6),
+                                     error=f"Collector did not finish within {collector.timeout}s")
+        if not pending:
+            break
+
+        deadlines = [c.timeout - now for c in pending.values() if c.timeout is not None]
+        try:
+            kind, name, payload = records.get(timeout=max(0.0, min(deadlines)) if deadlines else None)
+        except queue.Empty:
+            continue
+        if name not in pending:
+            continue # Late record from a collector that already timed out
+        if kind == "record":
+            results[name]["records"] += 1
+            emit(name, payload)
+        else:
+            error, elapsed, metrics = payload
+            del pending[name]
+            results[name]["elapsed_seconds"] = round(elapsed, 6)
+            results[name]["metrics"] = metrics
+            if error is None:
+                results[name]["status"] = "ok"
+            else:
+                results[name].update(status="error", error=error)
+
+    # Unblock any timed-out producer stuck on a full queue so its thread can exit.
+    while True:
+        try:
+            records.get_nowait()
+        except queue.Empty:
+            break
+    return results
@@ -0,0 +1,247 @@
+# command_runner.py
+# Every external command the collectors run goes through here: argv lists, no
+# shell, a timeout on every command and an optional deadline shared by all
+# commands of one collector. Within a diagnostics run identical commands are
+# only executed once, independent commands can run at the same time, and long
+# outputs can be consumed line by line while the command is still running.
+import contextvars
+import os
+import signal
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from instrumentation import SubprocessTimer
+
+# Per-command timeout in seconds when the caller doesn't give one.
+DEFAULT_COMMAND_TIMEOUT = 30
+
+# Commands of one runner executing at the same time through submit().
+DEFAULT_MAX_WORKERS = 4
+
+# (runner, deadline) of the collector running in the current context, if any.
+_scope = contextvars.ContextVar("trainwreck_command_scope", default=None)
+
+
+def _popen(argv, encoding, lifetime):
+    # Each command gets its own process group (POSIX), so a timeout also kills
+    # whatever it forked; those children would otherwise keep the output pipe open.
+    process = subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                               text=True, encoding=encoding, errors="replace", start_new_session=os.name == "posix")
+    lifetime.spawned()
+    return process
+
+
+def _kill(process):
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass # Already gone
+
+
+def _iter_in_context(context, iterator):
+    # Advances a generator inside the context it was created in, so commands it
+    # runs between yields still see the collector's runner and deadline.
+    while True:
+        try:
+            yield context.run(next, iterator)
+        except StopIteration:
+            return
+
+
+class CommandRunner:
+    """
+    Runs external commands without a shell.
+
+    Failures are raised as the exceptions subprocess.check_output() raises:
+    FileNotFoundError when the program isn't installed, CalledProcessError on a
+    non-zero exit status and TimeoutExpired when the command was killed for
+    running past its timeout or the collector's deadline.
+
+    Args:
+        memoize: Run each distinct (argv, encoding) only once and hand every
+                 later caller the same output (or the same exception). Meant
+                 for runners that live as long as one diagnostics run.
+        max_workers: Commands executing at the same time through submit().
+    """
+
+    def __init__(self, memoize=True, max_workers=DEFAULT_MAX_WORKERS):
+        self.memoize = memoize
+        self.max_workers = max_workers
+        self._results = {} # (argv, encoding) -> Future
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def bind(self, func, timeout=None):
+        """
+        Wraps a zero-argument collector function so that the commands it runs
+        (through run_command() and friends) use this runner and all finish
+        within timeout seconds of the call. If func returns a generator, the
+        binding also covers the work done while it is iterated.
+        """
+        def bound():
+            deadline = time.monotonic() + timeout if timeout is not None else None
+            context = contextvars.copy_context()
+            context.run(_scope.set, (self, deadline))
+            result = context.run(func)
+            if hasattr(result, "__next__"):
+                return _iter_in_context(context, result)
+            return result
+        return bound
+
+    @staticmethod
+    def _timeout(timeout):
+        scope = _scope.get()
+        if scope is not None and scope[1] is not None:
+            remaining = scope[1] - time.monotonic()
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        return timeout
+
+    @staticmethod
+    def _execute(argv, timeout, encoding):
+        if timeout is not None and timeout <= 0:
+            raise subprocess.TimeoutExpired(argv, 0)
+        lifetime = SubprocessTimer() # Charged to the collector and step running the command
+        with _popen(argv, encoding, lifetime) as process:
+            try:
+                output, _ = process.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                _kill(process)
+                process.communicate()
+                raise subprocess.TimeoutExpired(argv, timeout) from None
+            except BaseException:
+                _kill(process)
+                raise
+            finally:
+                lifetime.exited()
+        if process.returncode:
+            raise subprocess.CalledProcessError(process.returncode, argv, output)
+        return output
+
+    def _claim(self, argv, encoding):
+        # Returns (future, owner): owner is True if the caller has to run the command.
+        key = (tuple(argv), encoding)
+        with self._lock:
+            future = self._results.get(key) if self.memoize else None
+            if future is not None:
+                return future, False
+            future = Future()
+            if self.memoize:
+                self._results[key] = future
+        return future, True
+
+    def submit(self, argv, timeout=DEFAULT_COMMAND_TIMEOUT, encoding=None):
+        """
+        Starts argv in the background and returns a concurrent.futures.Future
+        of its output, so independent commands run at the same time.
+        """
+        future, owner = self._claim(argv, encoding)
+        if owner:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="command")
+            timeout = self._timeout(timeout)
+            # Run in a copy of the caller's context, so the subprocess is still
+            # charged to the collector that asked for it.
+            context = contextvars.copy_context()
+            self._executor.submit(context.run, self._fill, future, argv, timeout, encoding)
+        return future
+
+    def _fill(self, future, argv, timeout, encoding):
+        try:
+            future.set_result(self._execute(argv, timeout, encoding))
+        except BaseException as e:
+            future.set_exception(e)
+
+    def run(self, argv, timeout=DEFAULT_COMMAND_TIMEOUT, encoding=None):
+        """Runs argv and returns its stdout as text."""
+        future, owner = self._claim(argv, encoding)
+        if owner:
+            self._fill(future, argv, self._timeout(timeout), encoding)
+        return future.result()
+
+    def iter_lines(self, argv, timeout=DEFAULT_COMMAND_TIMEOUT, encoding=None):
+        """
+        Yields the lines of argv's stdout (without line endings) as the command
+        writes them, so large outputs are parsed without being buffered.
+
+        The exit status is only known at the end: CalledProcessError or
+        TimeoutExpired is raised after the lines that were produced. Streamed
+        output is not memoized, but if the same command already ran through
+        run() its stored output is replayed.
+        """
+        key = (tuple(argv), encoding)
+        with self._lock:
+            cached = self._results.get(key) if self.memoize else None
+        if cached is not None:
+            yield from cached.result().splitlines()
+            return
+
+        timeout = self._timeout(timeout)
+        if timeout is not None and timeout <= 0:
+            raise subprocess.TimeoutExpired(argv, 0)
+        lifetime = SubprocessTimer()
+        process = _popen(argv, encoding, lifetime)
+        killed = threading.Event()
+
+        def kill():
+            killed.set()
+            _kill(process)
+
+        timer = None
+        if timeout is not None:
+            timer = threading.Timer(timeout, kill)
+            timer.daemon = True
+            timer.start()
+        try:
+            for line in process.stdout:
+                yield line.rstrip("\r\n")
+            returncode = process.wait()
+        finally:
+            if timer is not None:
+                timer.cancel()
+            if process.poll() is None: # Consumer stopped early
+                _kill(process)
+                process.wait()
+            lifetime.exited()
+            process.stdout.close()
+        if killed.is_set():
+            raise subprocess.TimeoutExpired(argv, timeout)
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, argv)
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Used outside a bound collector: enforces timeouts but remembers nothing, so
+# long-lived callers such as the agent always see current output.
+_default_runner = CommandRunner(memoize=False)
+
+
+def get_command_runner():
+    """Returns the runner of the current collector, or the process-wide one."""
+    scope = _scope.get()
+    return scope[0] if scope is not None else _default_runner
+
+
+def run_command(argv, timeout=DEFAULT_COMMAND_TIMEOUT, encoding=None):
+    """Runs argv on the current runner and returns its stdout (see CommandRunner.run())."""
+    return get_command_runner().run(argv, timeout, encoding)
+
+
+def submit_command(argv, timeout=DEFAULT_COMMAND_TIMEOUT, encoding=None):
+    """Starts argv on the current runner and returns a Future of its stdout."""
+    return get_command_runner().submit(argv, timeout, encoding)
+
+
+def iter_command_lines(argv, timeout=DEFAULT_COMMAND_TIMEOUT, encoding=None):
+    """Streams argv's stdout line by line on the current runner."""
+    return get_command_runner().iter_lines(argv, timeout, encoding)
@@ -0,0 +1,388 @@
+# fleet_aggregate.py
+# Ingests run_system_diagnostics() documents from many hosts into one indexed
+# SQLite database, so fleet-wide questions ("which hosts run openssl 3.0.2?",
+# "how many distinct DNS setups are there?") are SQL queries instead of a
+# re-parse of thousands of JSON files.
+#
+# JSON parsing and flattening run in a process pool; the parent only writes rows.
+import collections
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from binary_snapshot import BINARY_SNAPSHOT_SUFFIX, BinarySnapshot
+from interface_table import table_rows
+from package_db import parse_package_label
+
+FLEET_SCHEMA_VERSION = 1
+
+# Documents handed to a worker at once. Large enough that pickling overhead
+# doesn't dominate, small enough to keep every worker busy near the end.
+DEFAULT_CHUNK_SIZE = 64
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS hosts (
+    host_id INTEGER PRIMARY KEY,
+    source TEXT UNIQUE NOT NULL,
+    source_mtime REAL,
+    source_size INTEGER,
+    hostname TEXT,
+    system TEXT,
+    release TEXT,
+    distribution TEXT,
+    distribution_version TEXT,
+    architecture TEXT,
+    is_vm INTEGER,
+    hypervisor TEXT,
+    default_gateway TEXT,
+    dns_servers TEXT,
+    package_count INTEGER,
+    security_process_count INTEGER,
+    ingested_at REAL
+);
+-- Each distinct (name, version) is stored once; hosts reference it by id.
+CREATE TABLE IF NOT EXISTS package_versions_seen (
+    package_id INTEGER PRIMARY KEY, name TEXT NOT NULL, version TEXT NOT NULL, UNIQUE (name, version)
+);
+CREATE TABLE IF NOT EXISTS host_packages (
+    host_id INTEGER NOT NULL, package_id INTEGER NOT NULL, PRIMARY KEY (host_id, package_id)
+) WITHOUT ROWID;
+CREATE VIEW IF NOT EXISTS packages AS
+    SELECT hp.host_id, p.name, p.version FROM host_packages hp JOIN package_versions_seen p USING (package_id);
+CREATE TABLE IF NOT EXISTS interfaces (
+    host_id INTEGER NOT NULL, name TEXT NOT NULL, mac_address TEXT, status TEXT, mtu INTEGER, speed_mbps INTEGER
+);
+CREATE TABLE IF NOT EXISTS interface_addresses (
+    host_id INTEGER NOT NULL, interface TEXT NOT NULL, family TEXT NOT NULL, address TEXT NOT NULL, netmask TEXT
+);
+CREATE TABLE IF NOT EXISTS dns_servers (host_id INTEGER NOT NULL, position INTEGER NOT NULL, server TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS security_categories (
+    host_id INTEGER NOT NULL, category TEXT NOT NULL, matched_keyword TEXT NOT NULL, processes INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS interfaces_host ON interfaces (host_id);
+CREATE INDEX IF NOT EXISTS interface_addresses_address ON interface_addresses (address);
+CREATE INDEX IF NOT EXISTS interface_addresses_host ON interface_addresses (host_id);
+CREATE INDEX IF NOT EXISTS dns_servers_server ON dns_servers (server);
+CREATE INDEX IF NOT EXISTS dns_servers_host ON dns_servers (host_id);
+CREATE INDEX IF NOT EXISTS security_categories_category ON security_categories (category);
+CREATE INDEX IF NOT EXISTS security_categories_host ON security_categories (host_id);
+CREATE INDEX IF NOT EXISTS hosts_hostname ON hosts (hostname);
+"""
+
+# Per-host tables, cleared for a host before it is re-ingested.
+_HOST_TABLES = ("host_packages", "interfaces", "interface_addresses", "dns_servers", "security_categories")
+
+# Fleet-wide summaries, rebuilt after every ingest.
+_SUMMARIES = {
+    "package_versions": """
+        SELECT p.name, p.version, c.hosts
+        FROM (SELECT package_id, COUNT(*) AS hosts FROM host_packages GROUP BY package_id) c
+        JOIN package_versions_seen p USING (package_id)""",
+    "dns_configurations": """
+        SELECT dns_servers, COUNT(*) AS hosts FROM hosts GROUP BY dns_servers""",
+    "interface_configurations": """
+        SELECT name, status, mtu, COUNT(DISTINCT host_id) AS hosts
+        FROM interfaces GROUP BY name, status, mtu""",
+    "security_category_hosts": """
+        SELECT category, COUNT(DISTINCT host_id) AS hosts, SUM(processes) AS processes
+        FROM security_categories GROUP BY category""",
+}
+_SUMMARY_INDEXES = (
+    "CREATE INDEX package_versions_name ON package_versions (name, version)",
+)
+
+
+# Sections of a document that summarize_document() reads.
+SUMMARY_SECTIONS = ("network_environment", "os_info", "vm_detection", "installed_applications", "security_processes")
+
+
+def summarize_document(document):
+    """
+    Flattens one run_system_diagnostics() document into table rows.
+
+    Returns:
+        dict: 'host' (column -> value for the hosts table) and one list of row
+              tuples per per-host table, without the host_id column.
+    """
+    network = document.get("network_environment") or {}
+    os_info = document.get("os_info") or {}
+    distribution = os_info.get("distribution") or {}
+    vm = document.get("vm_detection") or {}
+
+    packages = sorted({parse_package_label(label) for label in document.get("installed_applications") or ()})
+
+    interfaces, addresses = [], []
+    if isinstance(network.get("interfaces"), dict):
+        for name, data in network["interfaces"].items():
+            interfaces.append((name, data.get("mac_address"), data.get("status"), data.get("mtu"),
+                               data.get("speed_mbps")))
+            for family in ("ipv4", "ipv6"):
+                for addr in data.get(f"{family}_addresses") or ():
+                    addresses.append((name, family, addr["address"], addr.get("netmask")))
+    elif isinstance(network.get("interface_table"), dict):
+        for row in table_rows(network["interface_table"]):
+            interfaces.append((row["name"], row["mac_address"], row["state"], row["mtu"], None))
+            for addr in row["addresses"]:
+                addresses.append((row["name"], addr["family"], addr["address"], f"/{addr['prefix_length']}"))
+
+    dns = network.get("dns_servers") or []
+
+    categories = {}
+    for entry in document.get("security_processes") or ():
+        key = (entry.get("category"), entry.get("matched_keyword"))
+        categories[key] = categories.get(key, 0) + 1
+
+    return {
+        "host": {
+            "hostname": network.get("hostname") or os_info.get("hostname"),
+            "system": os_info.get("system"),
+            "release": os_info.get("release"),
+            "distribution": distribution.get("id"),
+            "distribution_version": distribution.get("version_id"),
+            "architecture": os_info.get("architecture"),
+            "is_vm": None if not vm else int(bool(vm.get("is_vm"))),
+            "hypervisor": vm.get("hypervisor"),
+            "default_gateway": network.get("default_gateway"),
+            "dns_servers": ",".join(dns),
+            "package_count": len(packages),
+            "security_process_count": len(document.get("security_processes") or ()),
+        },
+        "packages": packages,
+        "interfaces": interfaces,
+        "interface_addresses": addresses,
+        "dns_servers": list(enumerate(dns)),
+        "security_categories": [(c, k, n) for (c, k), n in sorted(categories.items())],
+    }
+
+
+def _open_document(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def _summarize_files(items):
+    # Worker: items are (path, mtime, size). Errors are returned, not raised, so
+    # one corrupt file doesn't lose the rest of the chunk.
+    results = []
+    for path, mtime, size in items:
+        try:
+            if path.endswith(BINARY_SNAPSHOT_SUFFIX):
+                # Only the sections summarize_document() looks at are decoded
+                with BinarySnapshot(path) as snapshot:
+                    document = snapshot.to_dict(SUMMARY_SECTIONS)
+            else:
+                with _open_document(path) as f:
+                    document = json.load(f)
+            results.append((path, mtime, size, summarize_document(document), None))
+        except Exception as e: # Truncated gzip (EOFError), corrupt snapshot, odd document shape, ...
+            results.append((path, mtime, size, None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def _stdin_source(summary, text):
+    # Documents from a stream have no path: key them by host, so ingesting the
+    # same fleet again replaces each host's rows, or else by content
+    hostname = summary["host"].get("hostname")
+    if hostname:
+        return f"stdin:host:{hostname}"
+    return "stdin:blake2b:" + hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _summarize_lines(items):
+    # Worker: items are (line label, JSON text). The label only names errors.
+    results = []
+    for label, text in items:
+        try:
+            summary = summarize_document(json.loads(text))
+            results.append((_stdin_source(summary, text), None, None, summary, None))
+        except Exception as e:
+            results.append((label, None, None, None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def _iter_document_files(directory):
+    for dirpath, _, filenames in os.walk(directory):
+        for filename in sorted(filenames):
+            if filename.endswith((".json", ".json.gz", BINARY_SNAPSHOT_SUFFIX)):
+                yield os.path.join(dirpath, filename)
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class FleetDatabase:
+    """
+    The fleet SQLite file. Hosts are keyed by their source (file path, or
+    hostname / content hash for stdin); ingesting a source again replaces its rows.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('schema_version', ?)", (str(FLEET_SCHEMA_VERSION),))
+        self._package_ids = {(name, version): package_id for package_id, name, version in
+                             self.conn.execute("SELECT package_id, name, version FROM package_versions_seen")}
+
+    def _package_id(self, name, version):
+        package_id = self._package_ids.get((name, version))
+        if package_id is None:
+            package_id = self.conn.execute("INSERT INTO package_versions_seen (name, version) VALUES (?, ?)",
+                                           (name, version)).lastrowid
+            self._package_ids[(name, version)] = package_id
+        return package_id
+
+    def known_sources(self):
+        """Returns source -> (mtime, size) for every ingested file."""
+        return {row[0]: (row[1], row[2]) for row in
+                self.conn.execute("SELECT source, source_mtime, source_size FROM hosts")}
+
+    def add_host(self, source, mtime, size, summary):
+        conn = self.conn
+        row = conn.execute("SELECT host_id FROM hosts WHERE source = ?", (source,)).fetchone()
+        if row is not None:
+            for table in _HOST_TABLES:
+                conn.execute(f"DELETE FROM {table} WHERE host_id = ?", (row[0],))
+            conn.execute("DELETE FROM hosts WHERE host_id = ?", (row[0],))
+        host = summary["host"]
+        columns = ["source", "source_mtime", "source_size", "ingested_at"] + list(host)
+        cursor = conn.execute(
+            f"INSERT INTO hosts ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            [source, mtime, size, time.time()] + list(host.values()))
+        host_id = cursor.lastrowid
+        conn.executemany("INSERT INTO host_packages VALUES (?, ?)",
+                         [(host_id, self._package_id(name, version)) for name, version in summary["packages"]])
+        for table in _HOST_TABLES[1:]:
+            rows = summary[table]
+            if rows:
+                width = len(rows[0]) + 1
+                conn.executemany(f"INSERT INTO {table} VALUES ({', '.join('?' * width)})",
+                                 [(host_id,) + tuple(r) for r in rows])
+
+    def drop_bulk_indexes(self):
+        # Inserting into an index keyed by package id means random B-tree writes
+        # for every row; building it once after the load is several times faster.
+        self.conn.execute("DROP INDEX IF EXISTS host_packages_package")
+
+    def rebuild_summaries(self):
+        with self.conn:
+            self.conn.execute("CREATE INDEX IF NOT EXISTS host_packages_package ON host_packages (package_id, host_id)")
+            for name, query in _SUMMARIES.items():
+                self.conn.execute(f"DROP TABLE IF EXISTS {name}")
+                self.conn.execute(f"CREATE TABLE {name} AS {query}")
+            for statement in _SUMMARY_INDEXES:
+                self.conn.execute(statement)
+
+    def close(self):
+        self.conn.close()
+
+
+def _store_results(db, results, stats, progress):
+    with db.conn:
+        for source, mtime, size, summary, error in results:
+            if error is not None:
+                stats["errors"].append({"source": source, "error": error})
+                continue
+            db.add_host(source, mtime, size, summary)
+            stats["ingested"] += 1
+    if progress is not None:
+        progress(stats["ingested"])
+
+
+def aggregate(sources, db_path, jobs=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """
+    Ingests result documents into the fleet database at db_path.
+
+    Args:
+        sources: Directories (searched recursively for *.json, *.json.gz and *.twsnap),
+                 individual files, or "-" for one JSON document per line on
+                 stdin.
+        db_path: SQLite file to create or update. Files whose mtime and size
+                 are unchanged since they were last ingested are skipped.
+        jobs: Worker processes (default: os.cpu_count()).
+        chunk_size: Documents per worker task.
+        progress: Optional callable(ingested_so_far).
+
+    Returns:
+        dict: 'ingested', 'skipped' (unchanged files), 'errors' (list of
+              {'source', 'error'}) and 'elapsed_seconds'.
+    """
+    started = time.perf_counter()
+    db = FleetDatabase(db_path)
+    stats = {"ingested": 0, "skipped": 0, "errors": []}
+    try:
+        known = db.known_sources()
+        db.drop_bulk_indexes()
+        files, seen, read_stdin = [], set(), False
+        for source in sources:
+            if source == "-":
+                read_stdin = True
+                continue
+            for path in (_iter_document_files(source) if os.path.isdir(source) else (source,)):
+                # One file is one source however it was reached (relative path,
+                # absolute path, symlink), both here and in the database
+                path = os.path.realpath(path)
+                if path in seen:
+                    continue
+                seen.add(path)
+                try:
+                    st = os.stat(path)
+                except OSError as e: # Missing, or vanished since the directory was listed
+                    stats["errors"].append({"source": path, "error": f"{type(e).__name__}: {e}"})
+                    continue
+                if known.get(path) == (st.st_mtime, st.st_size):
+                    stats["skipped"] += 1
+                    continue
+                files.append((path, st.st_mtime, st.st_size))
+
+        tasks = ((_summarize_files, chunk) for chunk in _chunks(files, chunk_size))
+        if read_stdin:
+            lines = ((f"stdin:{n}", line) for n, line in enumerate(sys.stdin, 1) if line.strip())
+            tasks = itertools.chain(tasks, ((_summarize_lines, chunk) for chunk in _chunks(lines, chunk_size)))
+
+        jobs = jobs or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            # Keep a few chunks per worker in flight, so a long stdin stream is
+            # never read into memory all at once.
+            pending = collections.deque()
+            for func, chunk in tasks:
+                pending.append(pool.submit(func, chunk))
+                if len(pending) >= jobs * 4:
+                    _store_results(db, pending.popleft().result(), stats, progress)
+            while pending:
+                _store_results(db, pending.popleft().result(), stats, progress)
+
+        db.rebuild_summaries()
+    finally:
+        db.close()
+    stats["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Aggregate diagnostics JSON from many hosts into SQLite.")
+    parser.add_argument("sources", nargs="+", metavar="SOURCE",
+                        help="directory, file, or - for one JSON document per line on stdin")
+    parser.add_argument("--db", default="fleet.sqlite", help="output database (default: fleet.sqlite)")
+    parser.add_argument("--jobs", type=int, help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+    print(json.dumps(aggregate(args.sources, args.db, args.jobs), indent=2))
@@ -0,0 +1,137 @@
+# host_facts.py
+# Facts about the host that cannot change while it is running: the kernel and
+# platform strings, the distribution from os-release, the hypervisor reported
+# by systemd-detect-virt, and so on. Each is computed once per boot and kept on
+# disk, so later runs and agent ticks get them for the cost of reading the boot
+# ID. A fact can also depend on files (os-release), whose mtime then becomes
+# part of its key.
+import json
+import os
+import threading
+
+from instrumentation import count
+from local_cache import atomic_write, get_cache_dir, open_private
+
+HOST_FACTS_VERSION = 1
+
+# Changes on every boot (Linux). Elsewhere psutil's boot time stands in.
+BOOT_ID_PATH = "/proc/sys/kernel/random/boot_id"
+
+
+def read_boot_id(path=BOOT_ID_PATH):
+    """Returns an identifier of the current boot, or None if there is none to be had."""
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except OSError:
+        pass
+    try:
+        import psutil
+        return f"boot-time:{int(psutil.boot_time())}"
+    except (ImportError, OSError, RuntimeError):
+        return None
+
+
+def _file_signature(paths):
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            signature.append([path, st.st_mtime_ns, st.st_size])
+        except OSError:
+            signature.append([path, None, None])
+    return signature
+
+
+class HostFactsCache:
+    """
+    Per-boot cache of host facts in one JSON file.
+
+    Without a boot ID nothing is written to disk: facts are still computed only
+    once per process, but a stale file could otherwise survive a reboot.
+    """
+
+    def __init__(self, cache_path=None, boot_id_path=BOOT_ID_PATH):
+        self.cache_path = cache_path or os.path.join(get_cache_dir(), "host_facts.json")
+        self.boot_id_path = boot_id_path
+        self._lock = threading.Lock()
+        self._facts = None # name -> {'key': ..., 'value': ...}
+
+    def _load(self):
+        # Anything but a private regular file is ignored, and the facts recomputed
+        f = open_private(self.cache_path)
+        if f is None:
+            return {}
+        try:
+            with f:
+                data = json.load(f)
+            if data.get("version") == HOST_FACTS_VERSION and isinstance(data.get("facts"), dict):
+                return data["facts"]
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def _save(self):
+        data = {"version": HOST_FACTS_VERSION, "facts": self._facts}
+        try:
+            atomic_write(self.cache_path, json.dumps(data, separators=(",", ":")).encode("utf-8"))
+        except OSError:
+            pass # No writable cache: facts are recomputed by the next process
+
+    def get(self, name, compute, watch_paths=()):
+        """
+        Returns the fact called name, calling compute() only if it isn't known
+        for this boot (and these watch_paths mtimes) yet.
+
+        compute() must return a JSON-serializable value. If it raises, nothing
+        is cached and the exception propagates, so transient failures such as
+        a timed-out command are retried on the next call.
+        """
+        boot_id = read_boot_id(self.boot_id_path)
+        key = [boot_id, _file_signature(watch_paths)]
+        with self._lock:
+            if self._facts is None:
+                self._facts = self._load()
+            entry = self._facts.get(name)
+            if entry is not None and entry.get("key") == key:
+                count("host_fact_hits")
+                return entry["value"]
+        count("host_fact_misses")
+        value = compute()
+        with self._lock:
+            self._facts[name] = {"key": key, "value": value}
+            # Drop facts of earlier boots while we're at it
+            self._facts = {n: e for n, e in self._facts.items() if e.get("key", [None])[0] == boot_id}
+            if boot_id is not None:
+                self._save()
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._facts = {}
+            try:
+                os.unlink(self.cache_path)
+            except OSError:
+                pass
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_host_fact(name, compute, watch_paths=()):
+    """Looks a fact up in the process-wide HostFactsCache (see HostFactsCache.get())."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = HostFactsCache()
+    return _default_cache.get(name, compute, watch_paths)
+
+
+def clear_host_facts():
+    """Forgets every fact in the process-wide HostFactsCache, on disk too."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = HostFactsCache()
+    _default_cache.clear()
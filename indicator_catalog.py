@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import threading
+
+from indicator_matcher import IndicatorMatcher
+from local_cache import atomic_write, get_cache_dir, is_private, open_private
+
+try:
+    import tomllib # Python 3.11+
+    TOML_AVAILABLE = True
+except ImportError:
+    try:
+        import tomli as tomllib
+        TOML_AVAILABLE = True
+    except ImportError:
+        TOML_AVAILABLE = False
+
+# Bump whenever IndicatorMatcher's tables change, so stale cache files are ignored
+# (and removed).
+MATCHER_CACHE_VERSION = 2
+
+# Compiled matchers kept in the cache, most recently used first. One per set of
+# catalog files in use; older ones are removed whenever a new one is written.
+MATCHER_CACHE_ENTRIES = 8
+
+
+class CatalogError(ValueError):
+    """Raised when an indicator catalog file cannot be read or is malformed."""
+
+
+def parse_indicator_catalog(data, source="<catalog>"):
+    """
+    Parses catalog file contents into a {category: [keywords]} dict.
+
+    JSON and TOML catalogs share one layout: categories map to lists of keyword
+    strings, either at the top level or under an "indicators" table, e.g.
+
+        [indicators]
+        "Antivirus/AntiMalware/EDR" = ["msmpeng", "sophos"]
+    """
+    if source.lower().endswith(".toml"):
+        if not TOML_AVAILABLE:
+            raise CatalogError(f"{source}: TOML catalogs need Python 3.11+ or the tomli package")
+        try:
+            document = tomllib.loads(data.decode("utf-8"))
+        except (UnicodeDecodeError, tomllib.TOMLDecodeError) as e:
+            raise CatalogError(f"{source}: {e}") from e
+    else:
+        try:
+            document = json.loads(data)
+        except ValueError as e:
+            raise CatalogError(f"{source}: {e}") from e
+
+    if isinstance(document, dict) and isinstance(document.get("indicators"), dict):
+        document = document["indicators"]
+    if not isinstance(document, dict):
+        raise CatalogError(f"{source}: expected a mapping of category to keyword list")
+
+    indicators = {}
+    for category, keywords in document.items():
+        if not isinstance(keywords, list) or not all(isinstance(k, str) for k in keywords):
+            raise CatalogError(f"{source}: category {category!r} must be a list of strings")
+        indicators[category] = keywords
+    return indicators
+
+
+def merge_indicator_catalogs(catalogs):
+    """
+    Merges catalogs in order. Keywords of a category that appears more than once
+    are appended, so earlier catalogs keep the higher matching priority.
+    """
+    merged = {}
+    for catalog in catalogs:
+        for category, keywords in catalog.items():
+            merged.setdefault(category, []).extend(keywords)
+    return merged
+
+
+def _prune_matcher_cache(cache_dir, keep):
+    # Removes entries of other cache versions (including the old pickle files)
+    # and all but the MATCHER_CACHE_ENTRIES most recently used current ones.
+    current = []
+    for entry in os.scandir(cache_dir):
+        if not entry.name.startswith("v") or not entry.name.endswith((".json", ".pickle")):
+            continue
+        if entry.name.startswith(f"v{MATCHER_CACHE_VERSION}-") and entry.name.endswith(".json"):
+            if entry.name != keep:
+                try:
+                    current.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    pass
+            continue
+        try:
+            os.unlink(entry.path)
+        except OSError:
+            pass
+    current.sort(reverse=True)
+    for _, path in current[MATCHER_CACHE_ENTRIES - 1:]:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def _read_cached_tables(cache_path):
+    # The tables, or None if there is no usable entry. Entries are only trusted
+    # if the file belongs to us and nobody else could have written it.
+    f = open_private(cache_path, binary=True)
+    if f is None:
+        return None
+    try:
+        with f:
+            return json.loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def load_cached_matcher(indicators, digest=None):
+    """
+    Returns an IndicatorMatcher for indicators, reusing a compiled copy from the
+    on-disk cache when one exists for the same catalog content.
+
+    The cache holds the automaton tables as JSON, never executable data, and is
+    only used when the cache directory belongs to the current user and isn't
+    writable by anyone else (TRAINWRECK_CACHE_DIR can point anywhere).
+    """
+    if digest is None:
+        digest = hashlib.sha256(json.dumps(indicators, sort_keys=False).encode("utf-8")).hexdigest()
+    cache_dir = cache_path = None
+    try:
+        cache_dir = get_cache_dir("matchers")
+    except OSError:
+        pass
+    if cache_dir is not None and is_private(cache_dir):
+        cache_path = os.path.join(cache_dir, f"v{MATCHER_CACHE_VERSION}-{digest}.json")
+        tables = _read_cached_tables(cache_path)
+        if tables is not None:
+            try:
+                matcher = IndicatorMatcher.from_tables(tables)
+            except ValueError:
+                pass # Damaged entry: recompile and overwrite it below
+            else:
+                try:
+                    os.utime(cache_path) # Most recently used, for pruning
+                except OSError:
+                    pass
+                return matcher
+
+    matcher = IndicatorMatcher(indicators)
+    if cache_path:
+        try:
+            atomic_write(cache_path, json.dumps(matcher.to_tables(), separators=(",", ":")).encode("utf-8"))
+            _prune_matcher_cache(cache_dir, os.path.basename(cache_path))
+        except OSError:
+            pass # A read-only cache only costs us the compile next time
+    return matcher
+
+
+class IndicatorCatalog:
+    """
+    Indicators assembled from a built-in dict plus any number of catalog files.
+
+    matcher() stats the files on every call and only re-reads them when a file's
+    size or mtime has changed, so a long-running process picks up edits without
+    paying for a reload on every scan.
+    """
+
+    def __init__(self, paths, base=None):
+        self.paths = [os.path.abspath(p) for p in paths]
+        self.base = base or {}
+        self._lock = threading.Lock()
+        self._signature = None
+        self._matcher = None
+
+    def _stat_signature(self):
+        signature = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+            except OSError as e:
+                raise CatalogError(f"{path}: {e.strerror}") from e
+            signature.append((path, st.st_mtime_ns, st.st_size))
+        return tuple(signature)
+
+    def _load(self):
+        digest = hashlib.sha256()
+        digest.update(json.dumps(self.base).encode("utf-8"))
+        catalogs = [self.base]
+        for path in self.paths:
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError as e:
+                raise CatalogError(f"{path}: {e.strerror}") from e
+            digest.update(b"\0" + data)
+            catalogs.append(parse_indicator_catalog(data, path))
+        return load_cached_matcher(merge_indicator_catalogs(catalogs), digest.hexdigest())
+
+    def matcher(self):
+        with self._lock:
+            signature = self._stat_signature()
+            if signature != self._signature:
+                self._matcher = self._load()
+                self._signature = signature
+            return self._matcher
@@ -0,0 +1,181 @@
+from collections import deque
+from itertools import chain
+
+# Categories whose keywords are too vague to be trusted inside a command line unless
+# they are reasonably long. Mirrors the rule get_security_related_processes() used
+# before matching was compiled.
+GENERIC_CATEGORY_MARKER = "Generic Security Terms"
+GENERIC_MIN_CMDLINE_LENGTH = 5
+
+# Default for match()'s name_priority: the caller has not scanned the name.
+# None is a real scan_name() result ("no keyword"), so it can't double as this.
+_UNSCANNED = object()
+
+
+class IndicatorMatcher:
+    """
+    Aho-Corasick automaton compiled once from an indicator catalog.
+
+    The catalog is a dict mapping a category to a list of keywords, like
+    SECURITY_PROCESS_INDICATORS. Keywords are numbered in catalog order, and that
+    number is their priority: when several keywords occur in a process, the one
+    listed first wins, exactly as with the old category x keyword x process loop.
+
+    Scanning a string costs one automaton step per character no matter how many
+    keywords the catalog holds.
+    """
+
+    def __init__(self, indicators):
+        self.keywords = []  # priority -> (category, keyword as written in the catalog)
+        self._goto = [{}]
+        self._fail = [0]
+        name_out = [None]
+        cmdline_out = [None]
+
+        for category, keywords in indicators.items():
+            is_generic_category = GENERIC_CATEGORY_MARKER in category
+            for keyword in keywords:
+                priority = len(self.keywords)
+                self.keywords.append((category, keyword))
+                kw_lower = keyword.lower()
+
+                state = 0
+                for ch in kw_lower:
+                    nxt = self._goto[state].get(ch)
+                    if nxt is None:
+                        nxt = len(self._goto)
+                        self._goto[state][ch] = nxt
+                        self._goto.append({})
+                        self._fail.append(0)
+                        name_out.append(None)
+                        cmdline_out.append(None)
+                    state = nxt
+
+                if name_out[state] is None:
+                    name_out[state] = priority
+                if not is_generic_category or len(kw_lower) >= GENERIC_MIN_CMDLINE_LENGTH:
+                    if cmdline_out[state] is None:
+                        cmdline_out[state] = priority
+
+        # Breadth-first pass to wire failure links. Each state's output is folded
+        # into the best (lowest) priority reachable through its failure chain, so a
+        # scan only ever has to look at one number per step.
+        none = len(self.keywords)
+        self._name_best = [none if p is None else p for p in name_out]
+        self._cmdline_best = [none if p is None else p for p in cmdline_out]
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                f = self._goto[f].get(ch, 0)
+                self._fail[nxt] = f if f != nxt else 0
+                self._name_best[nxt] = min(self._name_best[nxt], self._name_best[self._fail[nxt]])
+                self._cmdline_best[nxt] = min(self._cmdline_best[nxt], self._cmdline_best[self._fail[nxt]])
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def to_tables(self):
+        """
+        Returns the compiled automaton as plain lists and dicts (JSON-serializable),
+        for caching. from_tables() turns them back into a matcher without compiling.
+        """
+        return {"keywords": [list(entry) for entry in self.keywords], "goto": self._goto, "fail": self._fail,
+                "name_best": self._name_best, "cmdline_best": self._cmdline_best}
+
+    @classmethod
+    def from_tables(cls, tables):
+        """
+        Rebuilds a matcher from to_tables() output.
+
+        Raises:
+            ValueError: tables is malformed or inconsistent (e.g. a state points
+                        past the end of the automaton), so it could not be scanned.
+        """
+        try:
+            keywords = list(map(tuple, tables["keywords"]))
+            goto, fail = tables["goto"], tables["fail"]
+            name_best, cmdline_best = tables["name_best"], tables["cmdline_best"]
+        except (TypeError, KeyError, ValueError) as e:
+            raise ValueError(f"malformed matcher tables: {e}") from e
+        states = len(goto)
+        if not (isinstance(goto, list) and isinstance(fail, list) and isinstance(name_best, list)
+                and isinstance(cmdline_best, list) and states and len(fail) == len(name_best) == len(cmdline_best) == states):
+            raise ValueError("malformed matcher tables: state tables differ in length")
+        if keywords and (set(map(len, keywords)) != {2} or set(map(type, chain.from_iterable(keywords))) != {str}):
+            raise ValueError("malformed matcher tables: keywords must be (category, keyword) strings")
+        if set(map(type, goto)) != {dict}:
+            raise ValueError("malformed matcher tables: bad transition table")
+        # Every state number and priority must be usable as an index by _scan()
+        none = len(keywords)
+        targets = list(chain.from_iterable(map(dict.values, goto)))
+        for values, lowest, highest in ((targets, 1, states - 1), (fail, 0, states - 1),
+                                        (name_best, 0, none), (cmdline_best, 0, none)):
+            if values and (set(map(type, values)) != {int} or min(values) < lowest or max(values) > highest):
+                raise ValueError("malformed matcher tables: state or priority out of range")
+
+        matcher = cls.__new__(cls)
+        matcher.keywords = keywords
+        matcher._goto = goto
+        matcher._fail = fail
+        matcher._name_best = name_best
+        matcher._cmdline_best = cmdline_best
+        return matcher
+
+    def _scan(self, text, best):
+        goto = self._goto
+        fail = self._fail
+        state = 0
+        found = best[0]
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if best[state] < found:
+                found = best[state]
+                if found == 0:
+                    break
+        return found
+
+    def scan_name(self, name):
+        """Returns the priority of the best keyword in a lowercased name, or None."""
+        found = self._scan(name, self._name_best)
+        return found if found < len(self.keywords) else None
+
+    def scan_cmdline(self, cmdline_lower):
+        """Returns the priority of the best keyword in a lowercased cmdline, or None."""
+        found = self._scan(cmdline_lower, self._cmdline_best)
+        return found if found < len(self.keywords) else None
+
+    def match(self, name, cmdline_lower, name_priority=_UNSCANNED):
+        """
+        Finds the indicator a process matches.
+
+        Args:
+            name: Normalized, lowercased process name.
+            cmdline_lower: Lowercased command line.
+            name_priority: Result of scan_name(name) if the caller already has
+                           it, None included.
+
+        Returns:
+            tuple: (priority, category, matched_keyword, match_location) or None.
+        """
+        if name_priority is _UNSCANNED:
+            name_priority = self.scan_name(name)
+        # Nothing in the command line can beat the top-priority keyword.
+        if name_priority == 0:
+            cmdline_priority = None
+        else:
+            cmdline_priority = self.scan_cmdline(cmdline_lower)
+
+        if name_priority is not None and (cmdline_priority is None or name_priority <= cmdline_priority):
+            category, keyword = self.keywords[name_priority]
+            return name_priority, category, keyword, "process_name"
+        if cmdline_priority is not None:
+            category, keyword = self.keywords[cmdline_priority]
+            return cmdline_priority, category, keyword, "command_line"
+        return None
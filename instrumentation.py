@@ -0,0 +1,226 @@
+# instrumentation.py
+# Built-in measurements for collectors: wall and CPU time, subprocesses spawned
+# and how long they ran, psutil calls and peak memory, for every collector and
+# every named sub-step inside it. Optionally a cProfile of each collector thread,
+# merged into one pstats file.
+import contextlib
+import contextvars
+import sys
+import threading
+import time
+
+try:
+    import resource # Unix only
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+# Metrics of the collector (or sub-step) running in the current thread, if any.
+_current = contextvars.ContextVar("trainwreck_metrics", default=None)
+_lock = threading.Lock()
+
+# cProfile.Profile objects of finished collector threads, while profiling is on.
+_profiles = None
+
+
+class Metrics:
+    """
+    Counters for one collector or one sub-step of it.
+
+    Every counter update also goes to the enclosing step and collector, so a
+    collector's numbers always include those of its steps.
+    """
+    __slots__ = ("name", "parent", "steps", "calls", "wall_seconds", "cpu_seconds",
+                 "subprocess_count", "subprocess_seconds", "psutil_calls", "peak_rss_kb", "counters")
+
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+        self.steps = {}
+        self.calls = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.subprocess_count = 0
+        self.subprocess_seconds = 0.0
+        self.psutil_calls = 0
+        self.peak_rss_kb = None
+        self.counters = {}
+
+    def _add(self, attr, value):
+        with _lock:
+            metrics = self
+            while metrics is not None:
+                setattr(metrics, attr, getattr(metrics, attr) + value)
+                metrics = metrics.parent
+
+    def _count(self, name, value):
+        with _lock:
+            metrics = self
+            while metrics is not None:
+                metrics.counters[name] = metrics.counters.get(name, 0) + value
+                metrics = metrics.parent
+
+    def as_dict(self):
+        data = {
+            "wall_seconds": round(self.wall_seconds, 6),
+            "cpu_seconds": round(self.cpu_seconds, 6),
+            "subprocess_count": self.subprocess_count,
+            "subprocess_seconds": round(self.subprocess_seconds, 6),
+            "psutil_calls": self.psutil_calls,
+        }
+        if self.parent is not None:
+            data["calls"] = self.calls
+        if self.peak_rss_kb is not None:
+            data["peak_rss_kb"] = self.peak_rss_kb
+        if self.counters:
+            data["counters"] = dict(self.counters)
+        if self.steps:
+            data["steps"] = {name: step.as_dict() for name, step in self.steps.items()}
+        return data
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process so far in KiB, or None if unknown."""
+    if not RESOURCE_AVAILABLE:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak # bytes on macOS
+
+
+class SubprocessTimer:
+    """
+    Charges one child process to the collector or step current when the timer
+    is created: spawned() counts it, exited() adds its lifetime (from the
+    timer's creation). command_runner times every command it runs this way.
+    """
+    __slots__ = ("_metrics", "_started")
+
+    def __init__(self):
+        self._metrics = _current.get()
+        self._started = time.perf_counter()
+
+    def spawned(self):
+        if self._metrics is not None:
+            self._metrics._add("subprocess_count", 1)
+
+    def exited(self):
+        metrics, self._metrics = self._metrics, None # Only the first call counts
+        if metrics is not None:
+            metrics._add("subprocess_seconds", time.perf_counter() - self._started)
+
+
+def enable_profiling():
+    """Profiles every collector that starts from now on (see dump_profile())."""
+    global _profiles
+    with _lock:
+        if _profiles is None:
+            _profiles = []
+
+
+def dump_profile(path):
+    """
+    Merges the profiles of all collector threads and writes them to path in
+    pstats format (load with `python -m pstats path`).
+
+    Returns:
+        int: Number of collector profiles merged, 0 if nothing was profiled.
+    """
+    import pstats
+    with _lock:
+        profiles = list(_profiles or ())
+    if not profiles:
+        return 0
+    stats = pstats.Stats(profiles[0])
+    for profile in profiles[1:]:
+        stats.add(profile)
+    stats.dump_stats(path)
+    return len(profiles)
+
+
+@contextlib.contextmanager
+def measure(name):
+    """
+    Measures one collector run in the current thread and yields its Metrics.
+
+    CPU time is this thread's only; work handed to other threads shows up in
+    wall time. peak_rss_kb is process-wide (collectors share one process) and
+    recorded when the collector finishes.
+    """
+    metrics = Metrics(name)
+    metrics.calls = 1
+    profiler = None
+    if _profiles is not None:
+        import cProfile
+        profiler = cProfile.Profile()
+    token = _current.set(metrics)
+    wall_started = time.perf_counter()
+    cpu_started = time.thread_time()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield metrics
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            with _lock:
+                _profiles.append(profiler)
+        metrics.wall_seconds = time.perf_counter() - wall_started
+        metrics.cpu_seconds = time.thread_time() - cpu_started
+        metrics.peak_rss_kb = peak_rss_kb()
+        _current.reset(token)
+
+
+@contextlib.contextmanager
+def step(name):
+    """
+    Measures a named sub-step of the current collector, e.g. one package
+    manager query. Repeated steps with the same name are added up. Does nothing
+    outside a measured collector.
+
+    Inside a generator the step stays open across yields, so it also covers
+    whatever the consumer does with each item.
+    """
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    with _lock:
+        metrics = parent.steps.get(name)
+        if metrics is None:
+            metrics = parent.steps[name] = Metrics(name, parent)
+        metrics.calls += 1
+    token = _current.set(metrics)
+    wall_started = time.perf_counter()
+    cpu_started = time.thread_time()
+    try:
+        yield metrics
+    finally:
+        with _lock:
+            metrics.wall_seconds += time.perf_counter() - wall_started
+            metrics.cpu_seconds += time.thread_time() - cpu_started
+        try:
+            _current.reset(token)
+        except ValueError:
+            pass # A generator holding the step was closed from another context
+
+
+def count(name, value=1):
+    """Adds value to a named counter of the current collector and step."""
+    metrics = _current.get()
+    if metrics is not None and value:
+        metrics._count(name, value)
+
+
+def count_psutil_calls(count=1):
+    """Adds count psutil calls to the current collector and step."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics._add("psutil_calls", count)
+
+
+def current_collector():
+    """Name of the collector running in the current thread, or None."""
+    metrics = _current.get()
+    while metrics is not None and metrics.parent is not None:
+        metrics = metrics.parent
+    return metrics.name if metrics is not None else None
@@ -0,0 +1,469 @@
+# interface_table.py
+# Interfaces and their addresses for hosts with thousands of them (Kubernetes
+# nodes with a veth per pod, routers with tap/tunnel devices), collected in a
+# few bulk passes into columns instead of one nested dict per address. On Linux
+# two rtnetlink dumps return every link (name, state, MTU, MAC, kind, counters)
+# and every address, with no per-interface file or ioctl; elsewhere psutil's
+# address, stats and counter calls stand in. Filters are applied to each link
+# as soon as its name is known, before anything else about it is decoded.
+import array
+import fnmatch
+import os
+import re
+import socket
+import struct
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+NETLINK_AVAILABLE = hasattr(socket, "AF_NETLINK")
+
+# Bytes read per recv() of a netlink dump; the kernel fills it with as many
+# whole messages as fit.
+NETLINK_RECV_SIZE = 1 << 20
+
+# Seconds to wait for the kernel's next batch of a dump.
+NETLINK_TIMEOUT = 5
+
+# Link states that can be filtered on (operstate names, see _link_state()).
+LINK_STATES = ("up", "down", "dormant", "lowerlayerdown", "notpresent", "testing", "unknown")
+
+# Per-interface counters, in the order of struct rtnl_link_stats64.
+COUNTERS = ("rx_packets", "tx_packets", "rx_bytes", "tx_bytes", "rx_errors", "tx_errors", "rx_dropped", "tx_dropped")
+
+# Interface name prefixes -> kind, for platforms where the kernel doesn't say.
+NAME_KINDS = (
+    ("veth", "veth"), ("cali", "veth"), ("lxc", "veth"), ("tap", "tun"), ("tun", "tun"), ("utun", "tun"),
+    ("docker", "bridge"), ("virbr", "bridge"), ("br", "bridge"), ("cni", "bridge"), ("bridge", "bridge"),
+    ("vxlan", "vxlan"), ("flannel", "vxlan"), ("bond", "bond"), ("team", "team"), ("wg", "wireguard"),
+    ("lo", "loopback"), ("vEthernet", "hyperv"),
+)
+
+# rtnetlink (linux/netlink.h, linux/rtnetlink.h, linux/if_link.h, linux/if_addr.h)
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+RTM_NEWLINK = 16
+RTM_GETLINK = 18
+RTM_NEWADDR = 20
+RTM_GETADDR = 22
+NLA_TYPE_MASK = 0x3FFF
+IFLA_ADDRESS = 1
+IFLA_IFNAME = 3
+IFLA_MTU = 4
+IFLA_OPERSTATE = 16
+IFLA_LINKINFO = 18
+IFLA_STATS64 = 23
+IFLA_INFO_KIND = 1
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+IFF_UP = 0x1
+IFF_LOOPBACK = 0x8
+IFF_RUNNING = 0x40
+# Hardware types of devices that sit on a bus rather than being created in software
+PHYSICAL_ARPHRD = frozenset((1, 32, 801)) # Ethernet, InfiniBand, 802.11
+
+_NLMSGHDR = struct.Struct("=IHHII")
+_IFINFOMSG = struct.Struct("=BxHiII")
+_IFADDRMSG = struct.Struct("=BBBBI")
+_RTATTR = struct.Struct("=HH")
+_I32 = struct.Struct("=i")
+_U32 = struct.Struct("=I")
+_STATS64 = struct.Struct("=8Q")
+
+_LINK_ATTRS = frozenset((IFLA_ADDRESS, IFLA_IFNAME, IFLA_MTU, IFLA_OPERSTATE, IFLA_LINKINFO, IFLA_STATS64))
+_OPERSTATES = {0: "unknown", 1: "notpresent", 2: "down", 3: "lowerlayerdown", 4: "testing", 5: "dormant", 6: "up"}
+
+
+class InterfaceFilter:
+    """
+    Which interfaces to collect.
+
+    Args:
+        names: Glob patterns (e.g. "eth*", "bond0"); an interface is kept if it
+               matches any of them. None keeps every name.
+        states: Link states to keep (see LINK_STATES). None keeps all.
+        physical_only: Keep only hardware interfaces (no veth, bridges,
+                       tunnels, loopback, ...).
+    """
+
+    def __init__(self, names=None, states=None, physical_only=False):
+        self.names = tuple(names) if names else ()
+        # One regex for all patterns, so a name costs one match however many there are
+        self._name_re = re.compile("|".join(fnmatch.translate(p) for p in self.names)) if self.names else None
+        self.states = frozenset(states) if states else None
+        self.physical_only = physical_only
+
+    def match_name(self, name):
+        return self._name_re is None or self._name_re.match(name) is not None
+
+    def match_link(self, kind, state):
+        if self.physical_only and kind != "physical":
+            return False
+        return self.states is None or state in self.states
+
+
+class InterfaceTable:
+    """
+    Interfaces as columns: row i of every interface column describes the same
+    interface, and addresses refer to interfaces by row.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.links_seen = 0 # Before filtering
+        self.index = array.array("I")
+        self.name = []
+        self.kind = []
+        self.state = []
+        self.mtu = array.array("I")
+        self.mac_address = []
+        self.counters = {counter: array.array("Q") for counter in COUNTERS}
+        self.address_row = array.array("I")
+        self.address_family = array.array("B") # 4 or 6
+        self.address = []
+        self.prefix_length = array.array("B")
+        self._rows = {} # ifindex -> row
+
+    def __len__(self):
+        return len(self.name)
+
+    def add_interface(self, index, name, kind, state, mtu, mac_address, counters):
+        row = len(self.name)
+        self._rows[index] = row
+        self.index.append(index)
+        self.name.append(name)
+        self.kind.append(kind)
+        self.state.append(state)
+        self.mtu.append(mtu)
+        self.mac_address.append(mac_address)
+        for column, value in zip(self.counters.values(), counters):
+            column.append(value)
+        return row
+
+    def add_address(self, row, family, address, prefix_length):
+        self.address_row.append(row)
+        self.address_family.append(family)
+        self.address.append(address)
+        self.prefix_length.append(prefix_length)
+
+    def to_dict(self):
+        """
+        JSON-friendly form: 'interfaces' (column -> list) and 'addresses'
+        (column -> list, with 'interface' being a row of the interface columns).
+        """
+        interfaces = {"index": self.index.tolist(), "name": self.name, "kind": self.kind, "state": self.state,
+                      "mtu": self.mtu.tolist(), "mac_address": self.mac_address}
+        interfaces.update((counter, column.tolist()) for counter, column in self.counters.items())
+        return {
+            "source": self.source,
+            "links_seen": self.links_seen,
+            "interfaces": interfaces,
+            "addresses": {"interface": self.address_row.tolist(), "family": self.address_family.tolist(),
+                          "address": self.address, "prefix_length": self.prefix_length.tolist()},
+        }
+
+    def summary(self):
+        """Counts per interface kind and per state instead of one entry per interface."""
+        by_kind = {}
+        for row, kind in enumerate(self.kind):
+            entry = by_kind.get(kind)
+            if entry is None:
+                entry = by_kind[kind] = {"interfaces": 0, "up": 0, "addresses": 0, "rx_bytes": 0, "tx_bytes": 0}
+            entry["interfaces"] += 1
+            entry["up"] += self.state[row] == "up"
+            entry["rx_bytes"] += self.counters["rx_bytes"][row]
+            entry["tx_bytes"] += self.counters["tx_bytes"][row]
+        for row in self.address_row:
+            by_kind[self.kind[row]]["addresses"] += 1
+        by_state = {}
+        for state in self.state:
+            by_state[state] = by_state.get(state, 0) + 1
+        return {"source": self.source, "links_seen": self.links_seen, "interfaces": len(self.name),
+                "addresses": len(self.address), "by_kind": dict(sorted(by_kind.items())),
+                "by_state": dict(sorted(by_state.items()))}
+
+
+def table_rows(table_dict):
+    """
+    Yields one dict per interface ('name', 'kind', 'state', 'mtu',
+    'mac_address', the counters, 'addresses') from InterfaceTable.to_dict()
+    output, e.g. for line-oriented output.
+    """
+    columns = table_dict["interfaces"]
+    addresses = [[] for _ in columns["name"]]
+    table_addresses = table_dict["addresses"]
+    for row, family, address, prefix_length in zip(table_addresses["interface"], table_addresses["family"],
+                                                    table_addresses["address"], table_addresses["prefix_length"]):
+        addresses[row].append({"family": f"ipv{family}", "address": address, "prefix_length": prefix_length})
+    keys = [key for key in columns if key != "index"]
+    for row in range(len(columns["name"])):
+        record = {key: columns[key][row] for key in keys}
+        record["addresses"] = addresses[row]
+        yield record
+
+
+def _link_state(operstate, flags):
+    if not flags & IFF_UP:
+        return "down"
+    state = _OPERSTATES.get(operstate, "unknown")
+    if state == "unknown" and flags & IFF_RUNNING:
+        return "up" # Loopback and most tunnels never report an operstate
+    return state
+
+
+def _kind_from_name(name):
+    for prefix, kind in NAME_KINDS:
+        if name.startswith(prefix):
+            return kind
+    return None
+
+
+def _iter_messages(buffers, message_type):
+    # Yields (buffer, payload start, payload end) of every message_type message
+    # until NLMSG_DONE.
+    for buf in buffers:
+        offset = 0
+        while offset + _NLMSGHDR.size <= len(buf):
+            length, msg_type, _, _, _ = _NLMSGHDR.unpack_from(buf, offset)
+            if length < _NLMSGHDR.size:
+                break
+            if msg_type == NLMSG_DONE:
+                return
+            if msg_type == NLMSG_ERROR:
+                error = _I32.unpack_from(buf, offset + _NLMSGHDR.size)[0]
+                if error:
+                    raise OSError(-error, os.strerror(-error))
+            elif msg_type == message_type:
+                yield buf, offset + _NLMSGHDR.size, offset + length
+            offset += (length + 3) & ~3
+
+
+def _link_kind(buf, start, end):
+    # IFLA_INFO_KIND inside a nested IFLA_LINKINFO
+    offset = start
+    while offset + _RTATTR.size <= end:
+        length, attr_type = _RTATTR.unpack_from(buf, offset)
+        if length < _RTATTR.size:
+            break
+        if attr_type & NLA_TYPE_MASK == IFLA_INFO_KIND:
+            return buf[offset + 4:offset + length].split(b"\0", 1)[0].decode("ascii", "replace")
+        offset += (length + 3) & ~3
+    return None
+
+
+def parse_link_dump(buffers, link_filter=None, table=None):
+    """
+    Reads the RTM_NEWLINK messages of an rtnetlink link dump into an
+    InterfaceTable.
+
+    Args:
+        buffers: Iterable of received byte buffers (each holding whole messages).
+        link_filter: InterfaceFilter; links it rejects are skipped as soon as
+                     their name (or kind and state) is known.
+        table: InterfaceTable to add to (a new one by default).
+    """
+    link_filter = link_filter or InterfaceFilter()
+    table = table if table is not None else InterfaceTable("netlink")
+    match_name = link_filter.match_name
+    unpack_attr = _RTATTR.unpack_from
+    wanted = _LINK_ATTRS
+    for buf, start, end in _iter_messages(buffers, RTM_NEWLINK):
+        table.links_seen += 1
+        _, if_type, index, flags, _ = _IFINFOMSG.unpack_from(buf, start)
+        offset = start + _IFINFOMSG.size
+        last = end - _RTATTR.size
+        attrs = {}
+        missing = len(wanted)
+        name = None
+        # A link message carries ~40 attributes; this loop is most of the parse
+        while offset <= last:
+            length, attr_type = unpack_attr(buf, offset)
+            if length < 4:
+                break
+            if attr_type & NLA_TYPE_MASK in wanted:
+                attr_type &= NLA_TYPE_MASK
+                if attr_type == IFLA_IFNAME:
+                    # Comes first: filtered-out links cost no more than this
+                    name = buf[offset + 4:offset + length].split(b"\0", 1)[0].decode("utf-8", "replace")
+                    if not match_name(name):
+                        break
+                attrs[attr_type] = (offset + 4, offset + length)
+                missing -= 1
+                if not missing:
+                    break # The rest (per-protocol settings) is most of the message
+            offset += (length + 3) & ~3
+        if name is None or not match_name(name):
+            continue
+
+        if flags & IFF_LOOPBACK:
+            kind = "loopback"
+        else:
+            kind = _link_kind(buf, *attrs[IFLA_LINKINFO]) if IFLA_LINKINFO in attrs else None
+            if kind is None:
+                kind = "physical" if if_type in PHYSICAL_ARPHRD else "other"
+        operstate = buf[attrs[IFLA_OPERSTATE][0]] if IFLA_OPERSTATE in attrs else 0
+        state = _link_state(operstate, flags)
+        if not link_filter.match_link(kind, state):
+            continue
+
+        mtu = _U32.unpack_from(buf, attrs[IFLA_MTU][0])[0] if IFLA_MTU in attrs else 0
+        mac_address = None
+        if IFLA_ADDRESS in attrs:
+            mac_start, mac_end = attrs[IFLA_ADDRESS]
+            mac_address = bytes(buf[mac_start:mac_end]).hex(":")
+        counters = _STATS64.unpack_from(buf, attrs[IFLA_STATS64][0]) if IFLA_STATS64 in attrs else (0,) * 8
+        table.add_interface(index, name, kind, state, mtu, mac_address, counters)
+    return table
+
+
+def parse_address_dump(buffers, table):
+    """
+    Adds the addresses of an rtnetlink address dump (RTM_NEWADDR messages) to
+    table. Addresses of interfaces that aren't in the table are skipped
+    before they are decoded.
+    """
+    rows = table._rows
+    for buf, start, end in _iter_messages(buffers, RTM_NEWADDR):
+        family, prefix_length, _, _, index = _IFADDRMSG.unpack_from(buf, start)
+        row = rows.get(index)
+        if row is None or family not in (socket.AF_INET, socket.AF_INET6):
+            continue
+        offset = start + _IFADDRMSG.size
+        address = local = None
+        while offset + _RTATTR.size <= end:
+            length, attr_type = _RTATTR.unpack_from(buf, offset)
+            if length < _RTATTR.size:
+                break
+            attr_type &= NLA_TYPE_MASK
+            if attr_type == IFA_ADDRESS:
+                address = (offset + 4, offset + length)
+            elif attr_type == IFA_LOCAL:
+                local = (offset + 4, offset + length)
+            offset += (length + 3) & ~3
+        # On point-to-point links IFA_ADDRESS is the peer; IFA_LOCAL is ours
+        span = local if local is not None and family == socket.AF_INET else address
+        if span is None:
+            continue
+        table.add_address(row, 4 if family == socket.AF_INET else 6,
+                          socket.inet_ntop(family, bytes(buf[span[0]:span[1]])), prefix_length)
+    return table
+
+
+def _netlink_dump(message_type, header):
+    # Yields the buffers of one rtnetlink dump as the kernel sends them. The
+    # consumer stops at NLMSG_DONE; closing the generator closes the socket.
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+    with sock:
+        sock.settimeout(NETLINK_TIMEOUT)
+        sock.bind((0, 0))
+        sock.send(_NLMSGHDR.pack(_NLMSGHDR.size + len(header), message_type, NLM_F_REQUEST | NLM_F_DUMP, 1, 0)
+                  + header)
+        while True:
+            yield sock.recv(NETLINK_RECV_SIZE)
+
+
+def _collect_netlink(link_filter):
+    table = InterfaceTable("netlink")
+    links = _netlink_dump(RTM_GETLINK, _IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0))
+    try:
+        parse_link_dump(links, link_filter, table)
+    finally:
+        links.close()
+    if len(table):
+        addresses = _netlink_dump(RTM_GETADDR, _IFADDRMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0))
+        try:
+            parse_address_dump(addresses, table)
+        finally:
+            addresses.close()
+    return table
+
+
+def _sysfs_physical(sys_root, name):
+    # /sys/class/net/<name> links into /sys/devices/virtual/net/ for software devices
+    try:
+        return "/virtual/" not in os.readlink(os.path.join(sys_root, name))
+    except OSError:
+        return None
+
+
+def _collect_psutil(link_filter, sys_root):
+    table = InterfaceTable("psutil")
+    net_if_addrs = psutil.net_if_addrs()
+    table.links_seen = len(net_if_addrs)
+    names = [name for name in net_if_addrs if link_filter.match_name(name)]
+    if not names:
+        return table
+    net_if_stats = psutil.net_if_stats()
+    io_counters = psutil.net_io_counters(pernic=True)
+    try:
+        indexes = {name: index for index, name in socket.if_nameindex()}
+    except (AttributeError, OSError):
+        indexes = {}
+    link_family = getattr(psutil, "AF_LINK", None)
+    for position, name in enumerate(names):
+        stats = net_if_stats.get(name)
+        state = "unknown" if stats is None else "up" if stats.isup else "down"
+        kind = _kind_from_name(name)
+        if kind is None:
+            physical = _sysfs_physical(sys_root, name) if os.path.isdir(sys_root) else None
+            kind = "other" if physical is False else "physical"
+        if not link_filter.match_link(kind, state):
+            continue
+        mac_address = None
+        for addr in net_if_addrs[name]:
+            if addr.family == link_family:
+                mac_address = addr.address.replace("-", ":").lower()
+        io = io_counters.get(name)
+        counters = (io.packets_recv, io.packets_sent, io.bytes_recv, io.bytes_sent,
+                    io.errin, io.errout, io.dropin, io.dropout) if io is not None else (0,) * 8
+        # Interfaces without a kernel index (rare) get a synthetic one past the real range
+        row = table.add_interface(indexes.get(name, 1 << 31 | position), name, kind, state,
+                                  stats.mtu if stats is not None else 0, mac_address, counters)
+        for addr in net_if_addrs[name]:
+            if addr.family in (socket.AF_INET, socket.AF_INET6):
+                table.add_address(row, 4 if addr.family == socket.AF_INET else 6, addr.address.split("%", 1)[0],
+                                  _prefix_length(addr.netmask))
+    return table
+
+
+def _prefix_length(netmask):
+    if not netmask:
+        return 0
+    try:
+        family = socket.AF_INET6 if ":" in netmask else socket.AF_INET
+        return bin(int.from_bytes(socket.inet_pton(family, netmask), "big")).count("1")
+    except OSError:
+        return 0
+
+
+def collect_interface_table(names=None, states=None, physical_only=False, sys_root="/sys/class/net"):
+    """
+    Collects interfaces and addresses into an InterfaceTable.
+
+    Linux uses two rtnetlink dumps; elsewhere (or where netlink sockets are
+    not permitted) psutil is used, with kinds guessed from interface names.
+
+    Args:
+        names: Glob patterns of interface names to keep (see InterfaceFilter).
+        states: Link states to keep.
+        physical_only: Keep only hardware interfaces.
+        sys_root: psutil fallback on Linux: sysfs directory used to tell
+                  hardware from software interfaces.
+
+    Raises:
+        RuntimeError: Neither rtnetlink nor psutil is available.
+    """
+    link_filter = InterfaceFilter(names, states, physical_only)
+    if NETLINK_AVAILABLE:
+        try:
+            return _collect_netlink(link_filter)
+        except OSError:
+            pass # Netlink blocked (seccomp, some sandboxes): fall back to psutil
+    if PSUTIL_AVAILABLE:
+        return _collect_psutil(link_filter, sys_root)
+    raise RuntimeError("collecting the interface table needs Linux rtnetlink or psutil")
@@ -0,0 +1,120 @@
+import json
+import os
+
+from budget import checkpoint
+from local_cache import atomic_write, get_cache_dir, open_private
+from package_db import DPKG_STATUS_PATH, PACMAN_LOCAL_DIR, RPM_SQLITE_PATHS, PackageRecord
+
+# Berkeley DB rpmdb, the only rpm database up to RHEL/CentOS 8. rpm rewrites
+# Packages in place and recreates its index files next to it, so the directory is
+# watched as well.
+RPM_BDB_PATHS = ("/var/lib/rpm/Packages", "/var/lib/rpm")
+
+# Files and directories whose metadata changes whenever a package is installed,
+# removed or upgraded. pacman rewrites a per-package directory inside local/, which
+# bumps the directory's own mtime.
+LINUX_PACKAGE_DB_PATHS = (DPKG_STATUS_PATH, PACMAN_LOCAL_DIR) + RPM_SQLITE_PATHS + tuple(
+    p + "-wal" for p in RPM_SQLITE_PATHS
+) + RPM_BDB_PATHS
+
+INVENTORY_CACHE_VERSION = 1
+
+# cache path -> (signature key, records), so a long-running process skips even the
+# cache-file read.
+_memory_cache = {}
+
+
+def stat_signature(paths):
+    """
+    Returns a JSON-friendly signature of paths built from mtime, size and inode.
+
+    Missing paths are part of the signature too, so a package manager's database
+    appearing or disappearing counts as a change.
+    """
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            signature.append([path, st.st_mtime_ns, st.st_size, st.st_ino])
+        except OSError:
+            signature.append([path, None, None, None])
+    return signature
+
+
+def diff_packages(old_records, new_records):
+    """
+    Compares two package lists.
+
+    Packages are identified by (source, name, arch); a version change on the same
+    identity is reported as an upgrade rather than a removal plus an addition.
+
+    Returns:
+        dict: 'added' and 'removed' lists of PackageRecords, and 'upgraded' as a
+              list of (old_record, new_record) pairs.
+    """
+    old = {(r.source, r.name, r.arch): r for r in old_records}
+    new = {(r.source, r.name, r.arch): r for r in new_records}
+    added = [new[k] for k in sorted(new.keys() - old.keys())]
+    removed = [old[k] for k in sorted(old.keys() - new.keys())]
+    upgraded = [(old[k], new[k]) for k in sorted(old.keys() & new.keys()) if old[k].version != new[k].version]
+    return {"added": added, "removed": removed, "upgraded": upgraded}
+
+
+class InventoryCache:
+    """
+    Persistent record list that is only recollected when a signature changes.
+    """
+
+    def __init__(self, name, cache_path=None):
+        self.cache_path = cache_path or os.path.join(get_cache_dir("inventory"), f"{name}.json")
+
+    def _load(self):
+        # Only a private regular file is trusted; anything else is recollected
+        f = open_private(self.cache_path)
+        if f is None:
+            return None, None
+        try:
+            with f:
+                data = json.load(f)
+            if data.get("version") != INVENTORY_CACHE_VERSION:
+                return None, None
+            return data["signature"], [PackageRecord(*r) for r in data["records"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None, None
+
+    def _save(self, signature, records):
+        data = {"version": INVENTORY_CACHE_VERSION, "signature": signature, "records": [list(r) for r in records]}
+        try:
+            atomic_write(self.cache_path, json.dumps(data, separators=(",", ":")).encode("utf-8"))
+        except OSError:
+            pass # No writable cache: every run simply recollects
+
+    def get(self, signature, collect):
+        """
+        Returns the records for signature, calling collect() only when they are
+        not already cached.
+
+        Returns:
+            tuple: (records, diff, partial). diff is None if nothing changed
+                   since the last run, or the diff_packages() result against the
+                   cached list (everything counts as added on the very first run).
+                   partial is True if the resource budget cut collect() short;
+                   such a list is neither cached nor diffed, so diff is None.
+        """
+        key = json.dumps(signature)
+        memory_key, memory_records = _memory_cache.get(self.cache_path, (None, None))
+        if memory_key == key:
+            return memory_records, None, False
+
+        cached_signature, cached_records = self._load()
+        if cached_records is not None and cached_signature == signature:
+            _memory_cache[self.cache_path] = (key, cached_records)
+            return cached_records, None, False
+
+        records = list(collect())
+        if not checkpoint("packages"):
+            return records, None, True
+        diff = diff_packages(cached_records or [], records)
+        self._save(signature, records)
+        _memory_cache[self.cache_path] = (key, records)
+        return records, diff, False
@@ -0,0 +1,140 @@
+# linux_net.py
+# Native Linux network readers: routing tables straight from procfs and
+# interface attributes from sysfs, with no subprocesses involved. Cheap enough
+# to sample at high frequency.
+import os
+import socket
+import struct
+
+# Route flags from linux/route.h
+RTF_UP = 0x0001
+RTF_GATEWAY = 0x0002
+RTF_HOST = 0x0004
+RTF_REJECT = 0x0200
+
+# sysfs attributes read for every interface by default.
+DEFAULT_INTERFACE_ATTRS = ("address", "mtu", "operstate", "type", "ifindex")
+
+
+def _ipv4_from_hex(value):
+    # /proc/net/route prints each address (network byte order in memory) as a
+    # native-endian u32 in hex, so packing it back natively restores the bytes
+    # on little- and big-endian hosts (s390x, ppc64) alike.
+    return socket.inet_ntop(socket.AF_INET, struct.pack("=I", int(value, 16)))
+
+
+def _ipv6_from_hex(value):
+    return socket.inet_ntop(socket.AF_INET6, bytes.fromhex(value))
+
+
+def read_ipv4_routes(proc_root="/proc"):
+    """
+    Parses /proc/net/route.
+
+    Returns:
+        list: One dict per route with 'interface', 'destination', 'gateway',
+              'netmask', 'prefix_length', 'metric', 'mtu' and 'flags'.
+    """
+    routes = []
+    with open(os.path.join(proc_root, "net", "route"), "r") as f:
+        next(f, None) # Header
+        for line in f:
+            fields = line.split()
+            if len(fields) < 11:
+                continue
+            netmask = int(fields[7], 16)
+            routes.append({
+                "interface": fields[0],
+                "destination": _ipv4_from_hex(fields[1]),
+                "gateway": _ipv4_from_hex(fields[2]),
+                "netmask": _ipv4_from_hex(fields[7]),
+                "prefix_length": bin(netmask).count("1"),
+                "metric": int(fields[6]),
+                "mtu": int(fields[8]),
+                "flags": int(fields[3], 16),
+            })
+    return routes
+
+
+def read_ipv6_routes(proc_root="/proc"):
+    """
+    Parses /proc/net/ipv6_route.
+
+    Returns:
+        list: One dict per route with 'interface', 'destination', 'prefix_length',
+              'gateway', 'metric' and 'flags'.
+    """
+    routes = []
+    with open(os.path.join(proc_root, "net", "ipv6_route"), "r") as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) < 10:
+                continue
+            routes.append({
+                "interface": fields[9],
+                "destination": _ipv6_from_hex(fields[0]),
+                "prefix_length": int(fields[1], 16),
+                "gateway": _ipv6_from_hex(fields[4]),
+                "metric": int(fields[5], 16),
+                "flags": int(fields[8], 16),
+            })
+    return routes
+
+
+def read_routing_table(proc_root="/proc"):
+    """
+    Reads the IPv4 and IPv6 routing tables. A family whose table can't be read
+    (e.g. IPv6 disabled) comes back as an empty list.
+    """
+    table = {"ipv4": [], "ipv6": []}
+    for family, reader in (("ipv4", read_ipv4_routes), ("ipv6", read_ipv6_routes)):
+        try:
+            table[family] = reader(proc_root)
+        except OSError:
+            pass
+    return table
+
+
+def default_gateways(routing_table):
+    """
+    Lists every default route that goes through a gateway, best metric first
+    within each family (IPv4 before IPv6).
+    """
+    gateways = []
+    for family in ("ipv4", "ipv6"):
+        defaults = [
+            r for r in routing_table.get(family, [])
+            if r["prefix_length"] == 0 and r["flags"] & RTF_UP and r["flags"] & RTF_GATEWAY
+            and not r["flags"] & RTF_REJECT
+        ]
+        for route in sorted(defaults, key=lambda r: r["metric"]):
+            gateways.append({"family": family, "gateway": route["gateway"],
+                             "interface": route["interface"], "metric": route["metric"]})
+    return gateways
+
+
+def read_interface_attributes(sys_root="/sys/class/net", attrs=DEFAULT_INTERFACE_ATTRS, names=None):
+    """
+    Reads sysfs attributes of every interface (or just names) in one pass.
+
+    Returns:
+        dict: interface name -> {attribute: stripped string value}. Attributes
+              that can't be read are left out.
+    """
+    interfaces = {}
+    try:
+        entries = list(os.scandir(sys_root))
+    except OSError:
+        return interfaces
+    for entry in entries:
+        if names is not None and entry.name not in names:
+            continue
+        values = {}
+        for attr in attrs:
+            try:
+                with open(os.path.join(entry.path, attr), "r") as f:
+                    values[attr] = f.read().strip()
+            except OSError:
+                continue # Missing for this kind of device, or reading it is not permitted
+        interfaces[entry.name] = values
+    return interfaces
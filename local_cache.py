@@ -0,0 +1,84 @@
+import os
+import platform
+import stat
+import tempfile
+
+
+def get_cache_dir(*parts):
+    """
+    Returns (and creates) a per-user cache directory for trainwreck.
+
+    TRAINWRECK_CACHE_DIR overrides the location; otherwise the platform's usual
+    cache root is used (XDG_CACHE_HOME or ~/.cache, LOCALAPPDATA on Windows).
+    """
+    root = os.environ.get("TRAINWRECK_CACHE_DIR")
+    if not root:
+        if platform.system() == "Windows" and os.environ.get("LOCALAPPDATA"):
+            root = os.path.join(os.environ["LOCALAPPDATA"], "trainwreck", "cache")
+        else:
+            base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+            root = os.path.join(base, "trainwreck")
+    path = os.path.join(root, *parts)
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
+
+def is_private(path):
+    """
+    True if path (a cache directory or file) belongs to the current user and
+    nobody else can write to it, i.e. its contents can be trusted. Always True
+    where POSIX ownership doesn't apply (Windows).
+    """
+    if not hasattr(os, "getuid"):
+        return True
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return st.st_uid == os.getuid() and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def open_private(path, binary=False):
+    """
+    Opens a cache file for reading if its contents can be trusted: a regular
+    file, not reached through a symlink, that belongs to the current user and
+    nobody else can write to (ownership is only checked where POSIX ownership
+    applies). Returns the open file, or None if path is missing, unreadable or
+    not trusted.
+    """
+    # O_NONBLOCK keeps a FIFO planted at the path from blocking the open.
+    flags = os.O_RDONLY | getattr(os, "O_NONBLOCK", 0) | getattr(os, "O_NOFOLLOW", 0) | getattr(os, "O_BINARY", 0)
+    try:
+        fd = os.open(path, flags)
+    except OSError:
+        return None
+    try:
+        st = os.fstat(fd)
+        trusted = stat.S_ISREG(st.st_mode) and (
+            not hasattr(os, "getuid")
+            or (st.st_uid == os.getuid() and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)))
+        if trusted:
+            return open(fd, "rb") if binary else open(fd, "r", encoding="utf-8")
+    except OSError:
+        pass
+    os.close(fd)
+    return None
+
+
+def atomic_write(path, data):
+    """
+    Writes bytes to path via a temporary file and a rename, so concurrent readers
+    see either the old file or the complete new one.
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
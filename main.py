@@ -1,52 +1,525 @@
 # main.py
+#
+# Collector modules (and psutil, asyncio, sqlite3 and friends behind them) are
+# only imported once a selected collector actually runs, so a cheap query such
+# as `--only os` doesn't pay for everything else at startup.
 
+import argparse
+import importlib
 import json
-from net_env import get_network_environment
-from basic_checks import get_os_version_info, list_installed_applications, check_virtual_machine
-from security_processes import get_security_related_processes
-
-def run_system_diagnostics():
-    # Network environment info
-    net_env = get_network_environment()
-
-    # OS info
-    import io
-    import sys
-
-    def capture_output(func):
-        captured = io.StringIO()
-        sys_stdout = sys.stdout
-        sys.stdout = captured
-        try:
-            func()
-        finally:
-            sys.stdout = sys_stdout
-        return captured.getvalue().strip()
+import sys
+import time
+
+_MAIN_STARTED = time.perf_counter()
+
+# Per-collector deadlines in seconds. Package managers and the process-table walk
+# are the slow ones on busy hosts.
+COLLECTOR_TIMEOUTS = {
+    "network_environment": 15,
+    "os_info": 10,
+    "installed_applications": 60,
+    "vm_detection": 15,
+    "security_processes": 30,
+}
+
+# Order collectors run in when a resource budget is set: one at a time,
+# cheapest first, so a tight budget still yields the small sections.
+BUDGET_ORDER = ("os_info", "vm_detection", "network_environment", "security_processes", "installed_applications")
+
+# Past a wall-time budget, collectors get this long to notice and hand back
+# what they have before they are written off as timed out.
+BUDGET_GRACE_SECONDS = 2
+
+# Short names accepted by --only, in addition to the full section names.
+SECTION_ALIASES = {
+    "network": "network_environment",
+    "os": "os_info",
+    "apps": "installed_applications",
+    "packages": "installed_applications",
+    "vm": "vm_detection",
+    "security": "security_processes",
+    "processes": "security_processes",
+}
+
+# Wall time of the first import of each module, keyed by module name.
+IMPORT_TIMES = {}
+
+def timed_import(name):
+    """Imports a module on first use and records how long that took."""
+    # Always go through importlib: another collector thread may be half-way
+    # through importing the same module, and importlib waits for it to finish.
+    already_loaded = name in sys.modules
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    if not already_loaded:
+        IMPORT_TIMES.setdefault(name, round(time.perf_counter() - started, 6))
+    return module
+
+def parse_sections(text):
+    """Turns 'network,os' into the matching full section names, in canonical order."""
+    selected = set()
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name = SECTION_ALIASES.get(item, item)
+        if name not in COLLECTOR_TIMEOUTS:
+            choices = ", ".join(sorted(set(SECTION_ALIASES) | set(COLLECTOR_TIMEOUTS)))
+            raise argparse.ArgumentTypeError(f"unknown collector {item!r} (choose from {choices})")
+        selected.add(name)
+    return [name for name in COLLECTOR_TIMEOUTS if name in selected]
+
+def _shared_processes(sections):
+    # The process table is read once, by whichever collector gets there first,
+    # with every attribute the selected collectors need.
+    attr_sets = []
+    if "vm_detection" in sections:
+        attr_sets.append(timed_import("basic_checks").VM_PROCESS_ATTRS)
+    if "security_processes" in sections:
+        attr_sets.append(timed_import("security_processes").SECURITY_PROCESS_ATTRS)
+    if not attr_sets:
+        return None
+    return timed_import("process_snapshot").SharedProcessSnapshot(*attr_sets)
+
+def _build_collectors(sections, indicator_catalogs, network_options, incremental, streaming, budget=None):
+    Collector = timed_import("collector_engine").Collector
+    processes = _shared_processes(sections)
+
+    def network_environment():
+        info = timed_import("net_env").get_network_environment(**network_options)
+        return timed_import("ndjson_output").iter_network_records(info) if streaming else info
 
-    os_info = capture_output(get_os_version_info)
-    installed_apps_output = capture_output(list_installed_applications)
+    def os_info():
+        info = timed_import("basic_checks").get_os_version_info()
+        return [{"type": "os_info", **info}] if streaming else info
 
-    # Virtual machine detection
-    is_vm, hypervisor = check_virtual_machine()
+    def installed_applications():
+        if streaming:
+            return timed_import("ndjson_output").iter_package_records()
+        basic_checks = timed_import("basic_checks")
+        if incremental:
+            return basic_checks.get_installed_applications_inventory()
+        return basic_checks.list_installed_applications()
 
-    # Security processes
-    security_procs = get_security_related_processes()
+    def vm_detection():
+        is_vm, hypervisor = timed_import("basic_checks").check_virtual_machine(processes.get())
+        if streaming:
+            return [{"type": "vm_detection", "is_vm": is_vm, "hypervisor": hypervisor}]
+        return is_vm, hypervisor
 
-    result = {
-        "network_environment": net_env,
+    def security_processes():
+        module = timed_import("security_processes")
+        matcher = module.get_indicator_matcher(indicator_catalogs)
+        if streaming:
+            return timed_import("ndjson_output").iter_security_process_records(
+                module.iter_security_related_processes(processes.get(), matcher))
+        return module.get_security_related_processes(processes.get(), matcher)
+
+    funcs = {
+        "network_environment": network_environment,
         "os_info": os_info,
-        "installed_applications": installed_apps_output,
-        "vm_detection": {
+        "installed_applications": installed_applications,
+        "vm_detection": vm_detection,
+        "security_processes": security_processes,
+    }
+    # One command runner per run: a command several collectors need runs once,
+    # and every command a collector starts is killed at the collector's deadline
+    # instead of outliving it.
+    runner = timed_import("command_runner").CommandRunner()
+    if budget is None:
+        return [Collector(name, runner.bind(funcs[name], COLLECTOR_TIMEOUTS[name]), COLLECTOR_TIMEOUTS[name])
+                for name in sections]
+    # Budgeted: collectors may run one after another, so every deadline counts
+    # from the start of the run and covers the whole budget; each collector's
+    # commands still get its own timeout, shrunk to the wall time left.
+    if budget.wall_seconds is not None:
+        timeout = budget.wall_seconds + BUDGET_GRACE_SECONDS
+    else:
+        timeout = sum(COLLECTOR_TIMEOUTS[name] for name in sections)
+    return [Collector(name, budget.bind(name, lambda t, f=funcs[name]: runner.bind(f, t)(), COLLECTOR_TIMEOUTS[name]),
+                      timeout)
+            for name in sections]
+
+def _budget_report(runs, budget):
+    # Collectors the budget skipped or cut short are labelled as such rather
+    # than as errors or complete results.
+    for name in budget.skipped:
+        if name in runs:
+            runs[name].update(status="skipped", error=f"{budget.exhausted_by} budget used up before it started")
+    for name, reasons in budget.partial.items():
+        if name in runs and runs[name]["status"] == "ok":
+            runs[name]["status"] = "partial"
+            runs[name]["partial_reasons"] = list(reasons)
+    report = budget.report()
+    report["partial"] = report["partial"] or any(run["status"] in ("timeout", "partial", "skipped")
+                                                 for run in runs.values())
+    return report
+
+def _metrics_report(runs):
+    # Per-collector metrics move out of _collectors into their own section,
+    # next to whole-run totals.
+    instrumentation = timed_import("instrumentation")
+    collectors = {name: run.pop("metrics") for name, run in runs.items() if "metrics" in run}
+    return {
+        "wall_seconds": round(time.perf_counter() - _MAIN_STARTED, 6),
+        "cpu_seconds": round(time.process_time(), 6),
+        "peak_rss_kb": instrumentation.peak_rss_kb(),
+        "subprocess_count": sum(m["subprocess_count"] for m in collectors.values()),
+        "subprocess_seconds": round(sum(m["subprocess_seconds"] for m in collectors.values()), 6),
+        "psutil_calls": sum(m["psutil_calls"] for m in collectors.values()),
+        "collectors": collectors,
+    }
+
+def _import_report():
+    return {
+        "since_main_seconds": round(time.perf_counter() - _MAIN_STARTED, 6),
+        "modules": dict(IMPORT_TIMES),
+    }
+
+def run_system_diagnostics(indicator_catalogs=None, incremental=False, network_options=None, only=None,
+                           budget=None):
+    """
+    Runs every collector and returns their structured results. Nothing is printed.
+
+    Args:
+        indicator_catalogs: Extra indicator catalog files for the security scan.
+        incremental: Reuse the cached installed-applications list while the
+                     package databases are unchanged, and report a diff otherwise.
+        network_options: Keyword arguments for get_network_environment(), e.g.
+                         probe_targets and probe_timeout.
+        only: Section names to collect (default: all). Sections that aren't
+              selected are left out of the result.
+        budget: Optional budget.RunBudget. Collectors then run one at a time
+                in BUDGET_ORDER, and once the budget is used up the rest are
+                skipped or stop early; their '_collectors' status becomes
+                'skipped' or 'partial' and '_budget' reports the usage.
+
+    Besides the sections, the result carries '_collectors' (status and timing),
+    '_metrics' (wall/CPU time, subprocesses, psutil calls and peak memory per
+    collector and sub-step, see instrumentation.py) and '_imports'.
+    """
+    sections = list(only or COLLECTOR_TIMEOUTS)
+    if budget is not None:
+        sections.sort(key=BUDGET_ORDER.index)
+    collectors = _build_collectors(sections, indicator_catalogs, network_options or {}, incremental,
+                                   streaming=False, budget=budget)
+    if budget is None:
+        runs = timed_import("collector_engine").run_collectors(collectors)
+    else:
+        with timed_import("budget").activate(budget):
+            runs = timed_import("collector_engine").run_collectors(collectors, max_workers=1)
+        budget_report = _budget_report(runs, budget)
+
+    result = {}
+    if "network_environment" in runs:
+        result["network_environment"] = runs["network_environment"]["result"]
+    if "os_info" in runs:
+        result["os_info"] = runs["os_info"]["result"]
+    if "installed_applications" in runs:
+        installed_apps = runs["installed_applications"]["result"]
+        if incremental and installed_apps is not None:
+            result["installed_applications_changes"] = {key: installed_apps[key] for key in ("changed", "diff", "partial")}
+            installed_apps = installed_apps["applications"]
+        result["installed_applications"] = installed_apps
+    if "vm_detection" in runs:
+        # Virtual machine detection
+        is_vm, hypervisor = runs["vm_detection"]["result"] or (False, "Unknown or Physical")
+        result["vm_detection"] = {
             "is_vm": is_vm,
             "hypervisor": hypervisor
-        },
-        "security_processes": security_procs
-    }
+        }
+    if "security_processes" in runs:
+        result["security_processes"] = runs["security_processes"]["result"]
 
+    result["_metrics"] = _metrics_report(runs)
+    if budget is not None:
+        result["_budget"] = budget_report
+    result["_collectors"] = {
+        name: {k: v for k, v in run.items() if k != "result"}
+        for name, run in runs.items()
+    }
+    result["_imports"] = _import_report()
     return result
 
+def stream_system_diagnostics(writer, indicator_catalogs=None, network_options=None, only=None, budget=None):
+    """
+    Runs every collector and writes each package, interface, security process
+    and so on to writer as its own record as soon as it is produced. Finishes
+    with a 'run_summary' record holding the per-collector status.
+
+    With a budget (see run_system_diagnostics()) the collectors still run at
+    the same time, but stop early once it is used up, and the summary carries
+    '_budget'.
+    """
+    sections = list(only or COLLECTOR_TIMEOUTS)
+    collectors = _build_collectors(sections, indicator_catalogs, network_options or {}, False, streaming=True,
+                                   budget=budget)
+    emit = lambda name, record: writer.write(record)
+    if budget is None:
+        runs = timed_import("collector_engine").stream_collectors(collectors, emit)
+    else:
+        with timed_import("budget").activate(budget):
+            runs = timed_import("collector_engine").stream_collectors(collectors, emit)
+        budget_report = _budget_report(runs, budget)
+    metrics = _metrics_report(runs)
+    summary = {"type": "run_summary", "_collectors": runs, "_metrics": metrics, "_imports": _import_report()}
+    if budget is not None:
+        summary["_budget"] = budget_report
+    writer.write(summary)
+    writer.flush()
+    return runs
+
+def _probe_target(text):
+    # Parsed lazily so that argparse setup doesn't import asyncio
+    try:
+        return timed_import("net_probe").parse_probe_target(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def _niceness(text):
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid niceness {text!r}, expected an integer from 0 to 19")
+    if not 0 <= value <= 19:
+        raise argparse.ArgumentTypeError(f"niceness must be from 0 to 19, not {value}")
+    return value
+
+def _process_rate(text):
+    try:
+        value = float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid rate {text!r}, expected processes per second")
+    if not (0 < value < float("inf")):
+        raise argparse.ArgumentTypeError(f"rate must be a positive number of processes per second, not {text}")
+    return value
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Collect system diagnostics as JSON.")
+    parser.add_argument("--format", choices=("json", "text", "ndjson", "binary"), default="json",
+                        help="json (default) prints structured data only; text renders a human-readable report; "
+                             "ndjson streams one record per package, process, interface, ...; binary writes "
+                             "a compact snapshot whose sections can be read one at a time")
+    parser.add_argument("--only", type=parse_sections, metavar="COLLECTORS",
+                        help="comma-separated collectors to run, e.g. network,os "
+                             "(network, os, packages, vm, security; default: all)")
+    parser.add_argument("--import-time", action="store_true",
+                        help="print how long startup and each collector module import took to stderr")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="cProfile every collector and write the merged stats to PATH (pstats format)")
+    parser.add_argument("--output", metavar="PATH",
+                        help="ndjson/binary: write to PATH instead of stdout (ndjson: .gz/.zst implies compression)")
+    parser.add_argument("--compress", choices=("gzip", "zstd"), help="ndjson only: compress the output")
+    parser.add_argument("--indicator-catalog", action="append", dest="indicator_catalogs", metavar="PATH",
+                        help="JSON/TOML file with extra security process indicators (repeatable)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="reuse the cached package list and report what changed since the last run")
+    parser.add_argument("--probe-target", action="append", dest="probe_targets", metavar="HOST:PORT",
+                        type=_probe_target,
+                        help="TCP connectivity probe target (repeatable; replaces the defaults)")
+    parser.add_argument("--probe-timeout", type=float, metavar="SECONDS",
+                        help="connect timeout per probe target (default: 3)")
+    interfaces = parser.add_argument_group("interfaces", "for hosts with many (virtual) interfaces; any filter "
+                                           "implies --interfaces table")
+    interfaces.add_argument("--interfaces", choices=("full", "table", "summary"),
+                            help="full (default) reports nested details per interface; table collects them in "
+                                 "bulk into columns; summary only counts interfaces per kind")
+    interfaces.add_argument("--interface-name", action="append", dest="interface_names", metavar="GLOB",
+                            help="only interfaces whose name matches GLOB, e.g. 'eth*' (repeatable)")
+    interfaces.add_argument("--interface-state", action="append", dest="interface_states", metavar="STATE",
+                            choices=("up", "down", "dormant", "lowerlayerdown", "notpresent", "testing", "unknown"),
+                            help="only interfaces in link state STATE (repeatable)")
+    interfaces.add_argument("--physical-only", action="store_true",
+                            help="only hardware interfaces (no veth, bridges, tunnels, loopback)")
+    parser.add_argument("--watch", nargs="?", type=float, const=5.0, metavar="SECONDS",
+                        help="keep running and stream an NDJSON event whenever a security-related process "
+                             "starts or exits, checking every SECONDS (default: 5)")
+    parser.add_argument("--aggregate", action="append", metavar="SOURCE",
+                        help="instead of collecting, ingest result documents from SOURCE (a directory, a "
+                             "file, or - for one JSON document per line on stdin) into --fleet-db (repeatable)")
+    parser.add_argument("--fleet-db", default="fleet.sqlite", metavar="PATH",
+                        help="SQLite database for --aggregate (default: fleet.sqlite)")
+    parser.add_argument("--jobs", type=int, metavar="N", help="--aggregate worker processes (default: CPU count)")
+    parser.add_argument("--agent", action="store_true",
+                        help="run as a long-lived agent that refreshes collectors periodically and serves "
+                             "the latest results over a Unix socket")
+    parser.add_argument("--query", nargs="?", const=[], type=parse_sections, metavar="SECTIONS",
+                        help="print the cached results of a running agent (optionally only the given "
+                             "comma-separated sections)")
+    parser.add_argument("--socket", metavar="PATH", help="agent socket path (default: $XDG_RUNTIME_DIR/trainwreck.sock)")
+    parser.add_argument("--store", action="store_true",
+                        help="also record the results in the local snapshot history (json/text formats)")
+    parser.add_argument("--snapshot-db", metavar="PATH",
+                        help="snapshot history database (default: snapshots.sqlite in the cache directory)")
+    parser.add_argument("--history", action="store_true", help="list the runs in the snapshot history")
+    parser.add_argument("--show-snapshot", type=int, metavar="RUN", help="print a stored run")
+    parser.add_argument("--diff-snapshots", nargs=2, type=int, metavar=("OLD", "NEW"),
+                        help="print the sections that differ between two stored runs")
+    parser.add_argument("--read-binary", metavar="PATH",
+                        help="print a binary snapshot as JSON (only the --only sections, if given)")
+    parser.add_argument("--convert-snapshot", nargs=2, metavar=("SOURCE", "DEST"),
+                        help="convert a JSON result to a binary snapshot, or a binary snapshot back to JSON")
+    budget = parser.add_argument_group("resource budget", "any of these runs the collectors in budgeted mode "
+                                       "and reports partial results once a cap is reached")
+    budget.add_argument("--max-cpu", type=float, metavar="SECONDS",
+                        help="CPU time for the whole run, including child commands")
+    budget.add_argument("--max-wall", type=float, metavar="SECONDS", help="wall time for the whole run")
+    budget.add_argument("--nice", type=_niceness, metavar="N",
+                        help="run at CPU niceness N (0-19), inherited by every command started")
+    budget.add_argument("--idle-io", action="store_true",
+                        help="run in the idle I/O class (Linux; needs psutil), inherited by every command started")
+    budget.add_argument("--process-rate", type=_process_rate, metavar="N",
+                        help="read at most N processes per second while walking the process table")
+    return parser.parse_args(argv)
+
+def _budget_from_args(args):
+    if args.max_cpu is None and args.max_wall is None and args.nice is None and not args.idle_io \
+            and args.process_rate is None:
+        return None
+    budget = timed_import("budget").RunBudget(args.max_cpu, args.max_wall, args.nice, args.idle_io,
+                                              args.process_rate)
+    budget.lower_priority()
+    return budget
+
 if __name__ == "__main__":
-    data = run_system_diagnostics()
+    if getattr(sys, "frozen", False):
+        # Frozen builds start process-pool workers by re-running this executable
+        import multiprocessing
+        multiprocessing.freeze_support()
+    args = parse_args()
+    network_options = {}
+    if args.probe_timeout is not None:
+        network_options["probe_timeout"] = args.probe_timeout
+    if args.probe_targets:
+        network_options["probe_targets"] = args.probe_targets
+    interface_filtered = bool(args.interface_names or args.interface_states or args.physical_only)
+    if args.interfaces is not None or interface_filtered:
+        network_options["interface_mode"] = args.interfaces or "table"
+    if interface_filtered:
+        if network_options["interface_mode"] == "full":
+            raise SystemExit("error: interface filters need --interfaces table or summary")
+        network_options.update(interface_names=args.interface_names, interface_states=args.interface_states,
+                               physical_only=args.physical_only)
+
+    if args.aggregate:
+        stats = timed_import("fleet_aggregate").aggregate(args.aggregate, args.fleet_db, args.jobs)
+        print(json.dumps(stats, indent=2))
+        raise SystemExit(1 if stats["errors"] and not stats["ingested"] else 0)
+
+    if args.agent:
+        try:
+            timed_import("agent").DiagnosticsAgent(args.socket, indicator_catalogs=args.indicator_catalogs,
+                                                   network_options=network_options, only=args.only).serve_forever()
+        except RuntimeError as e:
+            raise SystemExit(f"error: {e}")
+        raise SystemExit(0)
+    if args.query is not None:
+        try:
+            response = timed_import("agent").query_agent(args.socket, args.query)
+        except OSError as e:
+            raise SystemExit(f"error: could not reach agent: {e}")
+        print(json.dumps(response, indent=2))
+        raise SystemExit(0)
+
+    if args.history or args.show_snapshot is not None or args.diff_snapshots:
+        store = timed_import("snapshot_store").SnapshotStore(args.snapshot_db)
+        try:
+            if args.history:
+                result = {"runs": [{"run": run_id, "taken_at": taken_at} for run_id, taken_at in store.runs()],
+                          "stats": store.stats()}
+            elif args.show_snapshot is not None:
+                result = store.get(args.show_snapshot)
+            else:
+                result = store.diff(*args.diff_snapshots)
+        except KeyError as e:
+            raise SystemExit(f"error: {e.args[0]}")
+        finally:
+            store.close()
+        print(json.dumps(result, indent=2))
+        raise SystemExit(0)
+
+    if args.read_binary or args.convert_snapshot:
+        binary_snapshot = timed_import("binary_snapshot")
+        try:
+            if args.convert_snapshot:
+                written = binary_snapshot.convert(*args.convert_snapshot)
+                print(f"wrote {written} snapshot to {args.convert_snapshot[1]}", file=sys.stderr)
+            else:
+                with binary_snapshot.BinarySnapshot(args.read_binary) as snapshot:
+                    print(json.dumps(snapshot.to_dict(args.only), indent=2))
+        except (OSError, ValueError) as e:
+            raise SystemExit(f"error: {e}")
+        raise SystemExit(0)
+
+    if args.watch is not None:
+        import signal
+        import threading
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        try:
+            writer = timed_import("ndjson_output").NDJSONWriter(args.output, args.compress)
+        except (RuntimeError, OSError) as e:
+            raise SystemExit(f"error: {e}")
+        matcher = timed_import("security_processes").get_indicator_matcher(args.indicator_catalogs)
+
+        def emit(event):
+            writer.write(dict(event, type="process_event"))
+            writer.flush()
+
+        with writer:
+            try:
+                timed_import("process_tracker").watch_security_processes(emit, args.watch, matcher, stop)
+            except KeyboardInterrupt:
+                pass
+        raise SystemExit(0)
+
+    if args.profile:
+        timed_import("instrumentation").enable_profiling()
+
+    budget = _budget_from_args(args)
+    if args.format == "ndjson":
+        try:
+            writer = timed_import("ndjson_output").NDJSONWriter(args.output, args.compress)
+        except (RuntimeError, OSError) as e:
+            raise SystemExit(f"error: {e}")
+        with writer:
+            stream_system_diagnostics(writer, indicator_catalogs=args.indicator_catalogs,
+                                      network_options=network_options, only=args.only, budget=budget)
+    else:
+        data = run_system_diagnostics(indicator_catalogs=args.indicator_catalogs, incremental=args.incremental,
+                                      network_options=network_options, only=args.only, budget=budget)
+
+        if args.format == "text":
+            print(timed_import("report").render_report(data))
+        elif args.format == "binary":
+            encoded = timed_import("binary_snapshot").dumps(data)
+            if args.output and args.output != "-":
+                with open(args.output, "wb") as f:
+                    f.write(encoded)
+            else:
+                sys.stdout.buffer.write(encoded)
+                sys.stdout.flush()
+        else:
+            # Print as JSON (or send via POST)
+            print(json.dumps(data, indent=2))
+
+        if args.store and data.get("_budget", {}).get("partial"):
+            # Missing packages or processes would read as removals in the history
+            print("not stored: the run was cut short by its resource budget", file=sys.stderr)
+        elif args.store:
+            store = timed_import("snapshot_store").SnapshotStore(args.snapshot_db)
+            try:
+                run_id = store.put(data)
+            finally:
+                store.close()
+            print(f"stored as snapshot run {run_id}", file=sys.stderr)
+
+    if args.profile:
+        profiled = timed_import("instrumentation").dump_profile(args.profile)
+        print(f"wrote profile of {profiled} collector(s) to {args.profile}", file=sys.stderr)
 
-    # Print as JSON (or send via POST)
-    print(json.dumps(data, indent=2))
+    if args.import_time:
+        report = _import_report()
+        print(f"startup + run: {report['since_main_seconds'] * 1000:.1f} ms", file=sys.stderr)
+        for name, seconds in sorted(report["modules"].items(), key=lambda item: -item[1]):
+            print(f"  import {name}: {seconds * 1000:.1f} ms", file=sys.stderr)
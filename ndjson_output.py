@@ -0,0 +1,112 @@
+import gzip
+import json
+import platform
+import sys
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+from basic_checks import list_installed_applications
+from interface_table import table_rows
+from package_db import iter_linux_packages
+
+# Records are flushed to the sink after this many lines, so a consumer reading a
+# pipe sees data well before the run is over.
+FLUSH_EVERY = 256
+
+
+class NDJSONWriter:
+    """
+    Writes one compact JSON document per line to a binary stream, optionally
+    gzip- or zstd-compressed.
+
+    Args:
+        path: File to write to, or None / "-" for stdout.
+        compression: None, "gzip" or "zstd". Inferred from a .gz/.zst suffix
+                     when not given.
+    """
+
+    def __init__(self, path=None, compression=None):
+        if compression is None and path:
+            if path.endswith(".gz"):
+                compression = "gzip"
+            elif path.endswith(".zst"):
+                compression = "zstd"
+        if compression == "zstd" and not ZSTD_AVAILABLE:
+            raise RuntimeError("zstd output needs the zstandard package: pip install zstandard")
+
+        self._owns_raw = bool(path and path != "-")
+        self._raw = open(path, "wb") if self._owns_raw else sys.stdout.buffer
+        if compression == "gzip":
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode="wb")
+        elif compression == "zstd":
+            self._stream = zstandard.ZstdCompressor().stream_writer(self._raw, closefd=False)
+        elif compression is None:
+            self._stream = self._raw
+        else:
+            raise ValueError(f"Unknown compression: {compression}")
+        self._unflushed = 0
+        self.count = 0
+
+    def write(self, record):
+        self._stream.write(json.dumps(record, separators=(",", ":"), default=str).encode("utf-8") + b"\n")
+        self.count += 1
+        self._unflushed += 1
+        if self._unflushed >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        if self._stream is not self._raw:
+            # Ends the current compressed block so everything so far is decodable
+            if isinstance(self._stream, gzip.GzipFile):
+                self._stream.flush()
+            else:
+                self._stream.flush(zstandard.FLUSH_BLOCK)
+        self._raw.flush()
+        self._unflushed = 0
+
+    def close(self):
+        if self._stream is not self._raw:
+            self._stream.close()
+        self._raw.flush()
+        if self._owns_raw:
+            self._raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Record builders: each turns one collector's output into a stream of flat records.
+# Every record carries a "type" so a consumer can route it without context.
+
+def iter_package_records():
+    if platform.system() == "Linux":
+        for record in iter_linux_packages():
+            yield {"type": "package", "name": record.name, "version": record.version,
+                   "arch": record.arch, "source": record.source}
+    else:
+        for app in list_installed_applications():
+            yield {"type": "package", "name": app}
+
+
+def iter_network_records(network_info):
+    interfaces = network_info.get("interfaces")
+    if isinstance(interfaces, dict):
+        for name, detail in interfaces.items():
+            yield {"type": "interface", "name": name, **detail}
+    if "interface_table" in network_info:
+        for row in table_rows(network_info["interface_table"]):
+            yield {"type": "interface", **row}
+    yield {"type": "network", **{k: v for k, v in network_info.items()
+                                 if k != "interface_table" and (k != "interfaces" or not isinstance(v, dict))}}
+
+
+def iter_security_process_records(security_processes):
+    for entry in security_processes:
+        yield {"type": "security_process", **entry}
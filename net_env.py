@@ -3,6 +3,16 @@ import subprocess
 import re
 import socket # For hostname and basic connectivity test
 
+from command_runner import run_command, submit_command
+from instrumentation import count_psutil_calls, step
+from interface_table import collect_interface_table
+from linux_net import default_gateways, read_interface_attributes, read_routing_table
+from net_probe import BackgroundProbes, DEFAULT_PROBE_TARGETS, DEFAULT_PROBE_TIMEOUT, DEFAULT_FQDN_TIMEOUT
+from report import render_network_environment
+from windows_net import dns_servers_from_ipconfig, parse_ipconfig_all
+
+RESOLV_CONF_PATH = "/etc/resolv.conf"
+
 try:
     import psutil
     PSUTIL_AVAILABLE = True
@@ -10,36 +20,98 @@ except ImportError:
     PSUTIL_AVAILABLE = False
     # print("INFO: psutil module not found. Network information will be limited.")
 
-def get_network_environment():
+def _parse_ifconfig_macs(output):
+    """Maps interface name -> MAC address from the output of a plain `ifconfig`."""
+    macs = {}
+    iface_name = None
+    for line in output.splitlines():
+        if line and not line[0].isspace():
+            iface_name = line.split(":", 1)[0] # "en0: flags=8863<UP,...> mtu 1500"
+        elif iface_name is not None:
+            match = re.match(r"\s+ether\s+([0-9a-fA-F:]+)", line)
+            if match:
+                macs.setdefault(iface_name, match.group(1))
+    return macs
+
+def get_network_environment(probe_targets=DEFAULT_PROBE_TARGETS, probe_timeout=DEFAULT_PROBE_TIMEOUT,
+                            fqdn_timeout=DEFAULT_FQDN_TIMEOUT, proc_root="/proc", resolv_conf_path=RESOLV_CONF_PATH,
+                            interface_mode="full", interface_names=None, interface_states=None, physical_only=False):
     """
     Gathers information about the system's network environment.
+
+    Nothing is printed; use report.render_network_environment() for a
+    human-readable version.
+
+    Args:
+        probe_targets: (host, port) pairs for the TCP connectivity test. They are
+                       all checked in parallel, together with FQDN resolution,
+                       while the rest of the information is collected.
+        probe_timeout: Connect timeout per target, in seconds.
+        fqdn_timeout: Timeout for FQDN resolution, in seconds.
+        proc_root: Linux only: procfs mount to read the routing tables from.
+        resolv_conf_path: Linux only: resolver configuration to read DNS servers from.
+        interface_mode: "full" reports 'interfaces' (name -> nested details);
+                        "table" reports 'interface_table' (columns from
+                        interface_table.collect_interface_table(), for hosts
+                        with thousands of interfaces); "summary" reports only
+                        'interface_summary' (counts per interface kind).
+        interface_names, interface_states, physical_only: "table"/"summary"
+                        only: interface filters (see interface_table.InterfaceFilter).
+
+    Returns:
+        dict: 'hostname', 'fqdn' (if different), 'interfaces' (name -> details)
+              or 'interface_table' / 'interface_summary', 'default_gateway',
+              'dns_servers', 'internet_connectivity', plus '*_error' keys for
+              any step that failed.
     """
-    print("--- Network Environment Check ---")
     network_info = {}
     system = platform.system()
 
-    # 1. Hostname
+    # Connectivity probes and FQDN resolution can block for seconds on offline or
+    # segmented networks, so they run in the background while we collect the rest.
+    probes = BackgroundProbes(probe_targets, probe_timeout, fqdn_timeout)
+
+    # The route and DNS commands don't depend on each other, so they start now
+    # and run alongside the interface scan.
+    commands = {}
+    if system == "Windows":
+        commands["routes"] = submit_command(["route", "print", "-4"], timeout=10)
+        # ipconfig writes to a pipe in the OEM code page (cp850 on German and French
+        # systems); any other decoding garbles localized labels such as "Nom de l'hôte"
+        commands["dns"] = submit_command(["ipconfig", "/all"], timeout=10, encoding="oem")
+    elif system == "Darwin":
+        commands["routes"] = submit_command(["netstat", "-rn"], timeout=10)
+        commands["dns"] = submit_command(["scutil", "--dns"], timeout=10)
+
+    # 1. Hostname (FQDN is filled in from the probes below)
     try:
         hostname = socket.gethostname()
         network_info['hostname'] = hostname
-        print(f"Hostname: {hostname}")
-        try:
-            full_hostname = socket.getfqdn()
-            if full_hostname != hostname:
-                network_info['fqdn'] = full_hostname
-                print(f"Fully Qualified Domain Name (FQDN): {full_hostname}")
-        except socket.gaierror:
-            print("  Could not resolve FQDN.")
     except Exception as e:
-        print(f"Could not get hostname: {e}")
         network_info['hostname'] = "N/A"
+        network_info['hostname_error'] = str(e)
 
     # 2. Network Interfaces, IP Addresses, MAC Addresses
-    if PSUTIL_AVAILABLE:
+    if interface_mode in ("table", "summary"):
+        try:
+            with step("interfaces"):
+                table = collect_interface_table(interface_names, interface_states, physical_only)
+            if interface_mode == "summary":
+                network_info['interface_summary'] = table.summary()
+            else:
+                network_info['interface_table'] = table.to_dict()
+        except (OSError, RuntimeError) as e:
+            network_info['interfaces'] = "Error"
+            network_info['interfaces_error'] = str(e)
+    elif PSUTIL_AVAILABLE:
         try:
-            net_if_addrs = psutil.net_if_addrs()
-            net_if_stats = psutil.net_if_stats() # For interface status (isup)
+            with step("interfaces"):
+                net_if_addrs = psutil.net_if_addrs()
+                net_if_stats = psutil.net_if_stats() # For interface status (isup)
+                count_psutil_calls(2)
             interfaces_data = {}
+            sysfs_attrs = None
+            ifconfig_macs = None
 
             for iface_name, snic_addrs in net_if_addrs.items():
                 iface_detail = {"ipv4_addresses": [], "ipv6_addresses": [], "mac_address": "N/A", "status": "N/A"}
@@ -73,174 +145,156 @@ def get_network_environment():
 
                 # Fallback for MAC if not found via psutil.AF_LINK (e.g., older psutil or specific OS)
                 if iface_detail["mac_address"] == "N/A" and system == "Linux":
-                    try:
-                        with open(f"/sys/class/net/{iface_name}/address", "r") as f:
-                            iface_detail["mac_address"] = f.read().strip()
-                    except FileNotFoundError:
-                        pass # Interface might not have a MAC or be virtual
+                    if sysfs_attrs is None: # Read every interface's sysfs address in one pass
+                        sysfs_attrs = read_interface_attributes(attrs=("address",))
+                    # Interface might not have a MAC or be virtual
+                    iface_detail["mac_address"] = sysfs_attrs.get(iface_name, {}).get("address", "N/A")
                 elif iface_detail["mac_address"] == "N/A" and system == "Darwin": # macOS
-                    try:
-                        # Example: ifconfig en0 | awk '/ether/{print $2}'
-                        output = subprocess.check_output(f"ifconfig {iface_name}", shell=True, text=True, stderr=subprocess.DEVNULL)
-                        match = re.search(r"ether\s+([0-9a-fA-F:]+)", output)
-                        if match:
-                            iface_detail["mac_address"] = match.group(1)
-                    except (subprocess.CalledProcessError, FileNotFoundError):
-                        pass
+                    if ifconfig_macs is None: # One ifconfig run covers every interface
+                        try:
+                            ifconfig_macs = _parse_ifconfig_macs(run_command(["ifconfig"], timeout=10))
+                        except (subprocess.SubprocessError, OSError):
+                            ifconfig_macs = {}
+                    iface_detail["mac_address"] = ifconfig_macs.get(iface_name, "N/A")
 
 
                 if iface_detail["ipv4_addresses"] or iface_detail["ipv6_addresses"] or iface_detail["mac_address"] != "N/A":
                     interfaces_data[iface_name] = iface_detail
 
             network_info['interfaces'] = interfaces_data
-            print("\nNetwork Interfaces:")
-            for name, data in interfaces_data.items():
-                print(f"  Interface: {name} (Status: {data.get('status', 'N/A')}, Speed: {data.get('speed_mbps', 'N/A')} Mbps, MTU: {data.get('mtu', 'N/A')})")
-                print(f"    MAC Address: {data['mac_address']}")
-                if data["ipv4_addresses"]:
-                    print("    IPv4 Addresses:")
-                    for addr in data["ipv4_addresses"]:
-                        print(f"      - IP: {addr['address']}, Netmask: {addr['netmask']}, Broadcast: {addr.get('broadcast', 'N/A')}")
-                if data["ipv6_addresses"]:
-                    print("    IPv6 Addresses:")
-                    for addr in data["ipv6_addresses"]:
-                        print(f"      - IP: {addr['address']}, Netmask: {addr['netmask']}")
         except Exception as e:
-            print(f"Error getting interface details with psutil: {e}")
             network_info['interfaces'] = "Error"
+            network_info['interfaces_error'] = str(e)
     else:
-        print("psutil not available. Interface information will be very limited.")
-        # Basic fallback for IP using socket (only gets one IP, often the primary one)
+        # psutil not available. Basic fallback for IP using socket (only gets one IP, often the primary one)
         try:
-            primary_ip = socket.gethostbyname(hostname) # This can be unreliable for multiple NICs
-            print(f"  Primary IP (via socket, may not be primary NIC): {primary_ip}")
+            primary_ip = socket.gethostbyname(network_info['hostname']) # This can be unreliable for multiple NICs
             network_info['primary_ip_fallback'] = primary_ip
-        except socket.gaierror:
-            print("  Could not resolve primary IP via socket.")
+        except socket.gaierror as e:
+            network_info['primary_ip_fallback_error'] = str(e)
 
 
     # 3. Default Gateway
     # psutil doesn't have a direct cross-platform way to get the default gateway easily.
     # We rely on OS-specific commands.
     default_gateway = "N/A"
-    print("\nDefault Gateway:")
     if system == "Linux":
-        try:
-            # ip route | grep default
-            output = subprocess.check_output("ip route show default", shell=True, text=True, stderr=subprocess.DEVNULL)
-            match = re.search(r"default via (\S+)", output)
-            if match:
-                default_gateway = match.group(1)
-        except (subprocess.CalledProcessError, FileNotFoundError, AttributeError):
-            pass # Command failed or no default route
+        # Read the kernel's routing tables from /proc: the full table plus every
+        # default gateway, with the best IPv4 one reported as default_gateway.
+        with step("routes"):
+            routing_table = read_routing_table(proc_root)
+        if routing_table["ipv4"] or routing_table["ipv6"]:
+            gateways = default_gateways(routing_table)
+            network_info['routes'] = routing_table
+            network_info['gateways'] = gateways
+            ipv4_gateways = [g["gateway"] for g in gateways if g["family"] == "ipv4"]
+            if ipv4_gateways:
+                default_gateway = ipv4_gateways[0]
+        else:
+            try:
+                # /proc not mounted or unreadable: fall back to ip route | grep default
+                output = run_command(["ip", "route", "show", "default"], timeout=10)
+                match = re.search(r"default via (\S+)", output)
+                if match:
+                    default_gateway = match.group(1)
+            except (subprocess.SubprocessError, OSError, AttributeError):
+                pass # Command failed or no default route
     elif system == "Windows":
         try:
             # route print -4 | findstr " 0.0.0.0"
             # Or netstat -rn | findstr "0.0.0.0"
-            output = subprocess.check_output("route print -4", shell=True, text=True, stderr=subprocess.DEVNULL)
+            output = commands["routes"].result()
             # Look for line: 0.0.0.0 0.0.0.0 <gateway_ip> <interface_ip> <metric>
             # The gateway is the third non-empty field on such a line typically
             # This regex is a bit fragile, depends on 'route print' output format
             match = re.search(r"^\s*0\.0\.0\.0\s+0\.0\.0\.0\s+(\S+)\s+", output, re.MULTILINE)
             if match:
                 default_gateway = match.group(1)
-        except (subprocess.CalledProcessError, FileNotFoundError, AttributeError):
+        except (subprocess.SubprocessError, OSError, AttributeError):
             pass
     elif system == "Darwin": # macOS
         try:
-            # netstat -rn | grep default
-            output = subprocess.check_output("netstat -rn | grep default", shell=True, text=True, stderr=subprocess.DEVNULL)
-            match = re.search(r"default\s+(\S+)", output)
+            # First "default" route in netstat -rn
+            output = commands["routes"].result()
+            match = re.search(r"^default\s+(\S+)", output, re.MULTILINE)
             if match:
                 default_gateway = match.group(1)
-        except (subprocess.CalledProcessError, FileNotFoundError, AttributeError):
+        except (subprocess.SubprocessError, OSError, AttributeError):
             pass
-    print(f"  {default_gateway}")
     network_info['default_gateway'] = default_gateway
 
 
     # 4. DNS Servers
     dns_servers = []
-    print("\nDNS Servers:")
     if system == "Linux":
         try:
             # Most modern Linux systems use /etc/resolv.conf
             # systemd-resolved might use a stub resolver, actual DNS might be elsewhere
-            with open("/etc/resolv.conf", "r") as f:
+            with open(resolv_conf_path, "r") as f:
                 for line in f:
                     line = line.strip()
                     if line.startswith("nameserver"):
                         dns_servers.append(line.split()[1])
         except FileNotFoundError:
-            print("  /etc/resolv.conf not found.")
+            network_info['dns_error'] = f"{resolv_conf_path} not found"
         except Exception as e:
-            print(f"  Error reading /etc/resolv.conf: {e}")
+            network_info['dns_error'] = f"Error reading {resolv_conf_path}: {e}"
 
     elif system == "Windows":
         try:
             # Get-DnsClientServerAddress -AddressFamily IPv4 | Select-Object -ExpandProperty ServerAddresses
             # Using 'ipconfig /all' as a more universal command-line approach
-            output = subprocess.check_output("ipconfig /all", shell=True, text=True, stderr=subprocess.DEVNULL, encoding='latin-1') # latin-1 for wider char support
-            current_dns_servers = []
-            for line in output.splitlines():
-                if "DNS Servers" in line or "DNS-Server" in line: # Check for localized terms too
-                    parts = line.split(":", 1)
-                    if len(parts) > 1 and parts[1].strip():
-                        # Multiple DNS servers can be on subsequent lines with indentation
-                        current_dns_servers.append(parts[1].strip())
-                    # Keep collecting subsequent lines if they are indented and contain IPs
-                    next_line_index = output.splitlines().index(line) + 1
-                    while next_line_index < len(output.splitlines()):
-                        next_line = output.splitlines()[next_line_index].strip()
-                        if next_line and re.match(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$", next_line):
-                            current_dns_servers.append(next_line)
-                            next_line_index += 1
-                        else:
-                            break # Stop if not an indented IP
-            # Filter out empty strings and duplicates, and "::1" if it slips in
-            dns_servers = sorted(list(set(s for s in current_dns_servers if s and s != "::1")))
-
-        except (subprocess.CalledProcessError, FileNotFoundError) as e:
-            print(f"  Error running ipconfig /all: {e}")
+            output = commands["dns"].result()
+            ipconfig = parse_ipconfig_all(output.splitlines())
+            # Every adapter's DNS servers, de-duplicated, without ::1
+            dns_servers = dns_servers_from_ipconfig(ipconfig)
+            network_info['adapters'] = ipconfig['adapters']
+
+        except (subprocess.SubprocessError, OSError) as e:
+            network_info['dns_error'] = f"Error running ipconfig /all: {e}"
         except Exception as e:
-            print(f"  Unexpected error parsing ipconfig output: {e}")
+            network_info['dns_error'] = f"Unexpected error parsing ipconfig output: {e}"
 
     elif system == "Darwin": # macOS
         try:
             # scutil --dns | grep nameserver | awk '{print $3}'
-            output = subprocess.check_output("scutil --dns", shell=True, text=True, stderr=subprocess.DEVNULL)
+            output = commands["dns"].result()
             for line in output.splitlines():
                 line = line.strip()
                 if line.startswith("nameserver["):
                     dns_servers.append(line.split()[-1])
             dns_servers = sorted(list(set(dns_servers))) # Remove duplicates
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            print("  Error running scutil --dns.")
+        except (subprocess.SubprocessError, OSError) as e:
+            network_info['dns_error'] = f"Error running scutil --dns: {e}"
 
-    if dns_servers:
-        for dns in dns_servers:
-            print(f"  - {dns}")
-    else:
-        print("  No DNS servers found or unable to determine.")
     network_info['dns_servers'] = dns_servers
 
 
-    # 5. Basic Internet Connectivity Test
-    print("\nInternet Connectivity Test:")
-    # Ping a reliable host (e.g., Google's public DNS)
-    # Using socket.create_connection for a TCP check, as ICMP ping might be blocked
-    # or require admin rights.
-    test_host = "8.8.8.8" # Google Public DNS
-    test_port = 53    # DNS port
-    try:
-        socket.create_connection((test_host, test_port), timeout=3)
-        print(f"  Successfully connected to {test_host} on port {test_port} (TCP). Internet access likely.")
-        network_info['internet_connectivity'] = {"status": "connected", "method": f"TCP to {test_host}:{test_port}"}
-    except (socket.timeout, socket.error) as e:
-        print(f"  Failed to connect to {test_host} on port {test_port} (TCP): {e}. Internet access might be an issue.")
-        network_info['internet_connectivity'] = {"status": "failed", "method": f"TCP to {test_host}:{test_port}", "error": str(e)}
-
-    print("-" * 30 + "\n")
+    # 5. Basic Internet Connectivity Test + FQDN
+    # Using TCP connects rather than ICMP ping, as ping might be blocked or require
+    # admin rights. Connectivity counts as up if any target answered.
+    with step("probes_wait"):
+        probe_results = probes.result()
+    if probe_results.get('fqdn') and probe_results['fqdn'] != network_info['hostname']:
+        network_info['fqdn'] = probe_results['fqdn']
+    elif 'fqdn_error' in probe_results:
+        network_info['fqdn_error'] = probe_results['fqdn_error']
+
+    targets = probe_results['targets']
+    if targets:
+        connected = [t for t in targets if t['status'] == "connected"]
+        reported = connected[0] if connected else targets[0]
+        connectivity = {
+            "status": "connected" if connected else "failed",
+            "method": f"TCP to {reported['host']}:{reported['port']}",
+            "targets": targets,
+        }
+        if not connected:
+            connectivity["error"] = reported.get("error")
+        network_info['internet_connectivity'] = connectivity
+    else:
+        network_info['internet_connectivity'] = {"status": "skipped", "method": "no probe targets configured"}
+
     return network_info
 
 
@@ -256,6 +310,7 @@ if __name__ == "__main__":
     print("===================================\n")
 
     net_env_data = get_network_environment()
+    print(render_network_environment(net_env_data))
 
     # You can then use net_env_data dictionary for further processing or reporting
     # print("\n--- Collected Data (Dictionary) ---")
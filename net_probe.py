@@ -0,0 +1,190 @@
+import asyncio
+import socket
+import threading
+import time
+
+# TCP reachability targets checked by default. DNS over TCP to a public resolver
+# gets through most firewalls that allow outbound traffic at all.
+DEFAULT_PROBE_TARGETS = (("8.8.8.8", 53), ("1.1.1.1", 53))
+DEFAULT_PROBE_TIMEOUT = 3
+DEFAULT_FQDN_TIMEOUT = 2
+
+
+def validate_probe_target(host, port):
+    """Raises ValueError unless host is a usable host name or address and port a TCP port."""
+    if not isinstance(host, str) or not host:
+        raise ValueError(f"Invalid probe host {host!r}")
+    if ":" not in host: # IPv6 literals don't go through IDNA
+        try:
+            host.encode("idna")
+        except UnicodeError as e:
+            raise ValueError(f"Invalid probe host {host!r}: {e}") from None
+    if isinstance(port, bool) or not isinstance(port, int) or not 0 < port < 65536:
+        raise ValueError(f"Invalid probe port {port!r} for {host!r}")
+
+
+def parse_probe_target(text):
+    """Parses 'host:port' or '[ipv6]:port' into a (host, port) tuple."""
+    if text.startswith("["):
+        host, sep, port = text[1:].partition("]:")
+    else:
+        host, sep, port = text.rpartition(":")
+    if not sep or not host or not port.isdigit():
+        raise ValueError(f"Invalid probe target {text!r}, expected HOST:PORT")
+    validate_probe_target(host, int(port))
+    return host, int(port)
+
+
+def _in_daemon_thread(loop, func, name):
+    # Blocking resolver calls (getfqdn, getaddrinfo) can take far longer than
+    # any timeout we'd like, and a default-executor thread would be joined when
+    # the event loop shuts down. A daemon thread can simply be abandoned.
+    future = loop.create_future()
+
+    def run():
+        try:
+            value, error = func(), None
+        except Exception as e:
+            value, error = None, e
+        if not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(
+                    lambda: future.done() or (future.set_exception(error) if error else future.set_result(value)))
+            except RuntimeError:
+                pass # Loop closed between the check and the call
+
+    threading.Thread(target=run, name=name, daemon=True).start()
+    return future
+
+
+def _resolve_fqdn_in_thread(loop):
+    return _in_daemon_thread(loop, socket.getfqdn, "fqdn-resolver")
+
+
+async def _connect(host, port):
+    # Resolve first so that open_connection() only ever sees addresses and never
+    # hands a slow lookup to the loop's default executor.
+    loop = asyncio.get_running_loop()
+    infos = await _in_daemon_thread(
+        loop, lambda: socket.getaddrinfo(host, port, type=socket.SOCK_STREAM), "probe-resolver")
+    error = None
+    for family, _, _, _, address in infos:
+        try:
+            return await asyncio.open_connection(address[0], address[1], family=family)
+        except OSError as e:
+            error = e
+    raise error or OSError(f"No addresses for {host!r}")
+
+
+async def _probe_target(host, port, timeout):
+    started = time.perf_counter()
+    result = {"host": host, "port": port}
+    writer = None
+    try:
+        _, writer = await asyncio.wait_for(_connect(host, port), timeout)
+        result["status"] = "connected"
+        result["rtt_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    except asyncio.TimeoutError:
+        result["status"] = "failed"
+        result["error"] = f"timed out after {timeout}s"
+    except Exception as e: # OSError, but also e.g. UnicodeError for a malformed host name
+        result["status"] = "failed"
+        result["error"] = str(e) or type(e).__name__
+    finally:
+        if writer is not None:
+            # Closing gets whatever is left of the probe's timeout, not a fresh
+            # one; a peer that stalls past that has the connection aborted.
+            writer.close()
+            remaining = timeout - (time.perf_counter() - started)
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                await asyncio.wait_for(writer.wait_closed(), remaining)
+            except asyncio.TimeoutError:
+                writer.transport.abort()
+            except OSError:
+                pass
+    return result
+
+
+async def _run_probes(targets, timeout, fqdn_timeout):
+    loop = asyncio.get_running_loop()
+    tasks = [_probe_target(host, port, timeout) for host, port in targets]
+    fqdn = None
+    if fqdn_timeout:
+        fqdn = asyncio.wait_for(_resolve_fqdn_in_thread(loop), fqdn_timeout)
+    results = await asyncio.gather(*tasks, *([fqdn] if fqdn else []), return_exceptions=True)
+
+    # Every target comes back as a dict, whatever went wrong with it
+    probes = {"targets": [
+        {"host": host, "port": port, "status": "failed", "error": str(result) or type(result).__name__}
+        if isinstance(result, BaseException) else result
+        for (host, port), result in zip(targets, results)
+    ]}
+    if fqdn:
+        fqdn_result = results[-1]
+        if isinstance(fqdn_result, asyncio.TimeoutError):
+            probes["fqdn_error"] = f"timed out after {fqdn_timeout}s"
+        elif isinstance(fqdn_result, BaseException):
+            probes["fqdn_error"] = str(fqdn_result)
+        else:
+            probes["fqdn"] = fqdn_result
+    return probes
+
+
+def run_network_probes(targets=DEFAULT_PROBE_TARGETS, timeout=DEFAULT_PROBE_TIMEOUT,
+                       fqdn_timeout=DEFAULT_FQDN_TIMEOUT):
+    """
+    Checks every target in parallel and resolves the FQDN at the same time.
+
+    Total latency is bounded by the larger of timeout and fqdn_timeout, however
+    many targets there are; name resolution counts against a target's timeout. Connections are closed as soon as they succeed.
+
+    Args:
+        targets: Iterable of (host, port) tuples.
+        timeout: Per-target connect timeout in seconds.
+        fqdn_timeout: Timeout for socket.getfqdn(); 0 or None skips it.
+
+    Returns:
+        dict: 'targets': list of {'host', 'port', 'status', 'rtt_ms' or 'error'}
+              'fqdn' or 'fqdn_error' (unless resolution was skipped)
+    """
+    checked, invalid = [], []
+    for target in targets:
+        try:
+            host, port = target
+            validate_probe_target(host, port)
+            checked.append((host, port))
+        except (TypeError, ValueError) as e:
+            host, port = target if isinstance(target, tuple) and len(target) == 2 else (target, None)
+            invalid.append({"host": host, "port": port, "status": "failed", "error": str(e)})
+    probes = asyncio.run(_run_probes(checked, timeout, fqdn_timeout))
+    probes["targets"].extend(invalid)
+    return probes
+
+
+class BackgroundProbes:
+    """
+    Runs run_network_probes() on a background thread so it overlaps with other
+    work; result() waits for it.
+    """
+
+    def __init__(self, targets=DEFAULT_PROBE_TARGETS, timeout=DEFAULT_PROBE_TIMEOUT,
+                 fqdn_timeout=DEFAULT_FQDN_TIMEOUT):
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, args=(targets, timeout, fqdn_timeout),
+                                        name="network-probes", daemon=True)
+        self._thread.start()
+
+    def _run(self, targets, timeout, fqdn_timeout):
+        try:
+            self._result = run_network_probes(targets, timeout, fqdn_timeout)
+        except Exception as e:
+            self._error = e
+
+    def result(self):
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
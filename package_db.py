@@ -0,0 +1,238 @@
+import os
+import shutil
+import sqlite3
+import struct
+from collections import namedtuple
+
+from budget import CHECK_EVERY, checkpoint
+from command_runner import iter_command_lines
+from instrumentation import step
+
+# Where the package managers keep their databases on Linux.
+DPKG_STATUS_PATH = "/var/lib/dpkg/status"
+PACMAN_LOCAL_DIR = "/var/lib/pacman/local"
+RPM_SQLITE_PATHS = ("/var/lib/rpm/rpmdb.sqlite", "/usr/lib/sysimage/rpm/rpmdb.sqlite")
+
+# One installed package. 'source' is the package manager that reported it.
+PackageRecord = namedtuple("PackageRecord", ("name", "version", "arch", "source"))
+
+# RPM header tags and types we need (see rpm's rpmtag.h).
+_RPMTAG_NAME = 1000
+_RPMTAG_VERSION = 1001
+_RPMTAG_ARCH = 1022
+_RPM_STRING_TYPES = (6, 9) # RPM_STRING_TYPE, RPM_I18NSTRING_TYPE
+
+
+def iter_dpkg_status(path=DPKG_STATUS_PATH):
+    """
+    Streams PackageRecords from a dpkg status file.
+
+    Only packages dpkg-query -W would list are returned, i.e. anything whose
+    state is not 'not-installed'. The file is read line by line, so memory use
+    does not depend on how many packages are installed.
+    """
+    name = version = arch = status = None
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            # Dispatch on the first character before comparing prefixes; most lines
+            # are fields or continuation lines we don't need.
+            c = line[0]
+            if c == "\n":
+                if name and not (status or "").endswith("not-installed"):
+                    yield PackageRecord(name, version or "", arch or "", "dpkg")
+                name = version = arch = status = None
+            elif c == "P" and line.startswith("Package:"):
+                name = line[8:].strip()
+            elif c == "V" and line.startswith("Version:"):
+                version = line[8:].strip()
+            elif c == "A" and line.startswith("Architecture:"):
+                arch = line[13:].strip()
+            elif c == "S" and line.startswith("Status:"):
+                status = line[7:].strip()
+    if name and not (status or "").endswith("not-installed"):
+        yield PackageRecord(name, version or "", arch or "", "dpkg")
+
+
+def iter_pacman_local(path=PACMAN_LOCAL_DIR):
+    """Streams PackageRecords from pacman's local database directory."""
+    for entry in os.scandir(path):
+        if not entry.is_dir():
+            continue
+        try:
+            with open(os.path.join(entry.path, "desc"), "r", encoding="utf-8", errors="replace") as f:
+                desc = {}
+                section = None
+                for line in f:
+                    line = line.strip()
+                    if line.startswith("%") and line.endswith("%"):
+                        section = line
+                    elif line and section in ("%NAME%", "%VERSION%", "%ARCH%") and section not in desc:
+                        desc[section] = line
+        except OSError:
+            continue
+        if "%NAME%" in desc:
+            yield PackageRecord(desc["%NAME%"], desc.get("%VERSION%", ""), desc.get("%ARCH%", ""), "pacman")
+
+
+def _rpm_header_strings(blob, wanted):
+    """Pulls string tags out of an rpm header blob (as stored in rpmdb.sqlite)."""
+    index_count, data_length = struct.unpack_from(">ii", blob, 0)
+    data_start = 8 + 16 * index_count
+    values = {}
+    for i in range(index_count):
+        tag, tag_type, offset, _count = struct.unpack_from(">iiii", blob, 8 + 16 * i)
+        if tag in wanted and tag_type in _RPM_STRING_TYPES:
+            start = data_start + offset
+            end = blob.index(b"\0", start, data_start + data_length)
+            values[tag] = blob[start:end].decode("utf-8", errors="replace")
+    return values
+
+
+def iter_rpm_sqlite(path):
+    """
+    Streams PackageRecords from an rpm sqlite database (rpm 4.16+).
+
+    The database is opened read-only; older Berkeley DB databases are not
+    supported and should go through the rpm command instead.
+    """
+    wanted = (_RPMTAG_NAME, _RPMTAG_VERSION, _RPMTAG_ARCH)
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        for (blob,) in conn.execute("SELECT blob FROM Packages"):
+            values = _rpm_header_strings(bytes(blob), wanted)
+            if _RPMTAG_NAME in values:
+                yield PackageRecord(values[_RPMTAG_NAME], values.get(_RPMTAG_VERSION, ""),
+                                    values.get(_RPMTAG_ARCH, ""), "rpm")
+    finally:
+        conn.close()
+
+
+# Subprocess fallbacks, used when a database is missing or can't be read directly.
+
+# Package managers can sit on a database lock for a long time; give up well
+# before the installed_applications collector's own deadline.
+PACKAGE_COMMAND_TIMEOUT = 45
+
+
+def _iter_command_records(argv, source, field_count):
+    # Parsed while the command is still writing, so the whole listing is
+    # never held in memory
+    for line in iter_command_lines(argv, timeout=PACKAGE_COMMAND_TIMEOUT):
+        parts = line.split("\t") if field_count > 2 else line.split(None, 1)
+        if not parts or not parts[0]:
+            continue
+        parts += [""] * (3 - len(parts))
+        yield PackageRecord(parts[0], parts[1], parts[2], source)
+
+
+def iter_dpkg_command():
+    return _iter_command_records(["dpkg-query", "-W", "-f=${Package}\\t${Version}\\t${Architecture}\\n"], "dpkg", 3)
+
+
+def iter_rpm_command():
+    return _iter_command_records(["rpm", "-qa", "--qf", "%{NAME}\\t%{VERSION}\\t%{ARCH}\\n"], "rpm", 3)
+
+
+def iter_pacman_command():
+    return _iter_command_records(["pacman", "-Q"], "pacman", 2)
+
+
+def _under_root(root, path):
+    return path if root == "/" else os.path.join(root, path.lstrip("/"))
+
+
+def _rpm_native_path(root="/"):
+    for path in RPM_SQLITE_PATHS:
+        path = _under_root(root, path)
+        if os.access(path, os.R_OK):
+            return path
+    return None
+
+
+def iter_linux_packages(root="/"):
+    """
+    Yields PackageRecords from every package manager found on a Linux host.
+
+    Each database is read in-process where possible and falls back to the
+    package manager's own command otherwise. A manager that is not installed
+    simply contributes nothing.
+
+    Args:
+        root: Directory the database paths are relative to, e.g. a mounted image
+              or a benchmark fixture. The command fallbacks always describe the
+              running system, so they are only used when root is "/".
+    """
+    dpkg_path = _under_root(root, DPKG_STATUS_PATH)
+    pacman_path = _under_root(root, PACMAN_LOCAL_DIR)
+    rpm_path = _rpm_native_path(root)
+    sources = [
+        ("dpkg-query", (lambda: iter_dpkg_status(dpkg_path)) if os.access(dpkg_path, os.R_OK) else None,
+         iter_dpkg_command),
+        ("rpm", (lambda: iter_rpm_sqlite(rpm_path)) if rpm_path else None, iter_rpm_command),
+        ("pacman", (lambda: iter_pacman_local(pacman_path)) if os.path.isdir(pacman_path) else None,
+         iter_pacman_command),
+    ]
+
+    count = 0
+    for command, native, fallback in sources:
+        if not checkpoint("packages"):
+            return
+        if native is not None:
+            yielded = False
+            try:
+                with step(f"packages.{command}.native"):
+                    for record in native():
+                        count += 1
+                        if count % CHECK_EVERY == 0 and not checkpoint("packages"):
+                            return
+                        yielded = True
+                        yield record
+                continue
+            except (OSError, ValueError, struct.error, sqlite3.Error):
+                # Unreadable or unexpected format: ask the package manager instead,
+                # unless we already handed out part of this database's records.
+                if yielded:
+                    continue
+        if root != "/" or not shutil.which(command):
+            continue
+        try:
+            with step(f"packages.{command}.command"):
+                yield from fallback()
+        except Exception:
+            pass
+
+
+def format_package(record):
+    """Formats a PackageRecord the way list_installed_applications() reports it."""
+    if record.source == "dpkg":
+        return f"{record.name} ({record.version})"
+    if record.source == "rpm":
+        return f"{record.name}-{record.version}.{record.arch}"
+    return f"{record.name} {record.version}"
+
+
+def parse_package_label(label):
+    """
+    Splits a list_installed_applications() string back into (name, version).
+
+    Inverse of format_package() for dpkg ("name (ver)"), pacman ("name ver")
+    and rpm ("name-ver.arch"), plus the Windows ("name (Version: ver)",
+    "name (winget)") and macOS (application bundle path) forms. The version is
+    "" when the label doesn't carry one.
+    """
+    if label.endswith(")") and " (" in label:
+        name, _, version = label[:-1].rpartition(" (")
+        if version == "winget":
+            return name, ""
+        if version.startswith("Version: "):
+            version = version[9:]
+        return name, "" if version == "N/A" else version
+    if label.endswith(".app") and ("/" in label or "\\" in label):
+        return os.path.basename(label)[:-4], ""
+    if " " in label:
+        name, _, version = label.rpartition(" ")
+        return name, version
+    name, sep, version_arch = label.rpartition("-")
+    if sep and name and "." in version_arch:
+        return name, version_arch.rpartition(".")[0]
+    return label, ""
@@ -0,0 +1,118 @@
+# process_fetch.py
+# Per-process attribute reads, cheapest first, with a memory of what the OS
+# refused. On hardened hosts reading other users' exe/cmdline fails for many
+# PIDs on every run; psutil pays for the failed syscall and the exception each
+# time. The fetcher remembers each refusal per (pid, create_time), so the same
+# process is never asked twice, within a run or across agent ticks.
+import threading
+
+from instrumentation import count, count_psutil_calls
+
+# Order in which attributes are read. The name comes from /proc/<pid>/stat and
+# is available for any visible process; the command line needs read access to
+# /proc/<pid>/cmdline; exe is a readlink that needs ptrace-level access and is
+# the one usually denied.
+FETCH_ORDER = ("name", "cmdline", "exe")
+
+# Denied entries kept at most. Entries of exited processes are pruned whenever
+# a full PID list is available; this is only a backstop.
+MAX_DENIED_ENTRIES = 65536
+
+
+class ProcessFetcher:
+    """
+    Reads process attributes and caches AccessDenied per (pid, create_time).
+
+    Denials received and reads skipped because of an earlier denial are
+    counted in the current collector's metrics ('access_denied' and
+    'access_denied_skipped').
+    """
+
+    def __init__(self, max_entries=MAX_DENIED_ENTRIES):
+        self.max_entries = max_entries
+        self._denied = {} # (pid, create_time) -> frozenset of denied attributes
+        self._lock = threading.Lock()
+
+    def read(self, proc, attrs):
+        """
+        Reads attrs of one psutil.Process in FETCH_ORDER.
+
+        Args:
+            proc: psutil.Process.
+            attrs: Attribute names out of FETCH_ORDER (others are ignored).
+
+        Returns:
+            dict: 'pid', 'create_time' and every requested attribute; denied,
+                  skipped or zombie attributes are None. None if the process
+                  is gone.
+        """
+        import psutil
+
+        values = {"pid": proc.pid, "create_time": None}
+        wanted = [attr for attr in FETCH_ORDER if attr in attrs]
+        newly_denied = []
+        skipped = 0
+        calls = 0
+        try:
+            # create_time inside oneshot() too: on Linux it comes from the same
+            # /proc/<pid>/stat read as the name. A zombie has no usable
+            # identity and ends up in the NoSuchProcess handler below.
+            with proc.oneshot():
+                calls += 1
+                try:
+                    values["create_time"] = proc.create_time()
+                except psutil.AccessDenied:
+                    pass # No stable identity, so nothing gets cached for this one
+                key = (proc.pid, values["create_time"]) if values["create_time"] is not None else None
+                with self._lock:
+                    known_denied = self._denied.get(key, frozenset()) if key else frozenset()
+
+                for attr in wanted:
+                    if attr in known_denied:
+                        values[attr] = None
+                        skipped += 1
+                        continue
+                    try:
+                        values[attr] = getattr(proc, attr)()
+                    except psutil.AccessDenied:
+                        values[attr] = None
+                        newly_denied.append(attr)
+                    except psutil.ZombieProcess:
+                        values[attr] = None
+                    calls += 1
+        except psutil.NoSuchProcess:
+            return None
+        finally:
+            count_psutil_calls(calls)
+
+        if newly_denied and key is not None:
+            with self._lock:
+                if len(self._denied) >= self.max_entries and key not in self._denied:
+                    self._denied.pop(next(iter(self._denied))) # Oldest entry
+                self._denied[key] = known_denied.union(newly_denied)
+        count("access_denied", len(newly_denied))
+        count("access_denied_skipped", skipped)
+        return values
+
+    def prune(self, live_pids):
+        """Forgets denials of processes that are no longer running."""
+        live_pids = set(live_pids)
+        with self._lock:
+            for key in [k for k in self._denied if k[0] not in live_pids]:
+                del self._denied[key]
+
+    def __len__(self):
+        return len(self._denied)
+
+
+_default_fetcher = None
+_default_lock = threading.Lock()
+
+
+def get_process_fetcher():
+    """Returns the process-wide ProcessFetcher, so denials are remembered across runs."""
+    global _default_fetcher
+    with _default_lock:
+        if _default_fetcher is None:
+            _default_fetcher = ProcessFetcher()
+        return _default_fetcher
@@ -0,0 +1,128 @@
+import importlib.util
+import threading
+import time
+from collections import namedtuple
+
+from budget import CHECK_EVERY, checkpoint, note_partial, throttle
+from instrumentation import count_psutil_calls, step
+from process_fetch import get_process_fetcher
+
+# psutil itself is only imported when a snapshot is actually taken, so importing
+# this module (e.g. for an OS-info-only run) stays cheap.
+PSUTIL_AVAILABLE = importlib.util.find_spec("psutil") is not None
+
+# Attributes a snapshot knows how to load. Anything not requested stays None.
+SNAPSHOT_ATTRS = ("pid", "name", "exe", "cmdline")
+
+# One row of the process table. A namedtuple has no per-instance __dict__, so this
+# is as compact as a __slots__ class and read-only for free.
+ProcessRecord = namedtuple("ProcessRecord", SNAPSHOT_ATTRS)
+
+
+class ProcessSnapshot:
+    """
+    Read-only view of the process table taken at one point in time.
+
+    Attributes:
+        attrs: frozenset of the attributes that were loaded for every record.
+        taken_at: time.time() when the table was read.
+        complete: False if the walk stopped early because the run's resource
+                  budget ran out (see budget.py).
+    """
+    __slots__ = ("_records", "attrs", "taken_at", "complete")
+
+    def __init__(self, records, attrs, taken_at=None, complete=True):
+        self._records = tuple(records)
+        self.attrs = frozenset(attrs)
+        self.taken_at = time.time() if taken_at is None else taken_at
+        self.complete = complete
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __getitem__(self, index):
+        return self._records[index]
+
+    def provides(self, attrs):
+        """Returns True if every attribute in attrs was loaded."""
+        return self.attrs.issuperset(attrs)
+
+
+def take_process_snapshot(attrs=("pid", "name"), fetcher=None):
+    """
+    Walks the process table once and loads only the requested attributes.
+
+    Processes that disappear half-way through are skipped; attributes the OS
+    refuses are left as None, and the refusal is remembered by the fetcher so
+    the next snapshot doesn't ask that process again.
+
+    Args:
+        attrs: Attributes out of SNAPSHOT_ATTRS.
+        fetcher: process_fetch.ProcessFetcher; defaults to the shared one.
+
+    Returns:
+        ProcessSnapshot, or None if psutil is not available.
+    """
+    if not PSUTIL_AVAILABLE:
+        return None
+    import psutil
+
+    attrs = frozenset(attrs) | {"pid"}
+    unknown = attrs.difference(SNAPSHOT_ATTRS)
+    if unknown:
+        raise ValueError(f"Unsupported process attributes: {sorted(unknown)}")
+
+    if fetcher is None:
+        fetcher = get_process_fetcher()
+    records = []
+    pids = []
+    complete = True
+    with step("process_snapshot"):
+        count_psutil_calls()
+        for proc in psutil.process_iter():
+            if (throttle() or len(pids) % CHECK_EVERY == 0) and not checkpoint("process_snapshot"):
+                complete = False
+                break
+            pids.append(proc.pid)
+            info = fetcher.read(proc, attrs)
+            if info is None:
+                continue # Gone
+            cmdline = info.get("cmdline")
+            records.append(ProcessRecord(
+                info["pid"],
+                info.get("name"),
+                info.get("exe"),
+                tuple(cmdline) if cmdline else cmdline,
+            ))
+        if complete:
+            fetcher.prune(pids) # Only a full walk knows which processes are gone
+    return ProcessSnapshot(records, attrs, complete=complete)
+
+
+class SharedProcessSnapshot:
+    """
+    Lazily takes a single snapshot on behalf of several collectors.
+
+    Each collector declares the attributes it needs up front; the first call to
+    get() reads the process table once with the union of them, and every later
+    call (from any thread) gets the same ProcessSnapshot.
+    """
+
+    def __init__(self, *attr_sets):
+        self.attrs = frozenset().union(*attr_sets) if attr_sets else frozenset(("pid", "name"))
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._taken = False
+
+    def get(self):
+        with self._lock:
+            if not self._taken:
+                self._snapshot = take_process_snapshot(self.attrs)
+                self._taken = True
+            snapshot = self._snapshot
+        if snapshot is not None and not snapshot.complete:
+            note_partial("process_snapshot") # Every collector relying on it is partial
+        return snapshot
@@ -0,0 +1,222 @@
+# process_tracker.py
+# Incremental security process monitoring. Instead of re-reading and re-matching
+# the whole process table every cycle, the tracker remembers which PIDs it has
+# already seen (with their create times) and only fetches and matches new ones.
+import os
+import sys
+import time
+
+from budget import CHECK_EVERY, checkpoint, throttle
+from instrumentation import count_psutil_calls, step
+from process_fetch import get_process_fetcher
+from process_snapshot import PSUTIL_AVAILABLE, ProcessRecord, ProcessSnapshot
+from security_processes import SECURITY_PROCESS_ATTRS, get_indicator_matcher, iter_process_matches
+
+
+def _read_process(psutil, pid, fetcher):
+    """Returns (create_time, ProcessRecord) for pid, or None if it is gone."""
+    try:
+        proc = psutil.Process(pid)
+    except (psutil.NoSuchProcess, psutil.ZombieProcess):
+        return None
+    except psutil.AccessDenied:
+        return None, None # Not even its identity is readable
+    finally:
+        count_psutil_calls()
+    info = fetcher.read(proc, SECURITY_PROCESS_ATTRS)
+    if info is None:
+        return None
+    cmdline = info["cmdline"]
+    return info["create_time"], ProcessRecord(pid, info["name"], info["exe"], tuple(cmdline) if cmdline else cmdline)
+
+
+def _create_time(psutil, pid):
+    try:
+        return psutil.Process(pid).create_time()
+    except (psutil.NoSuchProcess, psutil.ZombieProcess, psutil.AccessDenied):
+        return None
+    finally:
+        count_psutil_calls()
+
+
+def _proc_start_ticks(pid):
+    # Field 22 of /proc/<pid>/stat: start time in clock ticks since boot. One
+    # small read, readable for every process, unlike most of psutil's data.
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    fields = data.rpartition(b")")[2].split() # The command name may contain spaces and parentheses
+    return int(fields[19]) if len(fields) > 19 else None
+
+
+def _start_identity(psutil, pid):
+    """Something that changes when pid is reused by another process, or None if pid is gone."""
+    if sys.platform.startswith("linux") and os.path.isdir("/proc"):
+        return _proc_start_ticks(pid)
+    return _create_time(psutil, pid)
+
+
+def _last_pid():
+    # Last PID the kernel handed out in our PID namespace (Linux), or None.
+    try:
+        with open("/proc/sys/kernel/ns_last_pid", "rb") as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _allocated_since(pids, previous, current):
+    """
+    Returns the PIDs in pids the kernel may have allocated after previous and
+    up to current. PIDs are handed out in increasing order and wrap around at
+    pid_max, so only those in that window can have been reused (short of a
+    full lap of pid_max between two ticks).
+    """
+    if previous is None or current is None or previous == current:
+        return []
+    if current > previous:
+        return [pid for pid in pids if previous < pid <= current]
+    return [pid for pid in pids if pid > previous or pid <= current] # Wrapped around pid_max
+
+
+class ProcessTracker:
+    """
+    Keeps track of security-related processes across ticks.
+
+    Each tick lists the current PIDs (one directory read on Linux), drops the
+    ones that went away and reads and matches only PIDs it hasn't seen before,
+    so the per-tick cost follows process churn rather than the size of the
+    process table. A PID can also be reused between two ticks without ever
+    leaving the listing. On Linux the kernel's last allocated PID tells which
+    known PIDs can have been handed out again since the previous tick; only
+    those have their start time re-checked (one small /proc read each), and a
+    reused one is read again as a new process: a matched one is reported as
+    exited, and a security process that took over an unmatched PID is
+    reported as started. Elsewhere, reuse is only noticed once the PID has
+    been missing from a listing.
+
+    The first tick sees every process as new and reports each match as started.
+    """
+
+    def __init__(self, matcher=None, fetcher=None):
+        self.matcher = matcher or get_indicator_matcher()
+        self.fetcher = fetcher or get_process_fetcher()
+        self.ticks = 0
+        self._known = {} # pid -> create_time (None if it couldn't be read)
+        self._identity = {} # pid -> _start_identity() when it was first read
+        self._matched = {} # pid -> (priority, entry)
+        self._last_pid = None # _last_pid() at the previous listing
+
+    def set_matcher(self, matcher):
+        """
+        Switches to another matcher, e.g. after an indicator catalog reload.
+        The next tick starts over like the first one and reports every current
+        match as started again.
+        """
+        if matcher is not self.matcher:
+            self.matcher = matcher
+            self._known.clear()
+            self._identity.clear()
+            self._matched.clear()
+
+    def tick(self):
+        """
+        Updates the tracked state.
+
+        Returns:
+            list: Event dicts, exits first. Each has 'event' ('started' or
+                  'exited'), 'time', 'create_time' and the process fields of
+                  get_security_related_processes() ('pid', 'name', 'cmdline',
+                  'category', 'matched_keyword', 'match_location'). Exit events
+                  also carry 'lifetime_seconds'.
+        """
+        if not PSUTIL_AVAILABLE:
+            return []
+        import psutil
+
+        now = time.time()
+        self.ticks += 1
+        with step("list_pids"):
+            last_pid = _last_pid() # Before listing: later allocations fall in the next tick's window
+            pids = set(psutil.pids())
+            count_psutil_calls()
+            if self.ticks % 16 == 1:
+                self.fetcher.prune(pids)
+
+        events = []
+        for pid in self._known.keys() - pids:
+            self._forget(pid, events, now)
+        with step("check_reused"):
+            for pid in _allocated_since(self._known, self._last_pid, last_pid):
+                if _start_identity(psutil, pid) != self._identity.get(pid):
+                    # Reused by another process (or gone since the listing):
+                    # the old one exited, and the PID is read again as new
+                    self._forget(pid, events, now)
+
+        self._last_pid = last_pid
+
+        new_pids = sorted(pids - self._known.keys())
+        records = []
+        with step("read_new"):
+            for index, pid in enumerate(new_pids):
+                if (throttle() or index % CHECK_EVERY == 0) and not checkpoint("process_tracker"):
+                    break # Unread PIDs stay unknown and are read on a later tick
+                identity = _start_identity(psutil, pid) # Before the read, so a reuse during it is caught next tick
+                process = _read_process(psutil, pid, self.fetcher)
+                if process is None or identity is None:
+                    continue
+                create_time, record = process
+                self._known[pid] = create_time # Unreadable processes are remembered too, not retried
+                self._identity[pid] = identity
+                if record is not None:
+                    records.append(record)
+        with step("match_new"):
+            snapshot = ProcessSnapshot(records, SECURITY_PROCESS_ATTRS, taken_at=now)
+            for priority, entry in iter_process_matches(snapshot, self.matcher):
+                entry["create_time"] = self._known[entry["pid"]]
+                self._matched[entry["pid"]] = (priority, entry)
+                events.append(dict(entry, event="started", time=now))
+        return events
+
+    def _forget(self, pid, events, now):
+        del self._known[pid]
+        self._identity.pop(pid, None)
+        if pid in self._matched:
+            events.append(self._exit_event(pid, now))
+
+    def _exit_event(self, pid, now):
+        _, entry = self._matched.pop(pid)
+        event = dict(entry, event="exited", time=now)
+        if entry.get("create_time") is not None:
+            event["lifetime_seconds"] = round(now - entry["create_time"], 3)
+        return event
+
+    def matched(self):
+        """
+        Returns the currently running matches, ordered like
+        get_security_related_processes() (indicator priority, then PID).
+        """
+        return [entry for _, entry in sorted(self._matched.values(), key=lambda m: (m[0], m[1]["pid"]))]
+
+    def __len__(self):
+        return len(self._known)
+
+
+def watch_security_processes(emit, interval=5.0, matcher=None, stop=None):
+    """
+    Calls emit(event) for every started/exited security process, checking every
+    interval seconds until stop (a threading.Event) is set or KeyboardInterrupt.
+    """
+    tracker = ProcessTracker(matcher)
+    while True:
+        started = time.monotonic()
+        for event in tracker.tick():
+            emit(event)
+        remaining = max(0.0, interval - (time.monotonic() - started))
+        if stop is not None:
+            if stop.wait(remaining):
+                return tracker
+        else:
+            time.sleep(remaining)
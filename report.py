@@ -0,0 +1,152 @@
+# report.py
+# Human-readable rendering of collector results. Collectors only return data;
+# turning it into text is a separate, optional step.
+from interface_table import table_rows
+
+
+def render_network_environment(network_info):
+    lines = ["--- Network Environment Check ---"]
+    lines.append(f"Hostname: {network_info.get('hostname', 'N/A')}")
+    if "hostname_error" in network_info:
+        lines.append(f"Could not get hostname: {network_info['hostname_error']}")
+    if "fqdn" in network_info:
+        lines.append(f"Fully Qualified Domain Name (FQDN): {network_info['fqdn']}")
+    elif "fqdn_error" in network_info:
+        lines.append("  Could not resolve FQDN.")
+
+    interfaces = network_info.get("interfaces")
+    if isinstance(interfaces, dict):
+        lines.append("\nNetwork Interfaces:")
+        for name, data in interfaces.items():
+            lines.append(f"  Interface: {name} (Status: {data.get('status', 'N/A')}, Speed: {data.get('speed_mbps', 'N/A')} Mbps, MTU: {data.get('mtu', 'N/A')})")
+            lines.append(f"    MAC Address: {data['mac_address']}")
+            if data["ipv4_addresses"]:
+                lines.append("    IPv4 Addresses:")
+                for addr in data["ipv4_addresses"]:
+                    lines.append(f"      - IP: {addr['address']}, Netmask: {addr['netmask']}, Broadcast: {addr.get('broadcast', 'N/A')}")
+            if data["ipv6_addresses"]:
+                lines.append("    IPv6 Addresses:")
+                for addr in data["ipv6_addresses"]:
+                    lines.append(f"      - IP: {addr['address']}, Netmask: {addr['netmask']}")
+    elif "interface_table" in network_info:
+        table = network_info["interface_table"]
+        lines.append(f"\nNetwork Interfaces ({len(table['interfaces']['name'])} of {table['links_seen']}):")
+        for row in table_rows(table):
+            addresses = ", ".join(f"{a['address']}/{a['prefix_length']}" for a in row["addresses"]) or "no addresses"
+            lines.append(f"  {row['name']} ({row['kind']}, {row['state']}, MTU {row['mtu']}, "
+                         f"MAC {row['mac_address'] or 'N/A'}): {addresses}")
+    elif "interface_summary" in network_info:
+        summary = network_info["interface_summary"]
+        lines.append(f"\nNetwork Interfaces: {summary['interfaces']} of {summary['links_seen']}, "
+                     f"{summary['addresses']} addresses")
+        for kind, entry in summary["by_kind"].items():
+            lines.append(f"  {kind}: {entry['interfaces']} ({entry['up']} up), {entry['addresses']} addresses")
+    elif "interfaces_error" in network_info:
+        lines.append(f"Error getting interface details: {network_info['interfaces_error']}")
+    else:
+        lines.append("psutil not available. Interface information will be very limited.")
+        if "primary_ip_fallback" in network_info:
+            lines.append(f"  Primary IP (via socket, may not be primary NIC): {network_info['primary_ip_fallback']}")
+        else:
+            lines.append("  Could not resolve primary IP via socket.")
+
+    lines.append("\nDefault Gateway:")
+    lines.append(f"  {network_info.get('default_gateway', 'N/A')}")
+    for gateway in network_info.get("gateways", [])[1:]:
+        lines.append(f"  also: {gateway['gateway']} via {gateway['interface']} ({gateway['family']}, metric {gateway['metric']})")
+
+    lines.append("\nDNS Servers:")
+    if "dns_error" in network_info:
+        lines.append(f"  {network_info['dns_error']}")
+    if network_info.get("dns_servers"):
+        for dns in network_info["dns_servers"]:
+            lines.append(f"  - {dns}")
+    else:
+        lines.append("  No DNS servers found or unable to determine.")
+
+    connectivity = network_info.get("internet_connectivity")
+    if connectivity:
+        lines.append("\nInternet Connectivity Test:")
+        if connectivity["status"] == "connected":
+            lines.append(f"  Successfully connected via {connectivity['method']}. Internet access likely.")
+        elif connectivity["status"] == "skipped":
+            lines.append("  Skipped (no probe targets configured).")
+        else:
+            lines.append(f"  Failed to connect via {connectivity['method']}: {connectivity.get('error')}. Internet access might be an issue.")
+        for target in connectivity.get("targets", []):
+            detail = f"{target['rtt_ms']} ms" if target["status"] == "connected" else target.get("error")
+            lines.append(f"    - {target['host']}:{target['port']}: {target['status']} ({detail})")
+
+    lines.append("-" * 30 + "\n")
+    return "\n".join(lines)
+
+
+def render_security_processes(security_processes_found):
+    lines = [
+        "--- Scanning for Security-Related Processes ---",
+        "NOTE: This is heuristic. Results may include false positives or miss some processes.\n",
+    ]
+    if security_processes_found:
+        lines.append(f"Found {len(security_processes_found)} potential security-related process(es):")
+        # Sort by PID for consistent output
+        for item in sorted(security_processes_found, key=lambda x: x['pid']):
+            lines.append(f"  - PID: {item['pid']}, Name: {item['name']}, Category: {item['category']}")
+            lines.append(f"    Matched Keyword: '{item['matched_keyword']}' (in {item['match_location']})")
+            if item['cmdline']:
+                lines.append(f"    Cmdline: {item['cmdline'][:150]}{'...' if len(item['cmdline']) > 150 else ''}")
+            else:
+                lines.append("    Cmdline: N/A")
+    else:
+        lines.append("  No processes matched the known security-related indicators.")
+        lines.append("  This does NOT guarantee no security processes are running.")
+    lines.append("-" * 30 + "\n")
+    return "\n".join(lines)
+
+
+def render_os_info(os_info):
+    lines = ["--- Operating System ---"]
+    for key, value in os_info.items():
+        if isinstance(value, dict):
+            lines.append(f"{key}:")
+            for sub_key, sub_value in value.items():
+                lines.append(f"  {sub_key}: {sub_value}")
+        else:
+            lines.append(f"{key}: {value}")
+    lines.append("-" * 30 + "\n")
+    return "\n".join(lines)
+
+
+def render_installed_applications(applications):
+    lines = [f"--- Installed Applications ({len(applications)}) ---"]
+    lines.extend(f"  {app}" for app in applications)
+    lines.append("-" * 30 + "\n")
+    return "\n".join(lines)
+
+
+def render_vm_detection(vm_detection):
+    lines = ["--- Virtual Machine Detection ---"]
+    if vm_detection.get("is_vm"):
+        lines.append(f"Running in a virtual machine (hypervisor: {vm_detection.get('hypervisor')})")
+    else:
+        lines.append("No virtualization detected.")
+    lines.append("-" * 30 + "\n")
+    return "\n".join(lines)
+
+
+def render_report(result):
+    """Renders a run_system_diagnostics() result as plain text."""
+    sections = []
+    if result.get("network_environment"):
+        sections.append(render_network_environment(result["network_environment"]))
+    if result.get("os_info"):
+        sections.append(render_os_info(result["os_info"]))
+    if result.get("vm_detection"):
+        sections.append(render_vm_detection(result["vm_detection"]))
+    if result.get("installed_applications") is not None:
+        sections.append(render_installed_applications(result["installed_applications"]))
+    if result.get("security_processes") is not None:
+        sections.append(render_security_processes(result["security_processes"]))
+    for name, run in result.get("_collectors", {}).items():
+        if run["status"] != "ok":
+            sections.append(f"Collector {name} {run['status']}: {run.get('error', '')}")
+    return "\n".join(sections)
@@ -1,18 +1,24 @@
+import multiprocessing
 import os
 import platform
 import subprocess
 import re
+import threading
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
 
-# Ensure psutil is available
-try:
-    import psutil
-    PSUTIL_AVAILABLE = True
-except ImportError:
-    PSUTIL_AVAILABLE = False
-    # print("INFO: psutil module not found. Process information gathering will be limited.")
+from budget import checkpoint
+from indicator_matcher import IndicatorMatcher
+from instrumentation import step
+from process_snapshot import PSUTIL_AVAILABLE, take_process_snapshot
+from report import render_security_processes
+
+# Process attributes get_security_related_processes() needs from a process snapshot.
+SECURITY_PROCESS_ATTRS = frozenset(("pid", "name", "cmdline", "exe"))
 
 # Keywords and specific process names often associated with security functions.
-# This list should be expanded significantly for better coverage.
+# This list should be expanded significantly for better coverage; larger catalogs can be
+# loaded from JSON/TOML files on top of it (see get_indicator_matcher()).
 # We'll categorize them for slightly better context.
 # Process names should be lowercase for case-insensitive matching.
 SECURITY_PROCESS_INDICATORS = {
@@ -47,11 +53,268 @@ SECURITY_PROCESS_INDICATORS = {
 }
 
 
-def get_security_related_processes():
+# Process tables at least this large are matched on a process pool by
+# get_security_related_processes() (when more than one CPU is available).
+# Below it, shipping the work to other processes costs more than it saves.
+PARALLEL_MATCH_MIN_PROCESSES = 20000
+
+# Processes per work item for parallel matching.
+PARALLEL_MATCH_CHUNK_SIZE = 2048
+
+# Extra catalog files (os.pathsep-separated) to load on top of the built-in indicators
+# when no catalog paths are passed explicitly.
+INDICATOR_CATALOGS_ENV = "TRAINWRECK_INDICATOR_CATALOGS"
+
+_default_matcher = None
+_catalogs = {} # tuple of catalog paths -> IndicatorCatalog, kept for hot reload
+
+
+def get_indicator_matcher(catalog_paths=None):
+    """
+    Returns the IndicatorMatcher to scan processes with.
+
+    Without catalog files this is SECURITY_PROCESS_INDICATORS, compiled on first
+    use. With catalog files (from catalog_paths or INDICATOR_CATALOGS_ENV), their
+    indicators are appended to the built-in ones; the compiled matcher comes from
+    the on-disk cache and is only rebuilt when one of the files changes.
+    """
+    global _default_matcher
+    if catalog_paths is None:
+        catalog_paths = [p for p in os.environ.get(INDICATOR_CATALOGS_ENV, "").split(os.pathsep) if p]
+    if catalog_paths:
+        from indicator_catalog import IndicatorCatalog # Only needed (and loaded) with catalog files
+        key = tuple(catalog_paths)
+        if key not in _catalogs:
+            _catalogs[key] = IndicatorCatalog(catalog_paths, base=SECURITY_PROCESS_INDICATORS)
+        return _catalogs[key].matcher()
+
+    if _default_matcher is None:
+        _default_matcher = IndicatorMatcher(SECURITY_PROCESS_INDICATORS)
+    return _default_matcher
+
+
+def _matched_name(name, exe):
+    # Normalize name: take basename of exe if available, otherwise use name
+    return os.path.basename(exe).lower() if exe else (name or '').lower()
+
+
+def _normalize(proc):
+    # Returns (reported name, matched name, command line) of one process record.
+    # Sometimes cmdline can be None or empty list, handle it.
+    cmdline_str = ' '.join(proc.cmdline) if proc.cmdline else ''
+    return (proc.name or '').lower(), _matched_name(proc.name, proc.exe), cmdline_str
+
+
+def _entry(proc, raw_name, cmdline_str, match):
+    priority, category, keyword, location = match
+    return priority, {
+        "pid": proc.pid,
+        "name": raw_name, # Report original name for clarity
+        "cmdline": cmdline_str,
+        "category": category,
+        "matched_keyword": keyword,
+        "match_location": location
+    }
+
+
+def iter_process_matches(process_snapshot, matcher):
+    """
+    Yields (priority, entry) for every matching process, in process-table order.
+    A lower priority means an earlier indicator; entries are the dicts
+    get_security_related_processes() returns.
+    """
+    if process_snapshot is None:
+        if not PSUTIL_AVAILABLE:
+            return # Cannot reliably get process info cross-platform without psutil
+        # No fallback if the process table can't be read, as process iteration is
+        # central to psutil's strength; the error propagates to the caller.
+        process_snapshot = take_process_snapshot(SECURITY_PROCESS_ATTRS)
+    if matcher is None:
+        matcher = get_indicator_matcher()
+
+    # One pass of the compiled matcher over each name and command line.
+    name_priorities = {} # Many processes share a name, so scan each distinct one once
+
+    for index, proc in enumerate(process_snapshot):
+        if index % 1024 == 0 and not checkpoint("indicator_match"):
+            return
+        raw_name, proc_name, cmdline_str = _normalize(proc)
+        if not proc_name: # Skip if process name is empty
+            continue
+
+        if proc_name not in name_priorities:
+            name_priorities[proc_name] = matcher.scan_name(proc_name)
+        match = matcher.match(proc_name, cmdline_str.lower(), name_priorities[proc_name])
+        if match is not None:
+            yield _entry(proc, raw_name, cmdline_str, match)
+
+
+# Parallel matching. Each chunk of the process table travels to a worker as
+# three NUL-separated strings (names, exe paths and command lines; none of them
+# can contain NUL), which pickle as flat buffers instead of thousands of small
+# objects. Normalization and matching both happen in the worker, which sends
+# back (index in chunk, match) for hits only; the parent builds entries for
+# those in table order, so the result is exactly what iter_process_matches()
+# yields.
+
+_worker_matcher = None
+_match_pool = None
+_match_pool_key = None
+_match_pool_lock = threading.Lock() # Held while the pool is created, used or replaced
+
+
+def _init_match_worker(matcher):
+    global _worker_matcher
+    _worker_matcher = matcher
+
+
+def _match_chunk(names, exes, cmdlines):
+    matcher = _worker_matcher
+    name_priorities = {}
+    hits = []
+    rows = zip(names.split("\0"), exes.split("\0"), cmdlines.lower().split("\0"))
+    for index, (name, exe, cmdline_lower) in enumerate(rows):
+        proc_name = _matched_name(name, exe)
+        if not proc_name:
+            continue
+        if proc_name not in name_priorities:
+            name_priorities[proc_name] = matcher.scan_name(proc_name)
+        match = matcher.match(proc_name, cmdline_lower, name_priorities[proc_name])
+        if match is not None:
+            hits.append((index, match))
+    return hits
+
+
+def _available_cpus():
+    try:
+        return len(os.sched_getaffinity(0)) # Honours CPU pinning (containers, taskset)
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _pool_context():
+    # Collectors run on threads, and fork() from a threaded process can leave a
+    # worker holding another thread's lock; forkserver (POSIX) or spawn start
+    # workers from a clean process instead.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _get_match_pool(matcher, jobs):
+    # The pool outlives one scan (the agent rescans periodically); it is only
+    # rebuilt when the matcher or the worker count changes. Callers hold
+    # _match_pool_lock.
+    global _match_pool, _match_pool_key
+    from concurrent.futures import ProcessPoolExecutor
+    if _match_pool is None or _match_pool_key != (id(matcher), jobs):
+        _shutdown_match_pool()
+        _match_pool = ProcessPoolExecutor(jobs, mp_context=_pool_context(), initializer=_init_match_worker,
+                                          initargs=(matcher,))
+        _match_pool_key = (id(matcher), jobs)
+    return _match_pool
+
+
+def _shutdown_match_pool():
+    global _match_pool, _match_pool_key
+    if _match_pool is not None:
+        _match_pool.shutdown(wait=False, cancel_futures=True)
+    _match_pool = _match_pool_key = None
+
+
+def _map_chunks(pool, buffers, jobs):
+    # pool.map() with the budget checked before every submission. Only a few
+    # chunks per worker are in flight at a time, so once the budget runs out
+    # the queued ones are cancelled and the result covers a prefix of the
+    # table, as in the serial path.
+    pending = deque()
+    results = []
+    chunks = iter(buffers)
+    exhausted = False
+    while True:
+        while not exhausted and len(pending) < 2 * jobs:
+            buffer = next(chunks, None)
+            if buffer is None:
+                break
+            if not checkpoint("indicator_match"):
+                exhausted = True
+                for future in pending:
+                    future.cancel()
+                break
+            pending.append(pool.submit(_match_chunk, *buffer))
+        if not pending:
+            return results
+        future = pending.popleft()
+        if future.cancelled():
+            return results
+        results.append(future.result())
+
+
+def match_processes_parallel(process_snapshot, matcher, jobs=None, chunk_size=PARALLEL_MATCH_CHUNK_SIZE):
+    """
+    Returns the (priority, entry) pairs iter_process_matches() would yield, as a
+    list in the same order, with the matching spread over a process pool. Like
+    the serial path it stops early once the active budget is used up.
+
+    Args:
+        process_snapshot: ProcessSnapshot providing SECURITY_PROCESS_ATTRS.
+        matcher: IndicatorMatcher; it is sent to each worker once.
+        jobs: Worker processes (default: available CPUs).
+        chunk_size: Processes per work item.
+    """
+    records = list(process_snapshot)
+    chunks = [records[i:i + chunk_size] for i in range(0, len(records), chunk_size)]
+    buffers = [("\0".join([p.name or "" for p in chunk]),
+                "\0".join([p.exe or "" for p in chunk]),
+                "\0".join([" ".join(p.cmdline) if p.cmdline else "" for p in chunk])) for chunk in chunks]
+
+    jobs = max(1, min(jobs or _available_cpus(), len(chunks)))
+    with _match_pool_lock: # Another thread could otherwise replace the pool mid-map
+        try:
+            pool = _get_match_pool(matcher, jobs)
+            results = _map_chunks(pool, buffers, jobs)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed): shut the pool down (reaping the
+            # remaining workers) and match here instead
+            _shutdown_match_pool()
+            broken = True
+        else:
+            broken = False
+    if broken:
+        return list(iter_process_matches(process_snapshot, matcher))
+
+    matches = []
+    for chunk, hits in zip(chunks, results):
+        for index, match in hits:
+            raw_name, _, cmdline_str = _normalize(chunk[index])
+            matches.append(_entry(chunk[index], raw_name, cmdline_str, match))
+    return matches
+
+
+def iter_security_related_processes(process_snapshot=None, matcher=None):
+    """
+    Streaming variant of get_security_related_processes().
+
+    Yields the same dictionaries one at a time, in process-table order rather
+    than indicator order.
+    """
+    for _, entry in iter_process_matches(process_snapshot, matcher):
+        yield entry
+
+
+def get_security_related_processes(process_snapshot=None, matcher=None, parallel=None):
     """
     Fetches running processes that might be related to security operations
     based on a list of keywords and known process names.
 
+    Args:
+        process_snapshot: Optional ProcessSnapshot providing SECURITY_PROCESS_ATTRS.
+                          If omitted, the process table is read here.
+        matcher: Optional IndicatorMatcher. Defaults to get_indicator_matcher().
+        parallel: Match on a process pool (True), in this process (False), or
+                  decide by size (None: parallel from PARALLEL_MATCH_MIN_PROCESSES
+                  processes on, given more than one CPU). The result is the
+                  same either way.
+
     Returns:
         list: A list of dictionaries, where each dictionary contains:
               'pid': Process ID
@@ -59,106 +322,31 @@ def get_security_related_processes():
               'cmdline': Process command line (if available)
               'category': The category of security indicator matched
               'matched_keyword': The keyword that caused the match
-    """
-    print("--- Scanning for Security-Related Processes ---")
-    print("NOTE: This is heuristic. Results may include false positives or miss some processes.\n")
+              'match_location': 'process_name' or 'command_line'
 
-    security_processes_found = []
-    all_processes = []
-
-    if PSUTIL_AVAILABLE:
-        try:
-            for proc in psutil.process_iter(['pid', 'name', 'cmdline', 'exe']):
-                try:
-                    pinfo = proc.info
-                    # Sometimes cmdline can be None or empty list, handle it.
-                    cmdline_str = ' '.join(pinfo['cmdline']) if pinfo['cmdline'] else ''
-                    # Normalize name: take basename of exe if available, otherwise use name
-                    proc_name = os.path.basename(pinfo['exe']).lower() if pinfo['exe'] else pinfo['name'].lower()
-                    if not proc_name: # Skip if process name is empty
-                        continue
-                    all_processes.append({
-                        "pid": pinfo['pid'],
-                        "name": proc_name,
-                        "cmdline": cmdline_str,
-                        "raw_name": pinfo['name'].lower(), # Keep original psutil name too
-                        "raw_cmdline": pinfo['cmdline'] or []
-                    })
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                    continue # Process might have terminated, or we don't have access
-                except Exception as e:
-                    # print(f"  Skipping process due to error: {e}") # Optional: for debugging
-                    continue
-        except Exception as e:
-            print(f"  Error iterating processes with psutil: {e}")
-            # No fallback here as process iteration is central to psutil's strength
-            if not all_processes: # if psutil failed early
-                print("  psutil failed to list processes. Aborting this check.")
-                return []
-    else:
-        print("  psutil module not found. This check is severely limited without it.")
-        print("  Please install psutil: pip install psutil")
-        return [] # Cannot reliably get process info cross-platform without psutil
-
-    if not all_processes:
-        print("  No processes were retrieved. Cannot perform security check.")
-        return []
-
-    # --- Perform matching ---
-    matched_pids = set() # To avoid duplicate entries if multiple keywords match one process
-
-    for category, keywords in SECURITY_PROCESS_INDICATORS.items():
-        for keyword in keywords:
-            kw_lower = keyword.lower()
-            for proc_info in all_processes:
-                if proc_info['pid'] in matched_pids:
-                    continue # Already matched this process
-
-                # Check against normalized process name
-                if kw_lower in proc_info['name']:
-                    security_processes_found.append({
-                        "pid": proc_info['pid'],
-                        "name": proc_info['raw_name'], # Report original name for clarity
-                        "cmdline": proc_info['cmdline'],
-                        "category": category,
-                        "matched_keyword": keyword,
-                        "match_location": "process_name"
-                    })
-                    matched_pids.add(proc_info['pid'])
-                    continue # Move to next process after a match in name
-
-                # Check against command line arguments (more prone to false positives with generic terms)
-                # Be more careful with generic keywords in cmdline
-                is_generic_category = "Generic Security Terms" in category
-                if not is_generic_category or len(kw_lower) > 4 : # Apply generic keywords if they are reasonably specific
-                    if kw_lower in proc_info['cmdline'].lower():
-                        security_processes_found.append({
-                            "pid": proc_info['pid'],
-                            "name": proc_info['raw_name'],
-                            "cmdline": proc_info['cmdline'],
-                            "category": category,
-                            "matched_keyword": keyword,
-                            "match_location": "command_line"
-                        })
-                        matched_pids.add(proc_info['pid'])
-
-
-    if security_processes_found:
-        print(f"Found {len(security_processes_found)} potential security-related process(es):")
-        # Sort by PID for consistent output
-        for item in sorted(security_processes_found, key=lambda x: x['pid']):
-            print(f"  - PID: {item['pid']}, Name: {item['name']}, Category: {item['category']}")
-            print(f"    Matched Keyword: '{item['matched_keyword']}' (in {item['match_location']})")
-            if item['cmdline']:
-                print(f"    Cmdline: {item['cmdline'][:150]}{'...' if len(item['cmdline']) > 150 else ''}")
-            else:
-                print(f"    Cmdline: N/A")
+        Nothing is printed; use report.render_security_processes() for a
+        human-readable version. Without a process_snapshot the list is empty
+        if psutil is not available.
+    """
+    # Keep the order the old category x keyword x process loop produced: by
+    # indicator priority first, then by position in the process table.
+    if matcher is None:
+        matcher = get_indicator_matcher()
+    if process_snapshot is None and PSUTIL_AVAILABLE:
+        process_snapshot = take_process_snapshot(SECURITY_PROCESS_ATTRS)
+    if parallel is None:
+        parallel = (process_snapshot is not None and len(process_snapshot) >= PARALLEL_MATCH_MIN_PROCESSES
+                    and _available_cpus() > 1)
+    # Stable sort: equal priorities stay in process-table order. The serial
+    # matches come from a generator, so the sort is what actually runs it and
+    # has to happen inside the step.
+    if parallel and process_snapshot is not None:
+        with step("indicator_match_parallel"):
+            matches = sorted(match_processes_parallel(process_snapshot, matcher), key=lambda m: m[0])
     else:
-        print("  No processes matched the known security-related indicators.")
-        print("  This does NOT guarantee no security processes are running.")
-
-    print("-" * 30 + "\n")
-    return security_processes_found
+        with step("indicator_match"):
+            matches = sorted(iter_process_matches(process_snapshot, matcher), key=lambda m: m[0])
+    return [entry for _, entry in matches]
 
 # Example of how to use it:
 if __name__ == "__main__":
@@ -171,6 +359,7 @@ if __name__ == "__main__":
         print("=================================================\n")
 
         found_procs = get_security_related_processes()
+        print(render_security_processes(found_procs))
 
         if found_procs:
             print(f"\nSummary: Identified {len(found_procs)} potential security-related process(es).")
@@ -0,0 +1,291 @@
+# snapshot_store.py
+# Local history of diagnostics runs. Consecutive runs on one host are nearly
+# identical, so every section (and every top-level key inside a dict section)
+# is stored once under the hash of its content, and a run only references the
+# hash of its tree. Runs that share a tree are stored as one segment with their
+# timestamps delta-encoded, so a month of unchanged 5-minute runs costs a few
+# kilobytes on top of the first snapshot.
+import array
+import bisect
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from interface_table import COUNTERS as INTERFACE_COUNTERS
+from local_cache import get_cache_dir
+
+SNAPSHOT_STORE_VERSION = 1
+
+# Keys whose values differ on every run without saying anything about the host
+# (probe round-trip times, the interface table's traffic counter columns and
+# their per-kind totals). They are dropped before hashing so they don't turn
+# every run into a new snapshot.
+VOLATILE_KEYS = frozenset(("rtt_ms",) + INTERFACE_COUNTERS)
+
+# Dicts are split into separately stored children down to this depth: the run
+# (depth 0) into sections, sections (depth 1) into their top-level keys. Deeper
+# values are stored whole.
+SPLIT_DEPTH = 2
+
+# Long lists (e.g. installed applications) are cut into chunks at content-defined
+# boundaries: an item ends a chunk when its hash is 0 modulo LIST_CHUNK_MODULUS.
+# Installing one package then only rewrites the ~LIST_CHUNK_MODULUS items around
+# it instead of the whole list.
+LIST_CHUNK_MIN_ITEMS = 64
+LIST_CHUNK_MODULUS = 64
+
+# Decoded objects kept in memory for repeated reads of the same history.
+MAX_CACHED_OBJECTS = 4096
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS objects (hash TEXT PRIMARY KEY, kind TEXT NOT NULL, data BLOB NOT NULL) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS segments (
+    segment_id INTEGER PRIMARY KEY,
+    tree TEXT NOT NULL,
+    first_run INTEGER NOT NULL,
+    run_count INTEGER NOT NULL,
+    first_time INTEGER NOT NULL,
+    time_deltas BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segments_first_run ON segments (first_run);
+CREATE INDEX IF NOT EXISTS segments_first_time ON segments (first_time);
+"""
+
+
+def _canonical(value):
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _strip_volatile(value):
+    if isinstance(value, dict):
+        return {k: _strip_volatile(v) for k, v in value.items() if k not in VOLATILE_KEYS}
+    if isinstance(value, list):
+        return [_strip_volatile(v) for v in value]
+    return value
+
+
+def _pack_deltas(deltas):
+    return zlib.compress(array.array("I", deltas).tobytes(), 9)
+
+
+def _unpack_deltas(blob):
+    deltas = array.array("I")
+    deltas.frombytes(zlib.decompress(blob))
+    return deltas
+
+
+class SnapshotStore:
+    """
+    Content-addressed store of run_system_diagnostics() documents in one
+    SQLite file.
+
+    Sections starting with "_" (timings, metrics, import times) describe the
+    run rather than the host and are left out unless include_metadata is set.
+    Timestamps are kept to the second.
+    """
+
+    def __init__(self, path=None, include_metadata=False):
+        self.path = path or os.path.join(get_cache_dir(), "snapshots.sqlite")
+        self.include_metadata = include_metadata
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.executescript(_SCHEMA)
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(SNAPSHOT_STORE_VERSION),))
+        self._lock = threading.Lock()
+        self._hashes = {row[0] for row in self.conn.execute("SELECT hash FROM objects")}
+        self._objects = {} # hash -> decoded value, for repeated reads of the same history
+
+    # Objects
+
+    def _put_object(self, kind, data):
+        # 128-bit BLAKE2b: plenty for one host's history and half the size of
+        # SHA-256 in every dict/list object that references it
+        digest = hashlib.blake2b(kind.encode("ascii") + b"\0" + data, digest_size=16).hexdigest()
+        if digest not in self._hashes:
+            # Only new content pays for compression and the write
+            self.conn.execute("INSERT OR IGNORE INTO objects VALUES (?, ?, ?)", (digest, kind, zlib.compress(data, 9)))
+            self._hashes.add(digest)
+        return digest
+
+    def _put_value(self, value, depth):
+        if isinstance(value, dict) and depth < SPLIT_DEPTH:
+            payload = {key: self._put_value(child, depth + 1) for key, child in value.items()}
+            return self._put_object("dict", _canonical(payload))
+        if isinstance(value, list) and depth <= SPLIT_DEPTH and len(value) >= LIST_CHUNK_MIN_ITEMS:
+            chunks, chunk = [], []
+            for item in value:
+                data = _canonical(item)
+                chunk.append(data)
+                if zlib.crc32(data) % LIST_CHUNK_MODULUS == 0:
+                    chunks.append(chunk)
+                    chunk = []
+            if chunk:
+                chunks.append(chunk)
+            payload = [self._put_object("value", b"[" + b",".join(c) + b"]") for c in chunks]
+            return self._put_object("list", _canonical(payload))
+        return self._put_object("value", _canonical(value))
+
+    def _load_object(self, digest):
+        row = self.conn.execute("SELECT kind, data FROM objects WHERE hash = ?", (digest,)).fetchone()
+        if row is None:
+            raise KeyError(f"missing snapshot object {digest}")
+        return row[0], json.loads(zlib.decompress(row[1]))
+
+    def _get_value(self, digest):
+        value = self._objects.get(digest)
+        if value is None:
+            kind, payload = self._load_object(digest)
+            if kind == "dict":
+                value = {key: self._get_value(child) for key, child in payload.items()}
+            elif kind == "list":
+                value = [item for chunk in payload for item in self._get_value(chunk)]
+            else:
+                value = payload
+            self._objects[digest] = value
+        return value
+
+    # Runs
+
+    def put(self, document, taken_at=None):
+        """
+        Stores one run and returns its run id. Only sections that changed since
+        any earlier run add new objects.
+        """
+        taken_at = int(time.time() if taken_at is None else taken_at)
+        document = {k: v for k, v in document.items() if self.include_metadata or not k.startswith("_")}
+        with self._lock, self.conn:
+            try:
+                tree = self._put_value(_strip_volatile(document), 0)
+            except BaseException:
+                # The transaction rolls back; forget hashes that never made it to disk
+                self._hashes = {row[0] for row in self.conn.execute("SELECT hash FROM objects")}
+                raise
+            last = self.conn.execute(
+                "SELECT segment_id, tree, first_run, run_count, first_time, time_deltas "
+                "FROM segments ORDER BY first_run DESC LIMIT 1").fetchone()
+            if last is not None:
+                segment_id, last_tree, first_run, run_count, first_time, blob = last
+                deltas = _unpack_deltas(blob)
+                last_time = first_time + sum(deltas)
+                if last_tree == tree and taken_at >= last_time:
+                    deltas.append(taken_at - last_time)
+                    self.conn.execute("UPDATE segments SET run_count = ?, time_deltas = ? WHERE segment_id = ?",
+                                      (run_count + 1, _pack_deltas(deltas), segment_id))
+                    return first_run + run_count
+                next_run = first_run + run_count
+            else:
+                next_run = 1
+            self.conn.execute("INSERT INTO segments (tree, first_run, run_count, first_time, time_deltas) "
+                              "VALUES (?, ?, 1, ?, ?)", (tree, next_run, taken_at, _pack_deltas([])))
+            return next_run
+
+    def _segment_of_run(self, run_id):
+        row = self.conn.execute(
+            "SELECT tree, first_run, run_count, first_time, time_deltas FROM segments "
+            "WHERE first_run <= ? ORDER BY first_run DESC LIMIT 1", (run_id,)).fetchone()
+        if row is None or run_id >= row[1] + row[2]:
+            raise KeyError(f"no snapshot run {run_id}")
+        return row
+
+    def get(self, run_id):
+        """Returns the stored document of run_id. Raises KeyError if unknown."""
+        with self._lock:
+            if len(self._objects) > MAX_CACHED_OBJECTS:
+                self._objects.clear()
+            # Decoded objects are cached and shared between runs; hand out a copy
+            return copy.deepcopy(self._get_value(self._segment_of_run(run_id)[0]))
+
+    def run_at(self, timestamp):
+        """Returns the id of the last run taken at or before timestamp, or None."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT first_run, first_time, time_deltas FROM segments WHERE first_time <= ? "
+                "ORDER BY first_time DESC, first_run DESC LIMIT 1", (int(timestamp),)).fetchone()
+        if row is None:
+            return None
+        first_run, first_time, blob = row
+        times, t = [first_time], first_time
+        for delta in _unpack_deltas(blob):
+            t += delta
+            times.append(t)
+        return first_run + bisect.bisect_right(times, int(timestamp)) - 1
+
+    def runs(self, since=None, until=None):
+        """Returns [(run_id, taken_at)] in order, optionally limited to a time range."""
+        result = []
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT first_run, first_time, time_deltas FROM segments ORDER BY first_run").fetchall()
+        for first_run, first_time, blob in rows:
+            t = first_time
+            for index, delta in enumerate([0] + list(_unpack_deltas(blob))):
+                t += delta
+                if (since is None or t >= since) and (until is None or t <= until):
+                    result.append((first_run + index, t))
+        return result
+
+    def diff(self, old_run, new_run):
+        """
+        Compares two runs without decoding the sections they share.
+
+        Returns:
+            dict: 'added' and 'removed' (section -> value), 'changed' (section
+                  -> details) and 'unchanged' (list of section names). For dict
+                  sections the details map each changed key to {'from', 'to'}; for
+                  list sections they hold 'added' and 'removed' items; anything
+                  else is a single {'from', 'to'}.
+        """
+        with self._lock:
+            old_tree = self._load_object(self._segment_of_run(old_run)[0])[1]
+            new_tree = self._load_object(self._segment_of_run(new_run)[0])[1]
+            result = {"added": {}, "removed": {}, "changed": {}, "unchanged": []}
+            for name in sorted(old_tree.keys() | new_tree.keys()):
+                old_hash, new_hash = old_tree.get(name), new_tree.get(name)
+                if old_hash == new_hash:
+                    result["unchanged"].append(name)
+                elif old_hash is None:
+                    result["added"][name] = self._get_value(new_hash)
+                elif new_hash is None:
+                    result["removed"][name] = self._get_value(old_hash)
+                else:
+                    result["changed"][name] = self._diff_objects(old_hash, new_hash)
+        return result
+
+    def _diff_objects(self, old_hash, new_hash):
+        old_kind, old_payload = self._load_object(old_hash)
+        new_kind, new_payload = self._load_object(new_hash)
+        if old_kind == new_kind == "dict":
+            changes = {}
+            for key in sorted(old_payload.keys() | new_payload.keys()):
+                if old_payload.get(key) != new_payload.get(key):
+                    changes[key] = {
+                        "from": self._get_value(old_payload[key]) if key in old_payload else None,
+                        "to": self._get_value(new_payload[key]) if key in new_payload else None,
+                    }
+            return changes
+        old_value, new_value = self._get_value(old_hash), self._get_value(new_hash)
+        if isinstance(old_value, list) and isinstance(new_value, list):
+            old_items = {_canonical(v): v for v in old_value}
+            new_items = {_canonical(v): v for v in new_value}
+            return {"added": [v for k, v in new_items.items() if k not in old_items],
+                    "removed": [v for k, v in old_items.items() if k not in new_items]}
+        return {"from": old_value, "to": new_value}
+
+    def stats(self):
+        """Returns run, segment and object counts and the stored (compressed) bytes."""
+        with self._lock:
+            objects, object_bytes = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM objects").fetchone()
+            segments, runs, segment_bytes = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(run_count), 0), COALESCE(SUM(LENGTH(time_deltas) + LENGTH(tree)), 0) "
+                "FROM segments").fetchone()
+        return {"runs": runs, "segments": segments, "objects": objects,
+                "stored_bytes": object_bytes + segment_bytes, "file_bytes": os.path.getsize(self.path)}
+
+    def close(self):
+        self.conn.close()
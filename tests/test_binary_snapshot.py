@@ -0,0 +1,74 @@
+"""
+binary_snapshot round trips and damaged snapshots.
+
+Usage:
+    python -m pytest tests
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from binary_snapshot import BULK_DECODE_MIN_STRINGS, BinarySnapshot, SnapshotFormatError, dumps, loads
+
+DOCUMENT = {
+    "os_info": {"system": "Linux", "release": "6.1.0", "boot": 1700000000123, "load": 0.25, "vm": None},
+    "installed_applications": [f"package-{i} (1.{i})" for i in range(BULK_DECODE_MIN_STRINGS + 4)],
+    "security_processes": [{"pid": 1, "name": "sshd", "cmdline": "/usr/sbin/sshd -D", "flags": [True, False]}],
+    "big": 2 ** 70,
+}
+
+
+def read_everything(data):
+    with BinarySnapshot(data) as snapshot:
+        document = snapshot.to_dict()
+        for name in snapshot.sections():
+            list(snapshot.iter_items(name))
+    return document
+
+
+class RoundTripTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        self.assertEqual(loads(dumps(DOCUMENT)), DOCUMENT)
+
+    def test_iter_items(self):
+        with BinarySnapshot(dumps(DOCUMENT)) as snapshot:
+            self.assertEqual(list(snapshot.iter_items("installed_applications")), DOCUMENT["installed_applications"])
+            self.assertEqual(dict(snapshot.iter_items("os_info")), DOCUMENT["os_info"])
+
+
+class DamagedSnapshotTest(unittest.TestCase):
+    """Damaged data either still decodes or raises SnapshotFormatError, never anything else."""
+
+    def setUp(self):
+        self.data = dumps(DOCUMENT)
+
+    def test_truncated(self):
+        for size in range(len(self.data)):
+            with self.subTest(size=size), self.assertRaises(SnapshotFormatError):
+                read_everything(self.data[:size])
+
+    def test_bit_flips(self):
+        for offset in range(len(self.data)):
+            for bit in (0x01, 0x80):
+                damaged = bytearray(self.data)
+                damaged[offset] ^= bit
+                with self.subTest(offset=offset, bit=bit):
+                    try:
+                        read_everything(bytes(damaged))
+                    except SnapshotFormatError:
+                        pass
+
+    def test_string_id_out_of_range(self):
+        data = bytearray(dumps({"name": "value"}))
+        position = data.index(bytes([7, 0, 0, 0, 0])) # T_STRING, id 0 ("value"; interned before the section name)
+        data[position + 1] = 0xff
+        with BinarySnapshot(bytes(data)) as snapshot, self.assertRaisesRegex(SnapshotFormatError, "out of range"):
+            snapshot.section("name")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+collector_engine.run_collectors() deadlines.
+
+Usage:
+    python -m pytest tests
+    python -m unittest discover tests
+"""
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from collector_engine import Collector, run_collectors
+
+# A collector that sleeps well past its deadline, run in a fresh interpreter so
+# the test sees how long the process takes to exit, not just to return.
+STUCK_COLLECTOR = """
+import time
+from collector_engine import Collector, run_collectors
+runs = run_collectors([Collector("stuck", lambda: time.sleep(5), timeout=0.5)])
+assert runs["stuck"]["status"] == "timeout", runs
+"""
+
+
+class RunCollectorsTest(unittest.TestCase):
+
+    def test_results(self):
+        def fail():
+            raise RuntimeError("boom")
+        runs = run_collectors([Collector("ok", lambda: 42), Collector("fail", fail)])
+        self.assertEqual(runs["ok"]["status"], "ok")
+        self.assertEqual(runs["ok"]["result"], 42)
+        self.assertEqual(runs["fail"]["status"], "error")
+        self.assertEqual(runs["fail"]["error"], "boom")
+
+    def test_timed_out_collector_does_not_delay_exit(self):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", STUCK_COLLECTOR], cwd=ROOT, check=True, timeout=30)
+        self.assertLess(time.perf_counter() - started, 3.0)
+
+    def test_single_worker_skips_collectors_behind_a_timeout(self):
+        runs = run_collectors([Collector("stuck", lambda: time.sleep(1), timeout=0.2),
+                               Collector("queued", lambda: 1, timeout=0.3)], max_workers=1)
+        self.assertEqual(runs["stuck"]["status"], "timeout")
+        self.assertEqual(runs["queued"]["status"], "timeout")
+
+
+if __name__ == "__main__":
+    unittest.main()
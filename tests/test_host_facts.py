@@ -0,0 +1,69 @@
+"""
+host_facts.HostFactsCache trust checks on the cache file.
+
+Usage:
+    python -m pytest tests
+    python -m unittest discover tests
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from host_facts import HOST_FACTS_VERSION, HostFactsCache
+
+
+class CacheFileTrustTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="host-facts-test-")
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.boot_id_path = os.path.join(self.dir, "boot_id")
+        with open(self.boot_id_path, "w") as f:
+            f.write("boot-1\n")
+        self.cache_path = os.path.join(self.dir, "host_facts.json")
+
+    def write_cache(self, value, mode=0o600):
+        data = {"version": HOST_FACTS_VERSION,
+                "facts": {"kernel": {"key": ["boot-1", []], "value": value}}}
+        with open(self.cache_path, "w") as f:
+            json.dump(data, f)
+        os.chmod(self.cache_path, mode)
+
+    def get_kernel(self):
+        return HostFactsCache(self.cache_path, self.boot_id_path).get("kernel", lambda: "fresh")
+
+    def test_private_file_is_used(self):
+        self.write_cache("cached")
+        self.assertEqual(self.get_kernel(), "cached")
+
+    @unittest.skipUnless(hasattr(os, "getuid"), "POSIX permissions")
+    def test_writable_by_others_is_ignored(self):
+        self.write_cache("planted", mode=0o666)
+        self.assertEqual(self.get_kernel(), "fresh")
+
+    @unittest.skipUnless(hasattr(os, "getuid"), "POSIX permissions")
+    def test_writable_by_group_is_ignored(self):
+        self.write_cache("planted", mode=0o620)
+        self.assertEqual(self.get_kernel(), "fresh")
+
+    @unittest.skipUnless(hasattr(os, "mkfifo"), "FIFOs")
+    def test_non_regular_file_is_ignored(self):
+        os.mkfifo(self.cache_path, 0o600)
+        self.assertEqual(self.get_kernel(), "fresh")
+
+    @unittest.skipUnless(hasattr(os, "symlink"), "symlinks")
+    def test_symlink_is_ignored(self):
+        target = os.path.join(self.dir, "elsewhere.json")
+        self.write_cache("planted")
+        os.rename(self.cache_path, target)
+        os.symlink(target, self.cache_path)
+        self.assertEqual(self.get_kernel(), "fresh")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+inventory_cache.InventoryCache invalidation by package database changes.
+
+Usage:
+    python -m pytest tests
+    python -m unittest discover tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import budget
+import inventory_cache
+from inventory_cache import LINUX_PACKAGE_DB_PATHS, InventoryCache, stat_signature
+from package_db import PackageRecord
+
+
+class RpmBerkeleyDbTest(unittest.TestCase):
+    """A RHEL/CentOS 7-8 host: /var/lib/rpm/Packages is the only package database."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="inventory-cache-test-")
+        self.addCleanup(shutil.rmtree, self.root)
+        self.paths = [self.root + p for p in LINUX_PACKAGE_DB_PATHS]
+        self.packages = self.root + "/var/lib/rpm/Packages"
+        os.makedirs(os.path.dirname(self.packages))
+        self.write_packages(b"\0" * 4096)
+        self.cache = InventoryCache("test", os.path.join(self.root, "cache.json"))
+        self.collected = 0
+
+    def write_packages(self, data):
+        with open(self.packages, "wb") as f:
+            f.write(data)
+
+    def collect(self):
+        self.collected += 1
+        return [PackageRecord("bash", f"4.4.{self.collected}", "x86_64", "rpm")]
+
+    def test_unchanged_database_reuses_cache(self):
+        self.cache.get(stat_signature(self.paths), self.collect)
+        records, diff, partial = self.cache.get(stat_signature(self.paths), self.collect)
+        self.assertEqual(self.collected, 1)
+        self.assertIsNone(diff)
+        self.assertFalse(partial)
+        self.assertEqual(records[0].version, "4.4.1")
+
+    def test_packages_change_invalidates_cache(self):
+        self.cache.get(stat_signature(self.paths), self.collect)
+        self.write_packages(b"\1" * 8192) # rpm -i rewrote the database
+        records, diff, partial = self.cache.get(stat_signature(self.paths), self.collect)
+        self.assertEqual(self.collected, 2)
+        self.assertEqual(diff["upgraded"], [(PackageRecord("bash", "4.4.1", "x86_64", "rpm"), records[0])])
+
+    @unittest.skipUnless(hasattr(os, "getuid"), "POSIX permissions")
+    def test_cache_writable_by_others_is_ignored(self):
+        self.cache.get(stat_signature(self.paths), self.collect)
+        os.chmod(self.cache.cache_path, 0o666)
+        inventory_cache._memory_cache.clear() # A fresh process
+        self.cache.get(stat_signature(self.paths), self.collect)
+        self.assertEqual(self.collected, 2)
+
+    def test_truncated_collection_is_not_cached(self):
+        self.cache.get(stat_signature(self.paths), self.collect)
+        self.write_packages(b"\1" * 8192)
+        with budget.activate(budget.RunBudget(wall_seconds=0)):
+            records, diff, partial = self.cache.get(stat_signature(self.paths), self.collect)
+        self.assertTrue(partial)
+        self.assertIsNone(diff)
+        self.assertEqual(records[0].version, "4.4.2")
+        # The next unbudgeted run still diffs against the last complete list
+        records, diff, partial = self.cache.get(stat_signature(self.paths), self.collect)
+        self.assertFalse(partial)
+        self.assertEqual(diff["upgraded"][0][0].version, "4.4.1")
+
+
+if __name__ == "__main__":
+    unittest.main()
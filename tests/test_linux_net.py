@@ -0,0 +1,64 @@
+"""
+linux_net.read_ipv4_routes() against a /proc/net/route written to a temporary
+proc root.
+
+Usage:
+    python -m pytest tests
+    python -m unittest discover tests
+"""
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from linux_net import RTF_GATEWAY, RTF_UP, read_ipv4_routes
+
+HEADER = "Iface\tDestination\tGateway \tFlags\tRefCnt\tUse\tMetric\tMask\t\tMTU\tWindow\tIRTT\n"
+
+# Captured on x86_64: the kernel prints each address as a native-endian u32.
+LITTLE_ENDIAN_ROUTES = (
+    "eth0\t00000000\t0101A8C0\t0003\t0\t0\t100\t00000000\t0\t0\t0\n"
+    "eth0\t0001A8C0\t00000000\t0001\t0\t0\t100\t00FFFFFF\t0\t0\t0\n"
+)
+
+
+def native_hex(address):
+    # How the kernel of the host running the test would print address
+    return f"{int.from_bytes(socket.inet_aton(address), sys.byteorder):08X}"
+
+
+class Ipv4RoutesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.proc_root = tempfile.mkdtemp(prefix="linux-net-test-")
+        self.addCleanup(shutil.rmtree, self.proc_root)
+        os.makedirs(os.path.join(self.proc_root, "net"))
+
+    def read(self, routes):
+        with open(os.path.join(self.proc_root, "net", "route"), "w") as f:
+            f.write(HEADER + routes)
+        return read_ipv4_routes(self.proc_root)
+
+    def test_native_byte_order(self):
+        line = "\t".join(["wlan0", native_hex("10.20.0.0"), native_hex("10.20.0.1"), "0003", "0", "0", "600",
+                          native_hex("255.255.0.0"), "1500", "0", "0"])
+        route, = self.read(line + "\n")
+        self.assertEqual(route, {"interface": "wlan0", "destination": "10.20.0.0", "gateway": "10.20.0.1",
+                                 "netmask": "255.255.0.0", "prefix_length": 16, "metric": 600, "mtu": 1500,
+                                 "flags": RTF_UP | RTF_GATEWAY})
+
+    @unittest.skipUnless(sys.byteorder == "little", "capture from a little-endian host")
+    def test_little_endian_capture(self):
+        default, local = self.read(LITTLE_ENDIAN_ROUTES)
+        self.assertEqual((default["destination"], default["gateway"], default["prefix_length"]),
+                         ("0.0.0.0", "192.168.1.1", 0))
+        self.assertEqual((local["destination"], local["netmask"], local["prefix_length"]),
+                         ("192.168.1.0", "255.255.255.0", 24))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+"""
+net_probe.run_network_probes() deadlines.
+
+Usage:
+    python -m pytest tests
+    python -m unittest discover tests
+"""
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from net_probe import _connect as connect, run_network_probes
+
+
+class SlowResolverTest(unittest.TestCase):
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def slow_getaddrinfo(self, *args, **kwargs):
+        self.release.wait(5)
+        raise socket.gaierror("resolver released")
+
+    def test_slow_resolution_counts_against_timeout(self):
+        started = time.perf_counter()
+        with mock.patch("socket.getaddrinfo", self.slow_getaddrinfo):
+            probes = run_network_probes([("slow.example", 443)], timeout=0.5, fqdn_timeout=0)
+        self.assertLess(time.perf_counter() - started, 2.0)
+        self.assertEqual(probes["targets"], [{"host": "slow.example", "port": 443, "status": "failed",
+                                              "error": "timed out after 0.5s"}])
+
+    def test_connects_to_resolved_address(self):
+        server = socket.socket()
+        self.addCleanup(server.close)
+        server.bind(("127.0.0.1", 0))
+        server.listen(1)
+        port = server.getsockname()[1]
+        probes = run_network_probes([("127.0.0.1", port)], timeout=2, fqdn_timeout=0)
+        self.assertEqual(probes["targets"][0]["status"], "connected")
+
+
+class StalledCloseTest(unittest.TestCase):
+
+    def test_close_stays_within_timeout(self):
+        server = socket.socket()
+        self.addCleanup(server.close)
+        server.bind(("127.0.0.1", 0))
+        server.listen(1)
+
+        async def slow_connect(host, port):
+            await asyncio.sleep(0.4) # Most of the timeout goes on connecting
+            return await connect(host, port)
+
+        async def stalled_wait_closed(writer):
+            await asyncio.sleep(5) # A peer that never completes the close
+
+        started = time.perf_counter()
+        with mock.patch("net_probe._connect", slow_connect), \
+                mock.patch("asyncio.StreamWriter.wait_closed", stalled_wait_closed):
+            probes = run_network_probes([("127.0.0.1", server.getsockname()[1])], timeout=0.5, fqdn_timeout=0)
+        self.assertLess(time.perf_counter() - started, 0.75)
+        self.assertEqual(probes["targets"][0]["status"], "connected")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,209 @@
+"""
+windows_net.parse_ipconfig_all() against saved `ipconfig /all` captures.
+
+The captures in fixtures/ipconfig/ are English, German and French output and
+a file holding two runs back to back. They are read as text here; on Windows
+net_env decodes the command's output with the OEM code page first.
+
+Usage:
+    python -m pytest tests
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from windows_net import dns_servers_from_ipconfig, parse_ipconfig_all
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "ipconfig")
+
+
+def parse_fixture(name, crlf=False):
+    with open(os.path.join(FIXTURES, name), "r", encoding="utf-8") as f:
+        text = f.read()
+    if crlf:
+        text = text.replace("\n", "\r\n") # What the real command writes
+    return parse_ipconfig_all(text.splitlines(keepends=True))
+
+
+class EnglishCaptureTest(unittest.TestCase):
+
+    def setUp(self):
+        self.parsed = parse_fixture("en.txt")
+        self.adapters = self.parsed["adapters"]
+
+    def test_host(self):
+        self.assertEqual(self.parsed["host"], {"host_name": "WS-0142",
+                                               "dns_suffix_search_list": ["corp.example.com", "example.com"]})
+
+    def test_adapters_in_output_order(self):
+        self.assertEqual(list(self.adapters), ["Ethernet", "Wi-Fi", "vEthernet (Default Switch)",
+                                               "Teredo Tunneling Pseudo-Interface"])
+        self.assertEqual([adapter["type"] for adapter in self.adapters.values()],
+                         ["Ethernet", "Wireless LAN", "Ethernet", "Tunnel"])
+
+    def test_connected_adapter(self):
+        self.assertEqual(self.adapters["Ethernet"], {
+            "type": "Ethernet",
+            "description": "Intel(R) Ethernet Connection (7) I219-LM",
+            "physical_address": "3C-52-82-1A-2B-3C",
+            "dns_suffix": "corp.example.com",
+            "dhcp_enabled": True,
+            "dhcp_server": "10.20.0.5",
+            "ipv4_addresses": ["10.20.30.41"],
+            "default_gateways": ["fe80::1%12", "10.20.30.1"],
+            "dns_servers": ["2001:db8:10::53", "10.20.0.53", "10.20.0.54"],
+        })
+
+    def test_disconnected_adapter(self):
+        wifi = self.adapters["Wi-Fi"]
+        self.assertEqual(wifi["media_state"], "Media disconnected")
+        self.assertEqual(wifi["dns_suffix"], "")
+        self.assertEqual((wifi["ipv4_addresses"], wifi["default_gateways"], wifi["dns_servers"]), ([], [], []))
+        self.assertIsNone(wifi["dhcp_server"])
+
+    def test_empty_field_ends_continuation(self):
+        # "Default Gateway . . . :" with no value, then unrelated fields
+        switch = self.adapters["vEthernet (Default Switch)"]
+        self.assertEqual(switch["default_gateways"], [])
+        self.assertEqual(switch["ipv4_addresses"], ["172.29.112.1"])
+        self.assertIs(switch["dhcp_enabled"], False)
+
+    def test_ipv6_dns_servers_keep_their_zone(self):
+        self.assertEqual(self.adapters["vEthernet (Default Switch)"]["dns_servers"],
+                         ["fec0:0:0:ffff::1%1", "fec0:0:0:ffff::2%1", "fec0:0:0:ffff::3%1"])
+
+    def test_unmapped_fields_are_ignored(self):
+        # IPv6 addresses, lease times, DUIDs, ... have no result key
+        for adapter in self.adapters.values():
+            self.assertLessEqual(set(adapter), {"type", "description", "physical_address", "media_state",
+                                                "dns_suffix", "dhcp_enabled", "dhcp_server", "ipv4_addresses",
+                                                "default_gateways", "dns_servers"})
+
+    def test_crlf_line_endings(self):
+        self.assertEqual(parse_fixture("en.txt", crlf=True), self.parsed)
+
+    def test_dns_servers_from_ipconfig(self):
+        self.assertEqual(dns_servers_from_ipconfig(self.parsed),
+                         ["10.20.0.53", "10.20.0.54", "2001:db8:10::53",
+                          "fec0:0:0:ffff::1%1", "fec0:0:0:ffff::2%1", "fec0:0:0:ffff::3%1"])
+
+
+class GermanCaptureTest(unittest.TestCase):
+
+    def setUp(self):
+        self.parsed = parse_fixture("de.txt", crlf=True)
+        self.adapters = self.parsed["adapters"]
+
+    def test_host(self):
+        self.assertEqual(self.parsed["host"], {"host_name": "DC01", "dns_suffix_search_list": ["ad.example.de"]})
+
+    def test_adapter_types(self):
+        # "Ethernet-Adapter", "Drahtlos-LAN-Adapter", and "Tunneladapter" without a separator
+        self.assertEqual({name: adapter["type"] for name, adapter in self.adapters.items()},
+                         {"Ethernet0": "Ethernet", "WLAN": "Drahtlos-LAN",
+                          "isatap.{8F3A2B1C-4D5E-6F70-8192-A3B4C5D6E7F8}": "Tunnel"})
+
+    def test_connected_adapter(self):
+        self.assertEqual(self.adapters["Ethernet0"], {
+            "type": "Ethernet",
+            "description": "vmxnet3 Ethernet Adapter",
+            "physical_address": "00-50-56-A1-B2-C3",
+            "dns_suffix": "",
+            "dhcp_enabled": False,
+            "dhcp_server": None,
+            "ipv4_addresses": ["192.168.10.5", "192.168.10.6"], # One "IPv4-Adresse" line each
+            "default_gateways": ["192.168.10.1"],
+            "dns_servers": ["::1", "127.0.0.1", "192.168.10.10"],
+        })
+
+    def test_label_without_dot_leaders(self):
+        # "Verbindungsspezifisches DNS-Suffix: fritz.box" fills the whole label column
+        self.assertEqual(self.adapters["WLAN"]["dns_suffix"], "fritz.box")
+        self.assertEqual(self.adapters["WLAN"]["media_state"], "Medium getrennt")
+        self.assertIs(self.adapters["WLAN"]["dhcp_enabled"], True)
+
+    def test_dns_servers_from_ipconfig_skips_ipv6_loopback(self):
+        self.assertEqual(dns_servers_from_ipconfig(self.parsed), ["127.0.0.1", "192.168.10.10"])
+
+
+class FrenchCaptureTest(unittest.TestCase):
+
+    def setUp(self):
+        self.parsed = parse_fixture("fr.txt")
+        self.adapters = self.parsed["adapters"]
+
+    def test_host(self):
+        self.assertEqual(self.parsed["host"], {"host_name": "PC-COMPTA",
+                                               "dns_suffix_search_list": ["home", "example.fr"]})
+
+    def test_adapter_names_and_types(self):
+        # "Carte <type> <name> :", where the type may be several words
+        self.assertEqual({name: adapter["type"] for name, adapter in self.adapters.items()},
+                         {"Ethernet": "Ethernet", "Wi-Fi": "réseau sans fil",
+                          "Teredo Tunneling Pseudo-Interface": "Tunnel"})
+
+    def test_connected_adapter(self):
+        self.assertEqual(self.adapters["Ethernet"], {
+            "type": "Ethernet",
+            "description": "Realtek PCIe GbE Family Controller",
+            "physical_address": "30-9C-23-44-55-66",
+            "dns_suffix": "home",
+            "dhcp_enabled": True,
+            "dhcp_server": "192.168.1.254",
+            "ipv4_addresses": ["192.168.1.20"], # "(préféré)" removed
+            "default_gateways": ["fe80::224:d4ff:fe12:3456%7", "192.168.1.254"],
+            "dns_servers": ["2a01:e0a:1f2:3b40:224:d4ff:fe12:3456", "192.168.1.254"],
+        })
+
+    def test_disconnected_adapter(self):
+        wifi = self.adapters["Wi-Fi"]
+        self.assertEqual(wifi["media_state"], "Média déconnecté")
+        self.assertEqual(wifi["description"], "Intel(R) Wireless-AC 9560 160MHz")
+        self.assertEqual(wifi["dns_servers"], [])
+
+    def test_dns_servers_from_ipconfig(self):
+        self.assertEqual(dns_servers_from_ipconfig(self.parsed),
+                         ["192.168.1.254", "2a01:e0a:1f2:3b40:224:d4ff:fe12:3456"])
+
+
+class RepeatedLinesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.parsed = parse_fixture("repeated.txt")
+        self.adapters = self.parsed["adapters"]
+
+    def test_repeated_header_keeps_values_once(self):
+        self.assertEqual(self.parsed["host"], {"host_name": "SRV-EDGE", "dns_suffix_search_list": ["corp.example.com"]})
+
+    def test_repeated_adapter_block_replaces_the_earlier_one(self):
+        # The second run no longer lists 10.1.0.12
+        self.assertEqual(list(self.adapters), ["LAN", "WAN"])
+        lan = self.adapters["LAN"]
+        self.assertEqual(lan["ipv4_addresses"], ["10.1.0.10", "10.1.0.11"])
+        self.assertEqual(lan["default_gateways"], ["10.1.0.1"])
+        self.assertEqual(lan["dns_servers"], ["10.1.0.53", "10.1.0.54"])
+
+    def test_repeated_field_lines_collect_every_value(self):
+        first_run = parse_ipconfig_all(_first_run_lines())
+        self.assertEqual(first_run["adapters"]["LAN"]["ipv4_addresses"], ["10.1.0.10", "10.1.0.11", "10.1.0.12"])
+
+    def test_repeated_continuation_value_kept_once(self):
+        self.assertEqual(self.adapters["WAN"]["dns_servers"], ["10.1.0.53", "203.0.113.53"])
+
+    def test_dns_servers_from_ipconfig_across_adapters(self):
+        self.assertEqual(dns_servers_from_ipconfig(self.parsed), ["10.1.0.53", "10.1.0.54", "203.0.113.53"])
+
+
+def _first_run_lines():
+    # repeated.txt up to the second "Windows IP Configuration"
+    with open(os.path.join(FIXTURES, "repeated.txt"), "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    second = [i for i, line in enumerate(lines) if line.startswith("Windows IP Configuration")][1]
+    return lines[:second]
+
+
+if __name__ == "__main__":
+    unittest.main()
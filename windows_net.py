@@ -0,0 +1,129 @@
+# windows_net.py
+# Parsers for Windows network command output. They only process text, so they
+# run (and are benchmarked) on any platform from saved output.
+import re
+
+# Field labels of `ipconfig /all` (English, German and French) -> result key.
+# Fields in _LIST_FIELDS collect every value, including continuation lines.
+IPCONFIG_FIELDS = {
+    "Host Name": "host_name",
+    "Hostname": "host_name",
+    "Nom de l'hôte": "host_name",
+    "DNS Suffix Search List": "dns_suffix_search_list",
+    "DNS-Suffixsuchliste": "dns_suffix_search_list",
+    "Liste de recherche du suffixe DNS": "dns_suffix_search_list",
+    "Description": "description",
+    "Beschreibung": "description",
+    "Physical Address": "physical_address",
+    "Physische Adresse": "physical_address",
+    "Adresse physique": "physical_address",
+    "Media State": "media_state",
+    "Medienstatus": "media_state",
+    "Statut du média": "media_state",
+    "Connection-specific DNS Suffix": "dns_suffix",
+    "Verbindungsspezifisches DNS-Suffix": "dns_suffix",
+    "Suffixe DNS propre à la connexion": "dns_suffix",
+    "DHCP Enabled": "dhcp_enabled",
+    "DHCP aktiviert": "dhcp_enabled",
+    "DHCP activé": "dhcp_enabled",
+    "IPv4 Address": "ipv4_addresses",
+    "IP Address": "ipv4_addresses",
+    "IPv4-Adresse": "ipv4_addresses",
+    "Adresse IPv4": "ipv4_addresses",
+    "Default Gateway": "default_gateways",
+    "Standardgateway": "default_gateways",
+    "Passerelle par défaut": "default_gateways",
+    "DHCP Server": "dhcp_server",
+    "DHCP-Server": "dhcp_server",
+    "Serveur DHCP": "dhcp_server",
+    "DNS Servers": "dns_servers",
+    "DNS-Server": "dns_servers",
+    "Serveurs DNS": "dns_servers",
+}
+_LIST_FIELDS = frozenset(("dns_suffix_search_list", "ipv4_addresses", "default_gateways", "dns_servers"))
+_YES = frozenset(("yes", "ja", "oui"))
+
+# "   DNS Servers . . . . . . . . . . . : 10.0.0.2": three spaces, the label,
+# dot leaders, a colon and the (possibly empty) value. Continuation lines are
+# indented further and carry only a value.
+_FIELD_RE = re.compile(r"^ {3}(\S.*?)[ .]*:(?: (.*))?$")
+# "Ethernet adapter Ethernet 2:" / "Ethernet-Adapter Ethernet 2:" / "Tunneladapter isatap.{...}:" /
+# "Carte Ethernet Ethernet 2 :" / "Carte réseau sans fil Wi-Fi :" -> (type, name)
+_ADAPTER_RE = re.compile(r"^(?:(.+?)[ -]?[Aa]dapter |Carte (réseau sans fil|\S+) )?(.+?)\s*:$")
+# "10.0.0.5(Preferred)", "10.0.0.5(Bevorzugt)"
+_STATUS_SUFFIX_RE = re.compile(r"\(.*\)$")
+
+
+def _new_adapter(adapter_type):
+    return {"type": adapter_type, "ipv4_addresses": [], "default_gateways": [], "dns_servers": [],
+            "dhcp_enabled": None, "dhcp_server": None}
+
+
+def parse_ipconfig_all(lines):
+    """
+    Parses `ipconfig /all` output in a single pass.
+
+    Args:
+        lines: Iterable of output lines, e.g. a file or a command's stdout being
+               streamed; only one line is held at a time.
+
+    Returns:
+        dict: 'host' (global settings such as 'host_name' and
+              'dns_suffix_search_list') and 'adapters' (adapter name -> dict
+              with 'type', 'description', 'physical_address', 'ipv4_addresses',
+              'default_gateways', 'dns_servers', 'dhcp_enabled', 'dhcp_server'
+              and, where reported, 'dns_suffix' and 'media_state'). Address
+              status suffixes such as "(Preferred)" are removed and list
+              values are kept once each. An adapter whose block appears again
+              (e.g. two captures in one file) is described by the last one.
+    """
+    host = {"dns_suffix_search_list": []}
+    adapters = {}
+    section = host
+    list_field = None # Field that continuation lines are appended to
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            continue
+        if not line[0].isspace():
+            # Section header: "Windows IP Configuration" (no colon) starts the
+            # global settings, "<type> adapter <name>:" an adapter
+            match = _ADAPTER_RE.match(line)
+            list_field = None
+            if match is None:
+                section = host
+            else:
+                section = adapters[match.group(3)] = _new_adapter(match.group(1) or match.group(2))
+            continue
+        match = _FIELD_RE.match(line)
+        if match is None:
+            # Continuation of a multi-value field
+            if list_field is not None:
+                value = _STATUS_SUFFIX_RE.sub("", line.strip())
+                if value and value not in section[list_field]:
+                    section[list_field].append(value)
+            continue
+        field = IPCONFIG_FIELDS.get(match.group(1))
+        value = (match.group(2) or "").strip()
+        if field is None:
+            list_field = None
+            continue
+        if field in _LIST_FIELDS:
+            list_field = field
+            values = section.setdefault(field, [])
+            value = _STATUS_SUFFIX_RE.sub("", value)
+            if value and value not in values:
+                values.append(value)
+        else:
+            list_field = None
+            if field == "dhcp_enabled":
+                section[field] = value.lower() in _YES
+            else:
+                section[field] = value
+    return {"host": host, "adapters": adapters}
+
+
+def dns_servers_from_ipconfig(parsed):
+    """All adapters' DNS servers from parse_ipconfig_all(), sorted and de-duplicated, without ::1."""
+    return sorted({server for adapter in parsed["adapters"].values()
+                   for server in adapter["dns_servers"] if server != "::1"})